@@ -1,6 +1,5 @@
 from collections import defaultdict
 
-import pandas as pd
 from tqdm import tqdm
 
 from endgame_postprocessing.post_processing import (
@@ -10,14 +9,23 @@ from endgame_postprocessing.post_processing import (
 )
 from endgame_postprocessing.post_processing import file_util
 from endgame_postprocessing.post_processing.canonical_results import CanonicalResults
+from endgame_postprocessing.post_processing.compression import OutputCompression
 from endgame_postprocessing.post_processing.disease import Disease
 from endgame_postprocessing.post_processing.generation_metadata import produce_generation_metadata
 from endgame_postprocessing.post_processing.pipeline_config import PipelineConfig
-from endgame_postprocessing.post_processing.replicate_historic_data_from_scenario import \
-    replicate_historic_data_in_all_scenarios  # noqa: E501
+from endgame_postprocessing.post_processing.prefetch import prefetch
+from endgame_postprocessing.post_processing.replicate_historic_data_from_scenario import (
+    find_ius_to_exclude,
+    prepend_historic_data,
+    replicate_historic_data_in_all_scenarios,
+    validate_source_scenario,
+)
 from endgame_postprocessing.post_processing.warnings_collector import CollectAndPrintWarnings  # noqa: E501
 
 
+LF_PREVALENCE_MEASURE = "sampled mf prevalence (all pop)"
+
+
 def get_lf_standard(input_dir):
     return file_util.get_flat_regex(
         r"ntdmc-(?P<iu_id>(?P<country>[A-Z]{3})\d{5})-lf-(?P<scenario>scenario_\w+)-200.csv",
@@ -25,33 +33,127 @@ def get_lf_standard(input_dir):
     )
 
 
-def canonicalise_raw_lf_results(input_dir) -> CanonicalResults:
-    file_iter = get_lf_standard(input_dir)
-
-    all_files = list(file_iter)
+def _get_all_lf_files(input_dir):
+    all_files = list(get_lf_standard(input_dir))
 
     if len(all_files) == 0:
         raise Exception(
             "No data for IUs found - see above warnings and check input directory"
         )
+    return all_files
+
+
+def _read_lf_file(file_info):
+    return canonicalise.read_raw_measure(file_info.file_path, LF_PREVALENCE_MEASURE)
+
+
+def _canonicalise_lf_file(file_info, raw_iu):
+    return canonicalise.canonicalise_raw(raw_iu, file_info, LF_PREVALENCE_MEASURE)
+
+
+def canonicalise_raw_lf_results(input_dir, prefetch_depth=0) -> CanonicalResults:
+    all_files = _get_all_lf_files(input_dir)
 
     results = defaultdict(dict)
 
-    for file_info in tqdm(all_files, desc="Canoncialise LF results"):
-        raw_iu = pd.read_csv(file_info.file_path)
-        canonical_result = canonicalise.canonicalise_raw(
-            raw_iu, file_info, "sampled mf prevalence (all pop)"
-        )
+    for file_info, raw_iu in tqdm(
+        prefetch(all_files, _read_lf_file, prefetch_depth),
+        total=len(all_files),
+        desc="Canoncialise LF results",
+    ):
+        canonical_result = _canonicalise_lf_file(file_info, raw_iu)
         results[file_info.scenario][file_info.iu] = (file_info, canonical_result)
     return results
 
 
-def write_canonical_results(results: CanonicalResults, output_dir):
+def canonicalise_and_write_lf_results_by_iu(
+        input_dir,
+        output_dir,
+        scenario_with_historic_data,
+        output_compression: OutputCompression = None,
+        prefetch_depth=0,
+        writer: output_directory_structure.BackgroundWriter = None,
+):
+    """
+    Streaming equivalent of canonicalise_raw_lf_results, replicate_historic_data_in_all_scenarios
+    and write_canonical_results.
+
+    Rather than holding every scenario of every IU in memory, the files are indexed up front
+    (which is enough to work out which IUs are excluded, and raise the same warnings) and then
+    each IU is processed in turn: the source scenario is loaded, prepended to each of the other
+    scenarios, everything for that IU is written, and then it is released.
+    """
+    all_files = _get_all_lf_files(input_dir)
+
+    if scenario_with_historic_data is None:
+        for file_info, raw_iu in tqdm(
+            prefetch(all_files, _read_lf_file, prefetch_depth),
+            total=len(all_files),
+            desc="Canoncialise LF results",
+        ):
+            output_directory_structure.write_canonical(
+                output_dir,
+                file_info,
+                _canonicalise_lf_file(file_info, raw_iu),
+                output_compression,
+                writer,
+            )
+        return
+
+    file_infos = defaultdict(dict)
+    for file_info in all_files:
+        file_infos[file_info.scenario][file_info.iu] = file_info
+
+    validate_source_scenario(file_infos.keys(), scenario_with_historic_data)
+    ius_to_exclude = find_ius_to_exclude(file_infos, scenario_with_historic_data)
+
+    ius_to_process = [
+        iu for iu in file_infos[scenario_with_historic_data] if iu not in ius_to_exclude
+    ]
+    def read_all_scenarios(iu):
+        return {scenario: _read_lf_file(file_infos[scenario][iu]) for scenario in file_infos}
+
+    for iu, raw_iu_by_scenario in tqdm(
+        prefetch(ius_to_process, read_all_scenarios, prefetch_depth),
+        total=len(ius_to_process),
+        desc="Canoncialise LF results by IU",
+    ):
+        source_file_info = file_infos[scenario_with_historic_data][iu]
+        source_data = _canonicalise_lf_file(
+            source_file_info, raw_iu_by_scenario[scenario_with_historic_data]
+        )
+        output_directory_structure.write_canonical(
+            output_dir, source_file_info, source_data, output_compression, writer
+        )
+
+        for other_scenario in file_infos:
+            if other_scenario == scenario_with_historic_data:
+                continue
+            other_file_info = file_infos[other_scenario][iu]
+            output_directory_structure.write_canonical(
+                output_dir,
+                other_file_info,
+                prepend_historic_data(
+                    source_data,
+                    other_file_info,
+                    _canonicalise_lf_file(other_file_info, raw_iu_by_scenario[other_scenario]),
+                ),
+                output_compression,
+                writer,
+            )
+
+
+def write_canonical_results(
+        results: CanonicalResults,
+        output_dir,
+        output_compression: OutputCompression = None,
+        writer: output_directory_structure.BackgroundWriter = None,
+):
     for scenario in results:
         for iu in results[scenario]:
             file_info, canonical_result = results[scenario][iu]
             output_directory_structure.write_canonical(
-                output_dir, file_info, canonical_result
+                output_dir, file_info, canonical_result, output_compression, writer
             )
 
 
@@ -60,6 +162,10 @@ def run_postprocessing_pipeline(
         scenario_with_historic_data: str,
         output_dir: str,
         num_jobs: int,
+        stream_by_iu: bool = False,
+        output_compression: OutputCompression = None,
+        prefetch_depth: int = 0,
+        writer_threads: int = 0,
 ):
     """
     Aggregates into standard format the input files found in forward_projection_raw.
@@ -85,16 +191,46 @@ def run_postprocessing_pipeline(
         forward_projection_raw (str): The directory to search for input files.
         scenario_with_historic_data (str): The name of the scenario to use for historic data
         output_dir (str): The directory to store the output files.
+        stream_by_iu (bool): Canonicalise one IU (across all scenarios) at a time rather than
+            loading every scenario into memory first. Produces the same output.
+        output_compression (OutputCompression): If given, the canonical, per IU and composite
+            CSVs are written compressed. Defaults to None (uncompressed).
+        prefetch_depth (int): How many input files to read ahead on background threads.
+            Defaults to 0 (no reading ahead).
+        writer_threads (int): How many background threads write the output CSVs, so the
+            writes overlap with processing the next IU. Defaults to 0 (write each one in turn).
 
     """
     with CollectAndPrintWarnings() as collected_warnings:
-        results = canonicalise_raw_lf_results(forward_projection_raw)
-        if scenario_with_historic_data is not None:
-            results = replicate_historic_data_in_all_scenarios(results, scenario_with_historic_data)
-        write_canonical_results(results, output_dir)
+        # Closing the writer waits for the canonical results to be written before the
+        # pipeline reads them
+        with output_directory_structure.open_background_writer(writer_threads) as writer:
+            if stream_by_iu:
+                canonicalise_and_write_lf_results_by_iu(
+                    forward_projection_raw,
+                    output_dir,
+                    scenario_with_historic_data,
+                    output_compression,
+                    prefetch_depth,
+                    writer,
+                )
+            else:
+                results = canonicalise_raw_lf_results(forward_projection_raw, prefetch_depth)
+                if scenario_with_historic_data is not None:
+                    results = replicate_historic_data_in_all_scenarios(
+                        results, scenario_with_historic_data
+                    )
+                write_canonical_results(results, output_dir, output_compression, writer)
 
         pipeline.pipeline(
-            forward_projection_raw, output_dir, PipelineConfig(disease=Disease.LF)
+            forward_projection_raw,
+            output_dir,
+            PipelineConfig(
+                disease=Disease.LF,
+                output_compression=output_compression,
+                prefetch_depth=prefetch_depth,
+                writer_threads=writer_threads,
+            ),
         )
 
     output_directory_structure.write_results_metadata_file(
@@ -9,6 +9,7 @@ from endgame_postprocessing.post_processing import (
     output_directory_structure,
     pipeline,
 )
+from endgame_postprocessing.post_processing.compression import OutputCompression
 from endgame_postprocessing.post_processing.disease import Disease
 from endgame_postprocessing.post_processing.file_util import (
     post_process_file_generator,
@@ -16,6 +17,7 @@ from endgame_postprocessing.post_processing.file_util import (
     list_all_historic_ius,
 )
 from endgame_postprocessing.post_processing.pipeline_config import PipelineConfig
+from endgame_postprocessing.post_processing.prefetch import prefetch
 from endgame_postprocessing.post_processing.warnings_collector import CollectAndPrintWarnings
 
 def canonicalise_raw_oncho_results(
@@ -25,6 +27,8 @@ def canonicalise_raw_oncho_results(
         stop_year=2041,
         historic_dir=None,
         historic_prefix="",
+        output_compression: OutputCompression = None,
+        prefetch_depth=0,
 ):
     file_iter = post_process_file_generator(
         file_directory=input_dir, end_of_file=".csv"
@@ -42,8 +46,15 @@ def canonicalise_raw_oncho_results(
     )
     excluded_ius_not_in_historic = set()
     excluded_ius_not_in_forward_projections = set()
-    for file_info in tqdm(all_files, desc="Canoncialise Oncho results"):
-        raw_iu = pd.read_csv(file_info.file_path)
+    for file_info, raw_iu in tqdm(
+        prefetch(
+            all_files,
+            lambda file_info: canonicalise.read_raw_measure(file_info.file_path, "prevalence"),
+            prefetch_depth,
+        ),
+        total=len(all_files),
+        desc="Canoncialise Oncho results",
+    ):
         if historic_dir is not None:
             # Note: for oncho the historic files have no folder structure
             # The IU names in the historic files use the long code.
@@ -65,7 +76,7 @@ def canonicalise_raw_oncho_results(
                 # present for one and/or if a scenario is missing, that is expected.
                 if file_info.iu in historic_ius_not_yet_found:
                     historic_ius_not_yet_found.remove(file_info.iu)
-            raw_iu_historic = pd.read_csv(historic_iu_file_path)
+            raw_iu_historic = canonicalise.read_raw_measure(historic_iu_file_path, "prevalence")
             raw_iu = pd.concat([raw_iu_historic, raw_iu])
         raw_iu_filtered = raw_iu[
             (raw_iu["year_id"] >= start_year) & (raw_iu["year_id"] <= stop_year)
@@ -75,7 +86,7 @@ def canonicalise_raw_oncho_results(
             raw_iu_filtered, file_info, "prevalence"
         )
         output_directory_structure.write_canonical(
-            output_dir, file_info, canonical_result
+            output_dir, file_info, canonical_result, output_compression
         )
     for iu in historic_ius_not_yet_found:
         excluded_ius_not_in_forward_projections.add(iu)
@@ -92,6 +103,8 @@ def run_postprocessing_pipeline(
         historic_prefix: str = "*",
         start_year=1970,
         stop_year=2041,
+        output_compression: OutputCompression = None,
+        prefetch_depth: int = 0,
 ):
     """
     Aggregates into standard format the input files found in input_dir.
@@ -126,6 +139,10 @@ def run_postprocessing_pipeline(
             is raw_outputs_AAAXXXX00002. Defaults to "*".
         start_year: The first year to be included in the results
         stop_year: The last year to be included in the results
+        output_compression (OutputCompression, optional): If given, the canonical, per IU and
+            composite CSVs are written compressed. Defaults to None (uncompressed).
+        prefetch_depth (int, optional): How many input files to read ahead on background
+            threads. Defaults to 0 (no reading ahead).
 
     """
     with CollectAndPrintWarnings() as collected_warnings:
@@ -136,8 +153,18 @@ def run_postprocessing_pipeline(
             historic_prefix=historic_prefix,
             start_year=start_year,
             stop_year=stop_year,
+            output_compression=output_compression,
+            prefetch_depth=prefetch_depth,
+        )
+        pipeline.pipeline(
+            input_dir,
+            output_dir,
+            PipelineConfig(
+                disease=Disease.ONCHO,
+                output_compression=output_compression,
+                prefetch_depth=prefetch_depth,
+            ),
         )
-        pipeline.pipeline(input_dir, output_dir, PipelineConfig(disease=Disease.ONCHO))
 
     output_directory_structure.write_results_metadata_file(
         output_dir,
@@ -1,16 +1,16 @@
-from functools import reduce
 import glob
-from operator import mul
 import os
 import re
 from typing import Iterable
 import warnings
 from tqdm import tqdm
 from endgame_postprocessing.post_processing import (
+    canonical_columns,
     canonicalise,
     output_directory_structure,
     pipeline,
 )
+from endgame_postprocessing.post_processing.compression import OutputCompression
 from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
 from endgame_postprocessing.post_processing.disease import Disease
 import pandas as pd
@@ -28,7 +28,25 @@ WORM_MAPPING = {
 }
 
 
-def probability_any_worm(probability_for_each_worm: Iterable[float]):
+def _stack_worms(probability_for_each_worm, worms_present):
+    """
+    Returns the probabilities as a single [worm x ...] array (e.g. [worm x year x draw]), and
+    worms_present shaped to broadcast against it.
+    """
+    if isinstance(probability_for_each_worm, np.ndarray):
+        worm_probabilities = probability_for_each_worm
+    else:
+        worm_probabilities = np.stack(
+            [np.asarray(probability, dtype=float) for probability in probability_for_each_worm]
+        )
+    if worms_present is None:
+        worms_present = np.ones(len(worm_probabilities), dtype=bool)
+    return worm_probabilities, np.asarray(worms_present, dtype=bool).reshape(
+        (-1,) + (1,) * (worm_probabilities.ndim - 1)
+    )
+
+
+def probability_any_worm(probability_for_each_worm: Iterable[float], worms_present=None):
     """
     Calculate the probability of having any worm, given probability of
     having each worm.
@@ -38,36 +56,65 @@ def probability_any_worm(probability_for_each_worm: Iterable[float]):
     of no worm.
 
     Inputs:
-     - probability_for_each_worm: Probability of having each worm
+     - probability_for_each_worm: Probability of having each worm. Either one value
+       (or array of values, e.g. [year x draw]) per worm, or these stacked into a single
+       [worm x ...] array
+     - worms_present: Optional mask of which worms to include, the others are ignored
 
     Returns: the probability of having any worm.
     """
-    prob_of_not_each_worm = map(
-        lambda prob_having_worm: 1.0 - prob_having_worm, probability_for_each_worm
-    )
-    prob_not_any_worm = reduce(mul, prob_of_not_each_worm, 1.0)
+    worm_probabilities, worms_present = _stack_worms(probability_for_each_worm, worms_present)
+    prob_not_any_worm = np.prod(1.0 - worm_probabilities, axis=0, where=worms_present)
     return 1.0 - prob_not_any_worm
 
-def probability_any_worm_max(probability_for_each_worm: Iterable[float]):
+def probability_any_worm_max(probability_for_each_worm: Iterable[float], worms_present=None):
     """
     Calculate the probability of having any worm, given by the highest probability
     among all the worms. Used for SCH.
 
     Inputs:
-     - probability_for_each_worm: Probability of having each worm
+     - probability_for_each_worm: Probability of having each worm (as for probability_any_worm)
+     - worms_present: Optional mask of which worms to include, the others are ignored
 
     Returns: the probability of having any worm.
     """
-    return reduce(lambda x, y: np.maximum(x, y), probability_for_each_worm)
+    worm_probabilities, worms_present = _stack_worms(probability_for_each_worm, worms_present)
+    return np.max(worm_probabilities, axis=0, where=worms_present, initial=-np.inf)
+
+def _canonicalise_worm_file(file_info):
+    raw_iu = canonicalise.read_raw_measure(file_info.file_path, "Prevalence SAC")
+    raw_without_columns = raw_iu.drop(columns=["intensity", "species"])
+    # TODO: canonical shouldn't need the age_start / age_end but these are assumed present later
+    return canonicalise.canonicalise_raw(
+        raw_without_columns, file_info, "Prevalence SAC"
+    )
+
+
+def canoncialise_single_result(
+    file_info, warning_if_no_file=False, worm_canonical_cache=None, keep_in_cache=True
+):
+    """
+    Canonicalises a single raw worm file.
 
-def canoncialise_single_result(file_info, warning_if_no_file=False):
+    If worm_canonical_cache (a dict owned by the caller) is given, the canonical result is
+    kept in it by file path, with the file's modification time, and reused until the file is
+    modified, so a worm's files are only parsed once when both single worm and all worm
+    results are produced from them. Only the latest result of each file is kept, and it is
+    taken out of the cache by the last use (keep_in_cache=False).
+    """
     try:
-        raw_iu = pd.read_csv(file_info.file_path)
-        raw_without_columns = raw_iu.drop(columns=["intensity", "species"])
-        # TODO: canonical shouldn't need the age_start / age_end but these are assumed present later
-        return canonicalise.canonicalise_raw(
-            raw_without_columns, file_info, "Prevalence SAC"
-        )
+        if worm_canonical_cache is None:
+            return _canonicalise_worm_file(file_info)
+        file_path = os.path.abspath(file_info.file_path)
+        mtime = os.stat(file_info.file_path).st_mtime_ns
+        cached = worm_canonical_cache.pop(file_path, None)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, _canonicalise_worm_file(file_info))
+        if not keep_in_cache:
+            return cached[1]
+        worm_canonical_cache[file_path] = cached
+        # A copy, as combine_many_worms overwrites the draws of the first worm
+        return cached[1].copy()
     except FileNotFoundError:
         if warning_if_no_file:
             warnings.warn(
@@ -77,22 +124,68 @@ def canoncialise_single_result(file_info, warning_if_no_file=False):
         raise FileNotFoundError
 
 
-def combine_many_worms(first_worm, other_worms, combination_function = probability_any_worm):
-    if not callable(combination_function):
-        raise Exception("Need to provide a callable function to combine worms.")
-    other_worm_draws = [
-        other_worm.loc[:, "draw_0":]
-        if not other_worm.empty
-        else pd.DataFrame(
-            np.zeros(first_worm.loc[:, "draw_0":].shape),
-            columns=first_worm.columns[first_worm.columns.get_loc("draw_0"):]
-        )
-        for other_worm in other_worms
-    ]
+def combine_many_worms(
+    first_worm, other_worms, combination_function=None, stacked_combination_function=None
+):
+    """
+    Combines the draws of each worm into the draws of first_worm (which is modified in place).
 
-    first_worm.loc[:, "draw_0":] = combination_function(
-        [first_worm.loc[:, "draw_0":]] + other_worm_draws
-    )
+    The draws are stacked by row into a single [worm x year x draw] array, so every worm with
+    results must have the same year_id values, in the same order, as first_worm.
+
+    stacked_combination_function is called once as
+    stacked_combination_function(worm_draws, worms_present), where worm_draws is the stacked
+    array and worms_present is a boolean mask of the worms with results, and must return the
+    [year x draw] combined draws (see probability_any_worm, the default).
+
+    Alternatively combination_function is called with the list of each worm's draws data
+    frames (zeros for a worm without results) and must return the combined draws.
+    """
+    if combination_function is not None and stacked_combination_function is not None:
+        raise Exception(
+            "Provide only one of combination_function and stacked_combination_function."
+        )
+    if combination_function is None and stacked_combination_function is None:
+        stacked_combination_function = probability_any_worm
+    if not callable(combination_function or stacked_combination_function):
+        raise Exception("Need to provide a callable function to combine worms.")
+    first_worm_draws = first_worm.loc[:, "draw_0":]
+    worm_draws = np.zeros((1 + len(other_worms),) + first_worm_draws.shape)
+    worms_present = np.ones(1 + len(other_worms), dtype=bool)
+    worm_draws[0] = first_worm_draws.to_numpy(dtype=float)
+    all_worm_draws = [first_worm_draws]
+    for worm_index, other_worm in enumerate(other_worms, start=1):
+        if other_worm.empty:
+            worms_present[worm_index] = False
+            if combination_function is not None:
+                all_worm_draws.append(
+                    pd.DataFrame(
+                        np.zeros(first_worm_draws.shape), columns=first_worm_draws.columns
+                    )
+                )
+            continue
+        other_worm_draws = other_worm.loc[:, "draw_0":]
+        if other_worm_draws.shape != first_worm_draws.shape:
+            raise Exception(
+                f"Expected worm draws of shape {first_worm_draws.shape}, "
+                f"got {other_worm_draws.shape}"
+            )
+        if (
+            canonical_columns.YEAR_ID in first_worm.columns
+            and canonical_columns.YEAR_ID in other_worm.columns
+            and not np.array_equal(
+                first_worm[canonical_columns.YEAR_ID].to_numpy(),
+                other_worm[canonical_columns.YEAR_ID].to_numpy(),
+            )
+        ):
+            raise Exception("Expected every worm to have the same year_id values as the first")
+        worm_draws[worm_index] = other_worm_draws.to_numpy(dtype=float)
+        all_worm_draws.append(other_worm_draws)
+
+    if combination_function is not None:
+        first_worm.loc[:, "draw_0":] = combination_function(all_worm_draws)
+    else:
+        first_worm.loc[:, "draw_0":] = stacked_combination_function(worm_draws, worms_present)
     return first_worm
 
 
@@ -161,7 +254,14 @@ def get_sch_worm_info(file_path):
     )
 
 
-def canonicalise_raw_sth_results(input_dir, output_dir, worm_directories, warning_if_no_file):
+def canonicalise_raw_sth_results(
+    input_dir,
+    output_dir,
+    worm_directories,
+    warning_if_no_file,
+    output_compression: OutputCompression = None,
+    worm_canonical_cache=None,
+):
     if len(worm_directories) == 0:
         raise Exception("Must provide at least one worm directory")
     first_worm_dir = worm_directories[0]
@@ -188,15 +288,21 @@ def canonicalise_raw_sth_results(input_dir, output_dir, worm_directories, warnin
             "No data for IUs found - see above warnings and check input directory"
         )
 
+    # Each file is only used for one IU of an all worm run, so is the last use of its result
+    keep_in_cache = len(worm_directories) == 1
     for file_info in tqdm(all_files, desc="Canoncialise STH results"):
-        canonical_result_first_worm = canoncialise_single_result(file_info)
+        canonical_result_first_worm = canoncialise_single_result(
+            file_info, worm_canonical_cache=worm_canonical_cache, keep_in_cache=keep_in_cache
+        )
         first_worm = get_sth_worm(file_info.file_path)
         other_worm_file_infos = [
             swap_worm_in_heirachy(file_info, first_worm, worm) for worm in other_worms
         ]
 
         other_worms_canoncial = [
-            canoncialise_single_result(other_worm_file_info, warning_if_no_file)
+            canoncialise_single_result(
+                other_worm_file_info, warning_if_no_file, worm_canonical_cache, keep_in_cache
+            )
             for other_worm_file_info in other_worm_file_infos
         ]
 
@@ -204,7 +310,7 @@ def canonicalise_raw_sth_results(input_dir, output_dir, worm_directories, warnin
             canonical_result_first_worm, other_worms_canoncial
         )
         output_directory_structure.write_canonical(
-            output_dir, file_info, all_worms_canonical
+            output_dir, file_info, all_worms_canonical, output_compression
         )
 
 def _check_iu_in_all_folders(worm_iu_info, warning_if_no_file):
@@ -240,7 +346,9 @@ def canonicalise_raw_sch_results(
     input_dir,
     output_dir,
     worm_directories,
-    warning_if_no_file
+    warning_if_no_file,
+    output_compression: OutputCompression = None,
+    worm_canonical_cache=None,
 ):
     if len(worm_directories) < 1:
         raise Exception(
@@ -279,6 +387,8 @@ def canonicalise_raw_sch_results(
         for file_desc in worm_files_list
     )
 
+    # Each file is only used for one IU of an all worm run, so is the last use of its result
+    keep_in_cache = len(worm_directories) == 1
     for file_info in tqdm(all_files, desc="Canoncialise SCH results"):
         other_worm_file_infos = []
         for worm, burden, _, _ in other_worms:
@@ -289,19 +399,23 @@ def canonicalise_raw_sch_results(
             if new_file.file_path in all_other_worms_file_paths:
                 other_worm_file_infos.append(new_file)
 
-        canonical_result_first_worm = canoncialise_single_result(file_info)
+        canonical_result_first_worm = canoncialise_single_result(
+            file_info, worm_canonical_cache=worm_canonical_cache, keep_in_cache=keep_in_cache
+        )
 
         other_worms_canoncial = [
-            canoncialise_single_result(other_worm_file_info, warning_if_no_file)
+            canoncialise_single_result(
+                other_worm_file_info, warning_if_no_file, worm_canonical_cache, keep_in_cache
+            )
             for other_worm_file_info in other_worm_file_infos
         ]
 
         all_worms_canonical = combine_many_worms(
             canonical_result_first_worm, other_worms_canoncial,
-            combination_function=probability_any_worm_max
+            stacked_combination_function=probability_any_worm_max
         )
         output_directory_structure.write_canonical(
-            output_dir, file_info, all_worms_canonical
+            output_dir, file_info, all_worms_canonical, output_compression
         )
 
 
@@ -313,7 +427,10 @@ def run_sth_postprocessing_pipeline(
     skip_canonical=False,
     threshold: float = 0.1,
     run_country_level_summaries = False,
-    warning_if_no_file = False
+    warning_if_no_file = False,
+    output_compression: OutputCompression = None,
+    thresholds: list[float] | None = None,
+    worm_canonical_cache=None,
 ):
     """
     Aggregates into standard format the input files found in input_dir.
@@ -344,16 +461,32 @@ def run_sth_postprocessing_pipeline(
         worm_directories (list[str]) The worm directories within input_dir
            to combine. Provide a single worm directory to process a single worm
 
+        thresholds (list[float]): If given, the outputs are produced for each of these
+            thresholds (instead of threshold) in one pass, in a threshold_{threshold}/
+            directory for each (see PipelineConfig.thresholds)
+        worm_canonical_cache (dict): If given, a single worm run keeps each worm file's
+            canonical result in it, so a later all worm run passed the same dict doesn't parse
+            the same worm files again (and takes them out of it)
+
     Note this will be looking at prevalence across any worm specified in the worm_directories
 
     """
     if not skip_canonical:
-        canonicalise_raw_sth_results(input_dir, output_dir, worm_directories, warning_if_no_file)
+        canonicalise_raw_sth_results(
+            input_dir,
+            output_dir,
+            worm_directories,
+            warning_if_no_file,
+            output_compression,
+            worm_canonical_cache,
+        )
 
     config = PipelineConfig(
         disease=Disease.STH,
         threshold=threshold,
         include_country_and_continent_summaries=run_country_level_summaries,
+        output_compression=output_compression,
+        thresholds=thresholds,
     )
     pipeline.pipeline(input_dir, output_dir, config)
 
@@ -366,15 +499,25 @@ def run_sch_postprocessing_pipeline(
     threshold: float = 0.1,
     run_country_level_summaries = False,
     warning_if_no_file = False,
+    output_compression: OutputCompression = None,
+    thresholds: list[float] | None = None,
+    worm_canonical_cache=None,
 ):
     if not skip_canonical:
         canonicalise_raw_sch_results(
-            input_dir, output_dir, worm_directories, warning_if_no_file
+            input_dir,
+            output_dir,
+            worm_directories,
+            warning_if_no_file,
+            output_compression,
+            worm_canonical_cache,
         )
     config = PipelineConfig(
         disease=Disease.SCH,
         threshold=threshold,
         include_country_and_continent_summaries=run_country_level_summaries,
+        output_compression=output_compression,
+        thresholds=thresholds,
     )
     pipeline.pipeline(input_dir, output_dir, config)
 
@@ -401,21 +544,26 @@ if __name__ == "__main__":
 
     root_input_dir = "local_data/202410b-SCH-test-2-20241022"
     worm_directories = ["sch-haematobium", "sch-mansoni-high-burden", "sch-mansoni-low-burden"]
-    for threshold in thresholds_to_process:
-        for worm_directory in worm_directories:
-            run_sch_postprocessing_pipeline(
-                f"{root_input_dir}/",
-                f"local_data/sch-output-single-worm/threshold_{threshold}/{worm_directory}",
-                skip_canonical=False,
-                worm_directories=[worm_directory],
-                threshold=threshold,
-                run_country_level_summaries=True
-            )
+    # The all worm run below reuses each worm's canonical results. Until then this holds the
+    # canonical result of every file of every worm in memory (about the size of all the
+    # canonical results written), the all worm run takes each out once it is used
+    worm_canonical_cache = {}
+    for worm_directory in worm_directories:
         run_sch_postprocessing_pipeline(
             f"{root_input_dir}/",
-            f"local_data/sch-output-all-worm/threshold_{threshold}/",
+            f"local_data/sch-output-single-worm/{worm_directory}",
             skip_canonical=False,
-            worm_directories=worm_directories,
-            threshold=threshold,
-            run_country_level_summaries=True
+            worm_directories=[worm_directory],
+            thresholds=thresholds_to_process,
+            run_country_level_summaries=True,
+            worm_canonical_cache=worm_canonical_cache,
         )
+    run_sch_postprocessing_pipeline(
+        f"{root_input_dir}/",
+        "local_data/sch-output-all-worm/",
+        skip_canonical=False,
+        worm_directories=worm_directories,
+        thresholds=thresholds_to_process,
+        run_country_level_summaries=True,
+        worm_canonical_cache=worm_canonical_cache,
+    )
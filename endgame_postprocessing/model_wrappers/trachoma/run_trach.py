@@ -15,6 +15,7 @@ from endgame_postprocessing.post_processing import (
     file_util,
     canonical_columns,
 )
+from endgame_postprocessing.post_processing.compression import OutputCompression
 from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
 from endgame_postprocessing.post_processing.disease import Disease
 from endgame_postprocessing.post_processing.generation_metadata import (
@@ -78,6 +79,7 @@ def canonicalise_raw_trachoma_results(
         historic_prefix: str = "",
         start_year: int = 1970,
         stop_year: int = 2041,
+        output_compression: Optional[OutputCompression] = None,
 ):
     discovered_ius = _discover_ius(
         forward_projections_dir=input_dir,
@@ -118,38 +120,45 @@ def canonicalise_raw_trachoma_results(
         for iu in discovered_ius.history_only:
             warnings.warn(f"IU '{iu.iu}' found in history but not in forward projections.")
 
-    def prepend_historic_if_available(
-            fp: CustomFileInfo, hs: Optional[CustomFileInfo]
-    ) -> pd.DataFrame:
-        return pd.concat(
-            [
-                pd.read_csv(hs.file_path) if hs else pd.DataFrame(),
-                pd.read_csv(fp.file_path),
-            ]
+    def read_within_years(file_info: CustomFileInfo) -> pd.DataFrame:
+        raw = canonicalise.read_raw_measure(file_info.file_path, "prevalence").rename(
+            columns={"Time": canonical_columns.YEAR_ID}
         )
+        return raw.loc[raw[canonical_columns.YEAR_ID].between(start_year, stop_year)]
 
     if not discovered_ius.all_historic:
         ius_to_process = [(fp, None) for fp in discovered_ius.all_forward]
     else:
         ius_to_process = discovered_ius.with_history
 
-    for fp_fileinfo, hs_fileinfo in tqdm(
-            ius_to_process, desc="Canonicalise Trachoma results"
-    ):
-        output_directory_structure.write_canonical(
-            output_dir,
-            fp_fileinfo,
-            (prepend_historic_if_available(fp=fp_fileinfo, hs=hs_fileinfo)
-             .rename(columns={"Time": canonical_columns.YEAR_ID})
-             .query(
-                f"{canonical_columns.YEAR_ID} >= {start_year}"
-                f" and {canonical_columns.YEAR_ID} <= {stop_year}")
-             .copy()
-             .pipe(canonicalise.canonicalise_raw,
-                   file_info=fp_fileinfo,
-                   processed_prevalence_name="prevalence")
-             )
-        )
+    # Group the (forward, historic) pairs by IU so that each history file is parsed
+    # (and filtered to the year range) once and then shared across that IU's scenarios
+    ius_to_process = sorted(ius_to_process, key=lambda pair: pair[0].iu)
+    with tqdm(total=len(ius_to_process), desc="Canonicalise Trachoma results") as pbar:
+        for _, iu_pairs in itertools.groupby(ius_to_process, key=lambda pair: pair[0].iu):
+            historic_data_by_path = {}
+            for fp_fileinfo, hs_fileinfo in iu_pairs:
+                iu_data = [read_within_years(fp_fileinfo)]
+                if hs_fileinfo:
+                    if hs_fileinfo.file_path not in historic_data_by_path:
+                        historic_data_by_path[hs_fileinfo.file_path] = read_within_years(
+                            hs_fileinfo
+                        )
+                    iu_data.insert(0, historic_data_by_path[hs_fileinfo.file_path])
+
+                # concat always returns a new frame, so the shared history is never
+                # modified by canonicalise_raw
+                output_directory_structure.write_canonical(
+                    output_dir,
+                    fp_fileinfo,
+                    canonicalise.canonicalise_raw(
+                        pd.concat(iu_data),
+                        file_info=fp_fileinfo,
+                        processed_prevalence_name="prevalence",
+                    ),
+                    output_compression,
+                )
+                pbar.update(1)
 
 
 def run_postprocessing_pipeline(
@@ -159,6 +168,7 @@ def run_postprocessing_pipeline(
         historic_prefix: str = "",
         start_year: int = 1970,
         stop_year: int = 2041,
+        output_compression: Optional[OutputCompression] = None,
 ):
     with CollectAndPrintWarnings() as collected_warnings:
         canonicalise_raw_trachoma_results(
@@ -168,12 +178,17 @@ def run_postprocessing_pipeline(
             historic_prefix=historic_prefix,
             start_year=start_year,
             stop_year=stop_year,
+            output_compression=output_compression,
         )
 
         pipeline.pipeline(
             input_dir=input_dir,
             working_directory=output_dir,
-            pipeline_config=PipelineConfig(disease=Disease.TRACHOMA, threshold=0.05),
+            pipeline_config=PipelineConfig(
+                disease=Disease.TRACHOMA,
+                threshold=0.05,
+                output_compression=output_compression,
+            ),
         )
 
     output_directory_structure.write_results_metadata_file(
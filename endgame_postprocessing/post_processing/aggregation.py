@@ -1,10 +1,15 @@
 import csv
+import fnmatch
 import glob
+import io
 import itertools
 import os
+import zipfile
+from contextlib import ExitStack
+from dataclasses import dataclass
 from functools import partial
 from pathlib import Path
-from typing import List, Tuple, Generator
+from typing import Dict, List, Tuple, Generator
 
 import numpy as np
 import pandas as pd
@@ -12,18 +17,30 @@ from tqdm import tqdm
 
 from endgame_postprocessing.post_processing import (
     output_directory_structure,
+    canonicalise,
     composite_run,
     canonical_columns,
 )
-from endgame_postprocessing.post_processing.measures import measure_summary_float
+from endgame_postprocessing.post_processing.compression import (
+    COMPRESSION_SUFFIXES,
+    OutputCompression,
+    open_text,
+)
+from endgame_postprocessing.post_processing.measures import (
+    calc_sustained_under_threshold_years,
+    measure_summary_float,
+    summarise_run_values,
+)
 from .constants import (
     DRAW_COLUMNN_NAME_START,
     MEASURE_COLUMN_NAME,
     PERCENTILES_TO_CALC,
     AGGEGATE_DEFAULT_TYPING_MAP,
     PROB_UNDER_THRESHOLD_MEASURE_NAME,
+    SUSTAINED_UNDER_THRESHOLD_YEAR_MEASURE_NAME,
 )
-from .file_util import post_process_file_generator
+from .canonical_manifest import canonical_file_generator
+from .draw_cube import DrawCube
 from .iu_data import IUData
 
 
@@ -73,6 +90,9 @@ def aggregate_post_processed_files(
     """
     Combines all data outputs in a given folder and filters as necessary. The format of the csv's in
     the folder should be the same output format of a call to `process_single_file`
+    Compressed files (e.g. matching "*.csv.gz") are also included.
+    path_to_files can also be a bundle (see output_directory_structure.OutputBundle), in which
+    case the matching entries of the bundle are combined.
 
     Args:
         path_to_files (str): the top level folder where the output files are located.
@@ -84,20 +104,39 @@ def aggregate_post_processed_files(
     rows = []
     columns = []
 
-    # To ensure path ends in a trailing slash
-    properly_terminated_path = os.path.join(path_to_files, "")
-    files_to_combine = sorted(
-        glob.glob(properly_terminated_path + "**/" + specific_files, recursive=True)
-    )
-    total_files = len(files_to_combine)
-    for filename in tqdm(files_to_combine, total=total_files, desc="Processing files"):
-        with open(filename, newline="") as f:
-            reader = csv.reader(f)
-            if len(columns) == 0:
-                columns = next(reader)
-            else:
-                next(reader)
-            rows.extend(reader)
+    with ExitStack() as stack:
+        if zipfile.is_zipfile(path_to_files):
+            bundle = stack.enter_context(zipfile.ZipFile(path_to_files))
+            files_to_combine = sorted(
+                name
+                for name in bundle.namelist()
+                if fnmatch.fnmatch(name, specific_files)
+                and name != output_directory_structure.OutputBundle.INDEX_FILE_NAME
+            )
+
+            def open_file(name):
+                return io.TextIOWrapper(bundle.open(name), newline="")
+        else:
+            # To ensure path ends in a trailing slash
+            properly_terminated_path = os.path.join(path_to_files, "")
+            files_to_combine = sorted(
+                file
+                for suffix in ["", *COMPRESSION_SUFFIXES.values()]
+                for file in glob.glob(
+                    properly_terminated_path + "**/" + specific_files + suffix, recursive=True
+                )
+            )
+            open_file = open_text
+
+        total_files = len(files_to_combine)
+        for filename in tqdm(files_to_combine, total=total_files, desc="Processing files"):
+            with open_file(filename) as f:
+                reader = csv.reader(f)
+                if len(columns) == 0:
+                    columns = next(reader)
+                else:
+                    next(reader)
+                rows.extend(reader)
     return pd.DataFrame(rows, columns=columns)
 
 
@@ -255,6 +294,18 @@ def _compute_proportion_ius_with_xpct_runs_under_threshold(
     # Shape: [P, M, 1]
     prop_draws_below_threshold_per_iu = mask_below_threshold.mean(axis=2, keepdims=True)
 
+    return _compute_proportion_ius_meeting_runs_threshold(
+        prop_draws_below_threshold_per_iu, pct_runs_threshold_array
+    )
+
+
+def _compute_proportion_ius_meeting_runs_threshold(
+    prop_draws_below_threshold_per_iu: np.ndarray, pct_runs_threshold_array: np.ndarray
+) -> np.ndarray:
+    """
+    As _compute_proportion_ius_with_xpct_runs_under_threshold, from the proportion of each
+    IU's draws below the threshold (shape: [P, M, 1]).
+    """
     # Identify, in every IU, draw proportions above thresholds in `pct_runs_threshold_array`
     # Shape: [P, M, K]
     ius_meet_runs_threshold = prop_draws_below_threshold_per_iu >= pct_runs_threshold_array
@@ -318,39 +369,101 @@ def _calc_extinction_metrics(
             )
         )
 
-        # Create DataFrame for the Metric 1
-        df_all_ius = pd.DataFrame(
-            {
-                canonical_columns.YEAR_ID: year_column,
-                canonical_columns.SCENARIO: scenario,
-                canonical_columns.MEASURE: "prob_all_ius_under_threshold",
-                "mean": prob_all_ius_under_threshold,
-            }
+        dfs[scenario] = _extinction_metrics_df(
+            scenario,
+            year_column,
+            prob_all_ius_under_threshold,
+            prop_ius_with_xpct_runs_under_threshold,
+            pct_runs_threshold,
         )
+    return dfs
 
-        # Create DataFrame for the Metric 2
-        df_prop_ius_columns = [
-            f"prop_ius_with_{int(x*100)}pct_runs_under_threshold" for x in pct_runs_threshold
-        ]
 
-        df_prop_ius = pd.DataFrame(
-            prop_ius_with_xpct_runs_under_threshold,
-            columns=df_prop_ius_columns,
-        )
-        df_prop_ius[canonical_columns.YEAR_ID] = year_column
-        df_prop_ius[canonical_columns.SCENARIO] = scenario
-        df_prop_ius = df_prop_ius.melt(
-            id_vars=[canonical_columns.YEAR_ID, canonical_columns.SCENARIO],
-            var_name=canonical_columns.MEASURE,
-            value_name="mean",
-        )
+def _extinction_metrics_df(
+    scenario,
+    year_column,
+    prob_all_ius_under_threshold: np.ndarray,
+    prop_ius_with_xpct_runs_under_threshold: np.ndarray,
+    pct_runs_threshold: List[float],
+) -> pd.DataFrame:
+    # Create DataFrame for the Metric 1
+    df_all_ius = pd.DataFrame(
+        {
+            canonical_columns.YEAR_ID: year_column,
+            canonical_columns.SCENARIO: scenario,
+            canonical_columns.MEASURE: "prob_all_ius_under_threshold",
+            "mean": prob_all_ius_under_threshold,
+        }
+    )
+
+    # Create DataFrame for the Metric 2
+    df_prop_ius_columns = [
+        f"prop_ius_with_{int(x*100)}pct_runs_under_threshold" for x in pct_runs_threshold
+    ]
+
+    df_prop_ius = pd.DataFrame(
+        prop_ius_with_xpct_runs_under_threshold,
+        columns=df_prop_ius_columns,
+    )
+    df_prop_ius[canonical_columns.YEAR_ID] = year_column
+    df_prop_ius[canonical_columns.SCENARIO] = scenario
+    df_prop_ius = df_prop_ius.melt(
+        id_vars=[canonical_columns.YEAR_ID, canonical_columns.SCENARIO],
+        var_name=canonical_columns.MEASURE,
+        value_name="mean",
+    )
 
-        # Combine results into a single DataFrame
-        dfs[scenario] = pd.concat([df_all_ius, df_prop_ius], axis=0)
+    # Combine results into a single DataFrame
+    return pd.concat([df_all_ius, df_prop_ius], axis=0)
+
+
+def _calc_extinction_metrics_from_country_partials(
+    country_partials: List["CountryPartial"],
+    extinction_threshold: float = 0.01,
+    pct_runs_threshold: List[float] = [0.5, 0.75, 0.9, 1.0],
+):
+    """
+    As _calc_extinction_metrics, from the partials of every country (see build_country_partials)
+    restricted to the same years, rather than the canonical IUs.
+    """
+    pct_runs_threshold_array = np.array(pct_runs_threshold).reshape(1, 1, -1)
+
+    dfs = {}
+    for scenario, partials in _country_partials_by_scenario(country_partials).items():
+        # Shape: [M,]
+        prob_all_ius_under_threshold = np.logical_and.reduce(
+            [
+                country_partial.all_ius_below_threshold[extinction_threshold]
+                for country_partial in partials
+            ]
+        ).mean(axis=1)
+        # Shape: [P, M, 1]
+        prop_draws_below_threshold_per_iu = np.concatenate(
+            [
+                country_partial.prop_draws_below_threshold[extinction_threshold]
+                for country_partial in partials
+            ]
+        )[:, :, np.newaxis]
+        dfs[scenario] = _extinction_metrics_df(
+            scenario,
+            partials[0].composite_columns[canonical_columns.YEAR_ID],
+            prob_all_ius_under_threshold,
+            _compute_proportion_ius_meeting_runs_threshold(
+                prop_draws_below_threshold_per_iu, pct_runs_threshold_array
+            ),
+            pct_runs_threshold,
+        )
     return dfs
 
 
-def aggregate_draws(composite_data: pd.DataFrame) -> pd.DataFrame:
+def aggregate_draws(
+    composite_data: pd.DataFrame, quantile_relative_accuracy: float | None = None
+) -> pd.DataFrame:
+    """
+    The mean, percentiles, std and median of the draws of each row of composite_data. If
+    quantile_relative_accuracy is given, the percentiles and median are estimated to within
+    that relative error without sorting the draws (see measures.measure_summary_float).
+    """
     draw_names = list(
         filter(
             lambda name: name.startswith(DRAW_COLUMNN_NAME_START),
@@ -365,6 +478,7 @@ def aggregate_draws(composite_data: pd.DataFrame) -> pd.DataFrame:
         age_start_loc=0,
         age_end_loc=0,
         draws_loc=[composite_data.columns.get_loc(name) for name in draw_names],
+        quantile_relative_accuracy=quantile_relative_accuracy,
     )
     statistical_aggregate_final = pd.DataFrame(
         statistical_aggregate,
@@ -382,19 +496,28 @@ def aggregate_draws(composite_data: pd.DataFrame) -> pd.DataFrame:
 def africa_composite(
     wd: str | os.PathLike | Path,
     iu_metadata: IUData,
+    compression: OutputCompression | None = None,
+    draw_cubes: List[DrawCube] | None = None,
+    bundle: output_directory_structure.OutputBundle | None = None,
 ) -> Tuple[List[pd.DataFrame], pd.DataFrame]:
-    canonical_ius = filter_to_maximum_year_range_for_all_ius(
-        [
-            pd.read_csv(iu.file_path)
+    if draw_cubes is not None:
+        all_canonical_ius = [
+            canonical_iu
+            for cube in tqdm(draw_cubes, desc="Building Africa composite run")
+            for canonical_iu in cube.canonical_iu_runs()
+        ]
+    else:
+        all_canonical_ius = [
+            canonicalise.read_canonical(
+                iu.file_path, canonicalise.COMPOSITE_COLUMNS, scenario=iu.scenario
+            )
             for iu in _tqdm_unknown_length(
-                post_process_file_generator(
-                    file_directory=output_directory_structure.get_canonical_dir(wd),
-                    end_of_file="_canonical.csv",
-                ),
+                canonical_file_generator(wd),
                 desc="Building Africa composite run",
             )
-        ],
-        keep_na_year_id=False
+        ]
+    canonical_ius = filter_to_maximum_year_range_for_all_ius(
+        all_canonical_ius, keep_na_year_id=False
     )
 
     composite = composite_run.build_composite_run_multiple_scenarios(
@@ -407,9 +530,178 @@ def africa_composite(
     # Currently the composite thing sticks a column for country based on the first IU which
     # isn't required for Africa, but this isn't a nice place to do this!
     # composite.drop(columns=[canonical_columns.COUNTRY_CODE], inplace=True)
-    output_directory_structure.write_africa_composite(wd, composite)
+    africa_composite_path = output_directory_structure.write_africa_composite(
+        wd, composite, compression, bundle
+    )
+    if bundle is not None:
+        return canonical_ius, bundle.read_csv(africa_composite_path)
+
+    return canonical_ius, pd.read_csv(africa_composite_path)
+
+
+@dataclass
+class CountryPartial:
+    """
+    What the Africa composite and aggregates need from the IUs of one country for one scenario,
+    so they can be built without reading the canonical IUs again.
+    """
+
+    # The year_id, scenario and measure columns of the composite
+    composite_columns: pd.DataFrame
+    years: np.ndarray
+    draw_columns: pd.Index
+    # The population weighted draws of the country's IUs, summed. Shape: [M, N]
+    summed_case_numbers: np.ndarray
+    # For each threshold, whether every IU is below it in each year and draw. Shape: [M, N]
+    all_ius_below_threshold: Dict[float, np.ndarray]
+    # For each threshold, the proportion of each IU's draws below it. Shape: [P, M]
+    prop_draws_below_threshold: Dict[float, np.ndarray]
+
+    def for_years(self, in_years: np.ndarray) -> "CountryPartial":
+        return CountryPartial(
+            composite_columns=self.composite_columns[in_years].reset_index(drop=True),
+            years=self.years[in_years],
+            draw_columns=self.draw_columns,
+            summed_case_numbers=self.summed_case_numbers[in_years],
+            all_ius_below_threshold={
+                threshold: below_threshold[in_years]
+                for threshold, below_threshold in self.all_ius_below_threshold.items()
+            },
+            prop_draws_below_threshold={
+                threshold: prop_draws[:, in_years]
+                for threshold, prop_draws in self.prop_draws_below_threshold.items()
+            },
+        )
+
+
+def build_country_partials(
+    canonical_iu_runs: List[pd.DataFrame], iu_metadata: IUData, thresholds: List[float]
+) -> List[CountryPartial]:
+    """
+    The partial of each scenario of a country, from the canonical IUs of the country (each
+    scenario's IUs together) filtered to the same years, as for the country's composite.
+    """
+    country_partials = []
+    for _, scenario_runs in itertools.groupby(
+        canonical_iu_runs, lambda run: run[canonical_columns.SCENARIO].iloc[0]
+    ):
+        scenario_runs = list(scenario_runs)
+        draw_columns, all_ius_draws = canonical_columns.extract_draws(scenario_runs)
+        populations = np.array(
+            [
+                iu_metadata.get_priority_population_for_IU(run[canonical_columns.IU_NAME].iloc[0])
+                for run in scenario_runs
+            ]
+        )[:, np.newaxis, np.newaxis]
+        country_partials.append(
+            country_partial_from_summed_case_numbers(
+                scenario_runs,
+                draw_columns,
+                all_ius_draws,
+                np.sum(all_ius_draws * populations, axis=0),
+                thresholds,
+            )
+        )
+    return country_partials
+
+
+def country_partial_from_summed_case_numbers(
+    scenario_runs: List[pd.DataFrame],
+    draw_columns: pd.Index,
+    all_ius_draws: np.ndarray,
+    summed_case_numbers: np.ndarray,
+    thresholds: List[float],
+) -> CountryPartial:
+    """
+    The partial of the IUs of one scenario of a country (see build_country_partials), whose
+    draws ([P, M, N]) and population weighted draws summed over the IUs are already known.
+    """
+    ius_below_thresholds = {threshold: all_ius_draws <= threshold for threshold in thresholds}
+    return CountryPartial(
+        composite_columns=scenario_runs[0][
+            [
+                canonical_columns.YEAR_ID,
+                canonical_columns.SCENARIO,
+                canonical_columns.MEASURE,
+            ]
+        ].reset_index(drop=True),
+        years=scenario_runs[0][canonical_columns.YEAR_ID].to_numpy(),
+        draw_columns=draw_columns,
+        summed_case_numbers=summed_case_numbers,
+        all_ius_below_threshold={
+            threshold: ius_below_threshold.all(axis=0)
+            for threshold, ius_below_threshold in ius_below_thresholds.items()
+        },
+        prop_draws_below_threshold={
+            threshold: ius_below_threshold.mean(axis=2)
+            for threshold, ius_below_threshold in ius_below_thresholds.items()
+        },
+    )
+
+
+def _country_partials_by_scenario(
+    country_partials: List[CountryPartial],
+) -> Dict[str, List[CountryPartial]]:
+    partials_by_scenario = {}
+    for country_partial in country_partials:
+        scenario = country_partial.composite_columns[canonical_columns.SCENARIO].iloc[0]
+        partials_by_scenario.setdefault(scenario, []).append(country_partial)
+    return partials_by_scenario
+
+
+def africa_composite_from_country_partials(
+    wd: str | os.PathLike | Path,
+    country_partials: List[CountryPartial],
+    iu_metadata: IUData,
+    compression: OutputCompression | None = None,
+    bundle: output_directory_structure.OutputBundle | None = None,
+) -> Tuple[List[CountryPartial], pd.DataFrame]:
+    """
+    As africa_composite, but sums the partials of the countries (see build_country_partials)
+    rather than reading every canonical IU again.
+
+    Returns:
+        The country partials restricted to the years every IU covers (for
+        africa_lvl_aggregate_from_country_partials) and the Africa composite.
+    """
+    first_year = max(country_partial.years.min() for country_partial in country_partials)
+    last_year = min(country_partial.years.max() for country_partial in country_partials)
+    africa_partials = [
+        country_partial.for_years(
+            (country_partial.years >= first_year) & (country_partial.years <= last_year)
+        )
+        for country_partial in country_partials
+    ]
+
+    africa_population = iu_metadata.get_priority_population_for_africa()
+    composite = pd.concat(
+        [
+            pd.concat(
+                [
+                    partials[0].composite_columns,
+                    pd.DataFrame(
+                        np.sum(
+                            [country_partial.summed_case_numbers for country_partial in partials],
+                            axis=0,
+                        )
+                        / africa_population,
+                        columns=partials[0].draw_columns,
+                    ),
+                ],
+                axis=1,
+            )
+            for partials in _country_partials_by_scenario(africa_partials).values()
+        ],
+        ignore_index=True,
+    )
+
+    africa_composite_path = output_directory_structure.write_africa_composite(
+        wd, composite, compression, bundle
+    )
+    if bundle is not None:
+        return africa_partials, bundle.read_csv(africa_composite_path)
 
-    return canonical_ius, pd.read_csv(Path(wd) / "composite/africa_composite.csv")
+    return africa_partials, pd.read_csv(africa_composite_path)
 
 
 def africa_lvl_aggregate(
@@ -417,6 +709,7 @@ def africa_lvl_aggregate(
     composite_africa: pd.DataFrame,
     prevalence_threshold: float = 0.01,
     pct_runs_threshold: List[float] = [0.9],
+    quantile_relative_accuracy: float | None = None,
 ) -> pd.DataFrame:
     """
     Aggregates continent level prevalence and probability of extinction data.
@@ -428,6 +721,8 @@ def africa_lvl_aggregate(
          of extinction. Defaults to 0.01.
         pct_runs_threshold (float): The fraction of draws that must be below the threshold when
         computing the `prop_ius_with_pct_runs_under_threshold`. Defaults to 0.9.
+        quantile_relative_accuracy (float | None): If given, the percentiles of the prevalence
+        are estimated to within this relative error (see aggregate_draws).
 
     Returns:
         pd.DataFrame: A dataframe with aggregated prevalence metrics and extinction probabilities.
@@ -435,9 +730,31 @@ def africa_lvl_aggregate(
     extinction_dfs = _calc_extinction_metrics(
         canonical_ius, prevalence_threshold, pct_runs_threshold
     )
+    return _africa_aggregates(extinction_dfs, composite_africa, quantile_relative_accuracy)
 
+
+def africa_lvl_aggregate_from_country_partials(
+    country_partials: List["CountryPartial"],
+    composite_africa: pd.DataFrame,
+    prevalence_threshold: float = 0.01,
+    pct_runs_threshold: List[float] = [0.9],
+    quantile_relative_accuracy: float | None = None,
+) -> pd.DataFrame:
+    """
+    As africa_lvl_aggregate, from the country partials returned by
+    africa_composite_from_country_partials rather than the canonical IUs.
+    """
+    extinction_dfs = _calc_extinction_metrics_from_country_partials(
+        country_partials, prevalence_threshold, pct_runs_threshold
+    )
+    return _africa_aggregates(extinction_dfs, composite_africa, quantile_relative_accuracy)
+
+
+def _africa_aggregates(
+    extinction_dfs, composite_africa: pd.DataFrame, quantile_relative_accuracy=None
+) -> pd.DataFrame:
     # Collapse the prevalence from all the draws into an average metric
-    africa_statistical_aggregate = aggregate_draws(composite_africa)
+    africa_statistical_aggregate = aggregate_draws(composite_africa, quantile_relative_accuracy)
     general_columns = composite_africa[
         [
             canonical_columns.SCENARIO,
@@ -472,20 +789,92 @@ def africa_lvl_aggregate(
     return africa_prevalence_df
 
 
-def single_country_aggregate(composite_country_run: pd.DataFrame) -> pd.DataFrame:
-    country_statistical_aggregates = aggregate_draws(composite_country_run)
+def single_country_aggregate(
+    composite_country_run: pd.DataFrame, quantile_relative_accuracy: float | None = None
+) -> pd.DataFrame:
+    return single_group_aggregate(
+        composite_country_run, canonical_columns.COUNTRY_CODE, quantile_relative_accuracy
+    )
 
-    general_columns = composite_country_run[
+
+def single_group_aggregate(
+    composite_group_run: pd.DataFrame,
+    group_column: str,
+    quantile_relative_accuracy: float | None = None,
+) -> pd.DataFrame:
+    """
+    The statistical aggregates of the composite of a group of IUs (e.g. a country), which has
+    the group in group_column. See aggregate_draws for quantile_relative_accuracy.
+    """
+    group_statistical_aggregates = aggregate_draws(composite_group_run, quantile_relative_accuracy)
+
+    general_columns = composite_group_run[
         [
             canonical_columns.SCENARIO,
-            canonical_columns.COUNTRY_CODE,
+            group_column,
         ]
     ]
 
-    country_aggregates_complete = pd.concat(
-        [general_columns, country_statistical_aggregates], axis=1
+    group_aggregates_complete = pd.concat(
+        [general_columns, group_statistical_aggregates], axis=1
     )
-    return country_aggregates_complete[
+    return group_aggregates_complete[
+        [
+            canonical_columns.SCENARIO,
+            group_column,
+            canonical_columns.MEASURE,
+            "year_id",
+            "mean",
+        ]
+        + [f"{p}_percentile" for p in PERCENTILES_TO_CALC]
+        + ["standard_deviation", "median"]
+    ]
+
+
+def country_sustained_under_threshold_year(
+    composite_country_run: pd.DataFrame, threshold: float
+) -> pd.DataFrame:
+    """
+    Summarises, for each scenario, the year from which each draw of the country's composite
+    prevalence is under the threshold and stays under it (the same measure as the IU level
+    year_of_sustained_under_threshold).
+
+    Args:
+        composite_country_run (pd.DataFrame): The composite run of a country
+                                            (see composite_run.build_composite_run).
+        threshold (float): The prevalence threshold.
+
+    Returns:
+        pd.DataFrame: A row for each scenario, with the columns of single_country_aggregate.
+    """
+    summaries = []
+    for scenario, scenario_run in composite_country_run.groupby(
+        canonical_columns.SCENARIO, sort=False
+    ):
+        scenario_run = scenario_run.sort_values(canonical_columns.YEAR_ID)
+        _, draws = canonical_columns.extract_draws([scenario_run])
+        summary = pd.DataFrame(
+            summarise_run_values(
+                calc_sustained_under_threshold_years(
+                    draws[0], threshold, scenario_run[canonical_columns.YEAR_ID]
+                ),
+                SUSTAINED_UNDER_THRESHOLD_YEAR_MEASURE_NAME,
+            ),
+            columns=["year_id", "age_start", "age_end", canonical_columns.MEASURE, "mean"]
+            + [f"{p}_percentile" for p in PERCENTILES_TO_CALC]
+            + ["standard_deviation", "median"],
+        )
+        summaries.append(
+            summary.drop(columns=["age_start", "age_end"]).assign(
+                **{
+                    canonical_columns.SCENARIO: scenario,
+                    canonical_columns.COUNTRY_CODE: scenario_run[
+                        canonical_columns.COUNTRY_CODE
+                    ].iloc[0],
+                }
+            )
+        )
+    return pd.concat(summaries, ignore_index=True)[
         [
             canonical_columns.SCENARIO,
             canonical_columns.COUNTRY_CODE,
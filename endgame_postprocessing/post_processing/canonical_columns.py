@@ -6,6 +6,7 @@ from numpy import ndarray, dtype
 
 SCENARIO = "scenario"
 COUNTRY_CODE = "country_code"
+GROUP = "group"
 IU_NAME = "iu_name"
 YEAR_ID = "year_id"
 MEASURE = "measure"
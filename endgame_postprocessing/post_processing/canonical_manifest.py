@@ -0,0 +1,107 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Generator, Iterable
+
+from endgame_postprocessing.post_processing import file_catalog, output_directory_structure
+from endgame_postprocessing.post_processing.compression import strip_compression_suffix
+from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
+
+MANIFEST_FILE_NAME = "canonical_manifest.json"
+
+
+def get_manifest_path(working_directory) -> Path:
+    return Path(working_directory) / MANIFEST_FILE_NAME
+
+
+def write_canonical_manifest(
+    working_directory, source_canonical_dir, scenarios: Dict[str, Dict[str, str]]
+) -> Path:
+    """
+    Writes a manifest describing the canonical results of working_directory as a view onto
+    the canonical results in source_canonical_dir, rather than copying them.
+
+    Args:
+        working_directory: The pipeline's working directory (where canonical_results/ would be).
+        source_canonical_dir: The canonical_results directory the IUs are read from.
+        scenarios: For each scenario of the view, a map from each IU to the scenario in
+            source_canonical_dir to read it from,
+            e.g. {"scenario_x1": {"CAF09661": "scenario_1", "CAF09662": "scenario_0"}}
+
+    Returns:
+        The path of the manifest
+    """
+    manifest_path = get_manifest_path(working_directory)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        # Relative to the manifest, so the two can be moved together
+        "source_dir": os.path.relpath(source_canonical_dir, manifest_path.parent),
+        "scenarios": {
+            scenario: dict(sorted(source_scenarios.items()))
+            for scenario, source_scenarios in scenarios.items()
+        },
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=4))
+    return manifest_path
+
+
+def _find_source_file(iu_dir: Path, end_of_file: str):
+    source_files = (
+        sorted(
+            file_path
+            for file_path in iu_dir.iterdir()
+            if strip_compression_suffix(file_path.name).endswith(end_of_file)
+        )
+        if iu_dir.is_dir()
+        else []
+    )
+    if len(source_files) != 1:
+        raise Exception(
+            f"Expected exactly one {end_of_file} file in {iu_dir}, found {len(source_files)}"
+        )
+    return source_files[0]
+
+
+def manifest_file_generator(
+    working_directory, end_of_file: str = "_canonical.csv"
+) -> Generator[CustomFileInfo, None, None]:
+    """
+    Yields a CustomFileInfo for every IU of every scenario in the working directory's manifest
+    (see write_canonical_manifest).
+
+    The scenario is the scenario of the view, but the file path is that of the source scenario,
+    so the scenario column must be replaced when reading it (see canonicalise.read_canonical).
+    """
+    manifest_path = get_manifest_path(working_directory)
+    manifest = json.loads(manifest_path.read_text())
+    source_dir = manifest_path.parent / manifest["source_dir"]
+    scenarios = manifest["scenarios"]
+
+    for scenario_index, (scenario, source_scenarios) in enumerate(scenarios.items()):
+        for iu, source_scenario in source_scenarios.items():
+            country = iu[:3]
+            yield CustomFileInfo(
+                scenario_index,
+                len(scenarios),
+                scenario,
+                country,
+                iu,
+                str(_find_source_file(source_dir / source_scenario / country / iu, end_of_file)),
+            )
+
+
+def canonical_file_generator(
+    working_directory, end_of_file: str = "_canonical.csv", index_path=None
+) -> Iterable[CustomFileInfo]:
+    """
+    Yields the canonical result files of working_directory: those listed by its manifest if
+    it has one, otherwise those in its canonical_results directory (see
+    file_catalog.catalog_files, index_path is passed on to that).
+    """
+    if get_manifest_path(working_directory).exists():
+        return manifest_file_generator(working_directory, end_of_file)
+    return file_catalog.catalog_files(
+        output_directory_structure.get_canonical_dir(working_directory),
+        end_of_file,
+        index_path,
+    )
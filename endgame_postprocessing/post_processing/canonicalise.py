@@ -1,41 +1,174 @@
+import os
+from collections import defaultdict
+
+import numpy as np
 import pandas as pd
 
 from endgame_postprocessing.post_processing import canonical_columns
 from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
 
+RAW_READ_CHUNK_SIZE = 10_000
+
+CANONICAL_STRING_COLUMNS = [
+    canonical_columns.SCENARIO,
+    canonical_columns.COUNTRY_CODE,
+    canonical_columns.IU_NAME,
+    canonical_columns.MEASURE,
+]
+# Written as whole numbers, so read back as ints (as pandas would infer)
+CANONICAL_INTEGER_COLUMNS = [canonical_columns.YEAR_ID, "age_start", "age_end"]
+# The columns (other than the draws) needed to build a composite run
+COMPOSITE_COLUMNS = [
+    canonical_columns.SCENARIO,
+    canonical_columns.COUNTRY_CODE,
+    canonical_columns.IU_NAME,
+    canonical_columns.YEAR_ID,
+    canonical_columns.MEASURE,
+]
+
+# Canonical results that have already been read, by path (see preload_canonical)
+_preloaded_canonical = {}
+
+
+def _preload_key(file_path) -> str:
+    return os.path.normpath(os.path.abspath(file_path))
+
+
+def preload_canonical(file_paths):
+    """
+    Reads the canonical results at file_paths into memory, so that read_canonical returns
+    a copy of these rather than reading the files again.
+
+    Returns:
+        All the preloaded results, which can be given to use_preloaded_canonical in another
+        process.
+    """
+    for file_path in file_paths:
+        _preloaded_canonical[_preload_key(file_path)] = read_canonical(file_path)
+    return dict(_preloaded_canonical)
+
+
+def use_preloaded_canonical(preloaded_canonical):
+    """Makes read_canonical return copies of preloaded_canonical (from preload_canonical)"""
+    _preloaded_canonical.clear()
+    _preloaded_canonical.update(preloaded_canonical)
+
+
+def clear_preloaded_canonical():
+    _preloaded_canonical.clear()
+
+
+def read_raw_measure(
+        file_path, measure_name: str, chunksize: int = RAW_READ_CHUNK_SIZE
+) -> pd.DataFrame:
+    """
+    Reads a raw model output file, keeping only the rows for a single measure.
+
+    The file is parsed in chunks of `chunksize` rows and each chunk is filtered as soon as it is
+    parsed, so rows for other measures (e.g. 15 of the 16 oncho measures) are never held in
+    memory all at once, and never have the canonical columns added to them.
+
+    Args:
+        file_path: The path to the raw CSV.
+        measure_name (str): The value of the measure column to keep.
+        chunksize (int): The number of rows to parse at a time.
+
+    Returns:
+        A dataframe with all of the columns of the raw file, but only the rows for measure_name
+    """
+    filtered_chunks = []
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        if canonical_columns.MEASURE not in chunk.columns:
+            raise Exception(f"Could not find {canonical_columns.MEASURE} column")
+        filtered_chunks.append(chunk.loc[chunk[canonical_columns.MEASURE] == measure_name])
+    return pd.concat(filtered_chunks, ignore_index=True)
+
+
+def read_canonical(
+        file_path, columns: list[str] = None, engine: str = None, scenario: str = None
+) -> pd.DataFrame:
+    """
+    Reads a canonical results CSV (as written by output_directory_structure.write_canonical)
+    with a fixed schema, rather than pandas inferring the type of every draw column.
+
+    Args:
+        file_path: The path to the canonical CSV.
+        columns (list[str]): The columns, other than the draws, to read. The draws are always
+            read. Defaults to None, meaning every column.
+        engine (str): The pandas CSV parser to use (e.g. "pyarrow" if installed). Defaults to
+            None, meaning pandas' default.
+        scenario (str): If given, replaces the scenario column (e.g. when the file is read
+            as part of a mixed scenario, see canonical_manifest). Defaults to None.
+
+    Returns:
+        The canonical results (a copy of the preloaded results if the file has been preloaded
+        with preload_canonical), with the draws as floats, the string columns as strings and
+        the year / age columns as ints if they are all whole numbers.
+    """
+    usecols = None
+    if columns is not None:
+        usecols = lambda column: column in columns or column.startswith("draw_")  # noqa: E731
+
+    preloaded = _preloaded_canonical.get(_preload_key(file_path)) if _preloaded_canonical else None
+    if preloaded is not None:
+        canonical = preloaded.loc[
+            :, [column for column in preloaded.columns if usecols is None or usecols(column)]
+        ].copy()
+    else:
+        dtype = defaultdict(
+            lambda: np.float64, {column: str for column in CANONICAL_STRING_COLUMNS}
+        )
+        canonical = pd.read_csv(file_path, dtype=dtype, usecols=usecols, engine=engine)
+
+        for column in CANONICAL_INTEGER_COLUMNS:
+            if column not in canonical.columns:
+                continue
+            values = canonical[column]
+            if values.notna().all() and (values % 1 == 0).all():
+                canonical[column] = values.astype(np.int64)
+
+    if scenario is not None and canonical_columns.SCENARIO in canonical.columns:
+        canonical[canonical_columns.SCENARIO] = scenario
+    return canonical
+
 
 def canonicalise_raw(
         raw: pd.DataFrame, file_info: CustomFileInfo, processed_prevalence_name: str
 ):
-    raw.insert(0, canonical_columns.SCENARIO, file_info.scenario)
-    raw.insert(1, canonical_columns.COUNTRY_CODE, file_info.country)
-    raw.insert(2, canonical_columns.IU_NAME, file_info.iu)
-    filtered_data = raw.query(f"measure == '{processed_prevalence_name}'")
+    if canonical_columns.MEASURE not in raw.columns:
+        raise Exception(f"Could not find {canonical_columns.MEASURE} column")
+
+    filtered_data = raw.loc[raw[canonical_columns.MEASURE] == processed_prevalence_name]
     if len(filtered_data) == 0:
         raise Exception(
             f"No rows in {file_info.file_path} with measure {processed_prevalence_name}"
         )
-    filtered_data.loc[:, "measure"] = canonical_columns.PROCESSED_PREVALENCE
 
     if canonical_columns.YEAR_ID not in raw.columns:
         raise Exception(f"Could not find {canonical_columns.YEAR_ID} column")
 
-    if canonical_columns.MEASURE not in raw.columns:
-        raise Exception(f"Could not find {canonical_columns.MEASURE} column")
-
-    canonical_column_names = [
-        canonical_columns.SCENARIO,
-        canonical_columns.COUNTRY_CODE,
-        canonical_columns.IU_NAME,
-        canonical_columns.YEAR_ID,
-        # TODO: canonical shouldn't need the age_start / age_end but these are assumed present later
-        "age_start",
-        "age_end",
-        canonical_columns.MEASURE,
-    ]
+    # The canonical columns are only added to the rows for the selected measure
     only_canonical_columns = pd.concat(
-        [filtered_data.loc[:, canonical_column_names], filtered_data.loc[:, "draw_0":]],
+        [
+            filtered_data.loc[
+                :,
+                [
+                    canonical_columns.YEAR_ID,
+                    # TODO: canonical shouldn't need the age_start / age_end but these are
+                    # assumed present later
+                    "age_start",
+                    "age_end",
+                ],
+            ],
+            filtered_data.loc[:, "draw_0":],
+        ],
         axis="columns",
+    ).reset_index(drop=True)
+    only_canonical_columns.insert(0, canonical_columns.SCENARIO, file_info.scenario)
+    only_canonical_columns.insert(1, canonical_columns.COUNTRY_CODE, file_info.country)
+    only_canonical_columns.insert(2, canonical_columns.IU_NAME, file_info.iu)
+    only_canonical_columns.insert(
+        6, canonical_columns.MEASURE, canonical_columns.PROCESSED_PREVALENCE
     )
 
-    return only_canonical_columns.reset_index(drop=True)
+    return only_canonical_columns
@@ -1,14 +1,20 @@
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 
 from endgame_postprocessing.post_processing import (
     canonical_file_name,
+    canonicalise,
     file_util,
     output_directory_structure, canonical_columns,
 )
 
 
+# Matches the canonical results whether or not they are compressed (e.g. .csv.gz)
+CANONICAL_FILES_GLOB = "**/*.csv*"
+
+
 class MissingHistoricDataException(Warning):
     def __init__(self, iu):
         super().__init__(f"Missing IU: {iu} in historic data")
@@ -19,43 +25,88 @@ class MismatchedColumnsException(Warning):
         super().__init__(f"{iu} different columns in historic and forward projection")
 
 
-def _all_columns_match(df1: pd.DataFrame, df2: pd.DataFrame):
-    matching_columns = df1.columns.intersection(df2.columns)
-    return len(matching_columns) == len(df1.columns)
+def _all_columns_match(historic_columns: pd.Index, forward_columns: pd.Index):
+    matching_columns = historic_columns.intersection(forward_columns)
+    return len(matching_columns) == len(historic_columns)
+
+
+def _combine_single_iu(historic_file, forward_file, output_path, compression=None) -> bool:
+    """
+    Prepends the history for a single IU to its forward projection and writes the result.
+
+    Returns False (without writing anything) if the columns of the two files do not match.
+    """
+    forward_data = canonicalise.read_canonical(forward_file.file_path)
+
+    # Only the header is needed to check the columns match, so the body of the historic
+    # file is not parsed at all if they don't
+    historic_columns = pd.read_csv(historic_file.file_path, nrows=0).columns
+    if not _all_columns_match(historic_columns, forward_data.columns):
+        return False
+
+    first_year_of_forward_data = forward_data[canonical_columns.YEAR_ID].min()
+    historic_data = canonicalise.read_canonical(historic_file.file_path)
+    historic_data_up_to_start = historic_data.loc[
+        historic_data[canonical_columns.YEAR_ID] < first_year_of_forward_data
+        ]
+
+    all_data = pd.concat([historic_data_up_to_start, forward_data])
+    all_data["scenario"] = forward_file.scenario
+    output_directory_structure.write_canonical(output_path, forward_file, all_data, compression)
+    return True
 
 
 def combine_historic_and_forward(
-        historic_canonical_data_path, forward_canonical_data_path, output_path
+        historic_canonical_data_path,
+        forward_canonical_data_path,
+        output_path,
+        num_jobs=1,
+        output_compression=None,
 ):
+    """
+    Prepends the historic canonical results to the forward projection canonical results for
+    each IU, writing the combined canonical results to output_path.
+
+    IUs are processed on num_jobs threads, so reading one IU overlaps with writing another.
+    Warnings are raised in the same order as the forward files regardless of num_jobs.
+    If output_compression is given the combined canonical results are written compressed.
+    The historic and forward canonical results may themselves be compressed.
+    """
     historic_data_file_infos = {
         file_info.iu: file_info
         for file_info in file_util.get_flat_regex(
             canonical_file_name.get_regex(),
             historic_canonical_data_path,
+            glob_expression=CANONICAL_FILES_GLOB,
         )
     }
 
     forward_data_file_infos = file_util.get_flat_regex(
         canonical_file_name.get_regex(),
         forward_canonical_data_path,
+        glob_expression=CANONICAL_FILES_GLOB,
     )
-    for forward_file in forward_data_file_infos:
-        if forward_file.iu not in historic_data_file_infos:
-            warnings.warn(MissingHistoricDataException(forward_file.iu))
-            continue
-        historic_file = historic_data_file_infos[forward_file.iu]
-        historic_data = pd.read_csv(historic_file.file_path)
-        forward_data = pd.read_csv(forward_file.file_path)
-
-        if not _all_columns_match(historic_data, forward_data):
-            warnings.warn(MismatchedColumnsException(forward_file.iu))
-            continue
-
-        first_year_of_forward_data = forward_data[canonical_columns.YEAR_ID].min()
-        historic_data_up_to_start = historic_data.loc[
-            historic_data[canonical_columns.YEAR_ID] < first_year_of_forward_data
-            ]
-
-        all_data = pd.concat([historic_data_up_to_start, forward_data])
-        all_data["scenario"] = forward_file.scenario
-        output_directory_structure.write_canonical(output_path, forward_file, all_data)
+    with ThreadPoolExecutor(max_workers=num_jobs) as executor:
+        combined_ius = [
+            (
+                forward_file,
+                executor.submit(
+                    _combine_single_iu,
+                    historic_data_file_infos[forward_file.iu],
+                    forward_file,
+                    output_path,
+                    output_compression,
+                )
+                if forward_file.iu in historic_data_file_infos
+                else None,
+            )
+            for forward_file in forward_data_file_infos
+        ]
+
+        for forward_file, combined_iu in combined_ius:
+            if combined_iu is None:
+                warnings.warn(MissingHistoricDataException(forward_file.iu))
+                continue
+
+            if not combined_iu.result():
+                warnings.warn(MismatchedColumnsException(forward_file.iu))
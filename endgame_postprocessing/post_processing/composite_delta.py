@@ -0,0 +1,291 @@
+import itertools
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from endgame_postprocessing.post_processing import canonical_columns
+from endgame_postprocessing.post_processing.aggregation import (
+    CountryPartial,
+    country_partial_from_summed_case_numbers,
+    filter_to_maximum_year_range_for_all_ius,
+)
+from endgame_postprocessing.post_processing.iu_data import IUData
+
+_COMPOSITE_COLUMNS = [
+    canonical_columns.YEAR_ID,
+    canonical_columns.SCENARIO,
+    canonical_columns.COUNTRY_CODE,
+    canonical_columns.MEASURE,
+]
+
+
+@dataclass
+class _CountryCases:
+    """The population weighted draws of every IU in a country, summed"""
+
+    # The year_id, scenario, country_code and measure columns of the composite
+    composite_columns: pd.DataFrame
+    years: np.ndarray
+    draw_columns: pd.Index
+    # [year x draw]
+    summed_case_numbers: np.ndarray
+
+
+class CompositeDeltaEngine:
+    """
+    Builds the country and Africa composites (see composite_run.build_composite_run) for a
+    mixed scenario, which takes most IUs from a default scenario and overrides a few with
+    IUs from other scenarios.
+
+    The summed case numbers of each country of each scenario are cached, so a mixed scenario
+    only sums the IUs of the countries with overridden IUs again (taking each from the default
+    scenario or its override), the other countries reuse the default scenario's sums. The
+    IUs of a country are summed in order of IU code and Africa is summed from the countries
+    (as aggregation.africa_composite_from_country_partials), as the pipeline does for a
+    canonical manifest, so the composites match a full build exactly.
+    """
+
+    def __init__(self, iu_data: IUData):
+        self.iu_data = iu_data
+        self._canonical_iu_runs = {}
+        self._country_cases = {}
+        self._iu_populations = {}
+
+    def add_scenario(self, scenario: str, canonical_iu_runs: List[pd.DataFrame]):
+        """Caches the summed case numbers for each country of scenario"""
+        canonical_iu_runs_by_iu = {
+            canonical_iu_run[canonical_columns.IU_NAME].iloc[0]: canonical_iu_run
+            for canonical_iu_run in canonical_iu_runs
+        }
+        self._canonical_iu_runs[scenario] = canonical_iu_runs_by_iu
+        for country, ius in self._ius_by_country(canonical_iu_runs_by_iu).items():
+            self._country_cases[(scenario, country)] = self._sum_country(
+                [canonical_iu_runs_by_iu[iu] for iu in ius]
+            )
+
+    def countries(self, scenario: str) -> List[str]:
+        return sorted(
+            country
+            for cached_scenario, country in self._country_cases
+            if cached_scenario == scenario
+        )
+
+    def affected_countries(self, overridden_ius: Dict[str, List[str]]) -> List[str]:
+        """The countries whose composites are changed by overridden_ius"""
+        return sorted(
+            {
+                self._canonical_iu_country(scenario, iu)
+                for scenario, ius in overridden_ius.items()
+                for iu in ius
+            }
+        )
+
+    def country_composites(
+        self,
+        scenario_name: str,
+        default_scenario: str,
+        overridden_ius: Dict[str, List[str]],
+        iu_data: Optional[IUData] = None,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        The composite for each country of the mixed scenario, labelled scenario_name.
+
+        Args:
+            scenario_name: The name of the mixed scenario.
+            default_scenario: The scenario to take the IUs that are not overridden from
+                (must have been added with add_scenario).
+            overridden_ius: For each scenario (also added), the IUs to take from it.
+            iu_data: The IU data to take the countries' populations from. Defaults to the
+                engine's.
+        """
+        iu_data = iu_data if iu_data is not None else self.iu_data
+        mixed_country_cases = self._mixed_country_cases(default_scenario, overridden_ius)
+        return {
+            country: self._composite(
+                country_cases,
+                scenario_name,
+                iu_data.get_priority_population_for_country(country),
+            )
+            for country, country_cases in mixed_country_cases.items()
+        }
+
+    def africa_composite(
+        self,
+        scenario_name: str,
+        default_scenario: str,
+        overridden_ius: Dict[str, List[str]],
+        iu_data: Optional[IUData] = None,
+    ) -> pd.DataFrame:
+        """The Africa composite of the mixed scenario (see country_composites)"""
+        iu_data = iu_data if iu_data is not None else self.iu_data
+        all_country_cases = list(
+            self._mixed_country_cases(default_scenario, overridden_ius).values()
+        )
+        # The Africa composite covers only the years every IU covers
+        first_year = max(country_cases.years.min() for country_cases in all_country_cases)
+        last_year = min(country_cases.years.max() for country_cases in all_country_cases)
+        in_years = [
+            (country_cases.years >= first_year) & (country_cases.years <= last_year)
+            for country_cases in all_country_cases
+        ]
+        africa_cases = _CountryCases(
+            composite_columns=all_country_cases[0].composite_columns[in_years[0]],
+            years=all_country_cases[0].years[in_years[0]],
+            draw_columns=all_country_cases[0].draw_columns,
+            summed_case_numbers=np.sum(
+                [
+                    country_cases.summed_case_numbers[country_in_years]
+                    for country_cases, country_in_years in zip(all_country_cases, in_years)
+                ],
+                axis=0,
+            ),
+        )
+        return self._composite(
+            africa_cases,
+            scenario_name,
+            iu_data.get_priority_population_for_africa(),
+            is_africa=True,
+        )
+
+    def country_partials(
+        self,
+        scenario_name: str,
+        default_scenario: str,
+        overridden_ius: Dict[str, List[str]],
+        thresholds: List[float],
+    ) -> List[CountryPartial]:
+        """
+        The partial of each country of the mixed scenario (see
+        aggregation.build_country_partials), from the cached summed case numbers.
+        """
+        mixed_country_cases = self._mixed_country_cases(default_scenario, overridden_ius)
+        canonical_iu_runs_by_country = itertools.groupby(
+            self._mixed_canonical_iu_runs(default_scenario, overridden_ius),
+            lambda canonical_iu_run: canonical_iu_run[canonical_columns.COUNTRY_CODE].iloc[0],
+        )
+        country_partials = []
+        for country, canonical_iu_runs in canonical_iu_runs_by_country:
+            filtered_iu_runs = [
+                canonical_iu_run.assign(**{canonical_columns.SCENARIO: scenario_name})
+                for canonical_iu_run in filter_to_maximum_year_range_for_all_ius(
+                    list(canonical_iu_runs), keep_na_year_id=False
+                )
+            ]
+            draw_columns, all_ius_draws = canonical_columns.extract_draws(filtered_iu_runs)
+            country_partials.append(
+                country_partial_from_summed_case_numbers(
+                    filtered_iu_runs,
+                    draw_columns,
+                    all_ius_draws,
+                    mixed_country_cases[country].summed_case_numbers,
+                    thresholds,
+                )
+            )
+        return country_partials
+
+    def _mixed_country_cases(self, default_scenario, overridden_ius) -> Dict[str, _CountryCases]:
+        mixed_country_cases = {
+            country: self._country_cases[(default_scenario, country)]
+            for country in self.countries(default_scenario)
+        }
+        affected_countries = self.affected_countries(overridden_ius)
+        mixed_canonical_iu_runs = self._mixed_canonical_iu_runs(default_scenario, overridden_ius)
+        for country in affected_countries:
+            mixed_country_cases[country] = self._sum_country(
+                [
+                    canonical_iu_run
+                    for canonical_iu_run in mixed_canonical_iu_runs
+                    if canonical_iu_run[canonical_columns.COUNTRY_CODE].iloc[0] == country
+                ]
+            )
+        return dict(sorted(mixed_country_cases.items()))
+
+    def _mixed_canonical_iu_runs(self, default_scenario, overridden_ius) -> List[pd.DataFrame]:
+        canonical_iu_runs = dict(self._canonical_iu_runs[default_scenario])
+        for scenario, ius in overridden_ius.items():
+            for iu in ius:
+                canonical_iu_runs[iu] = self._canonical_iu_runs[scenario][iu]
+        return [canonical_iu_runs[iu] for iu in sorted(canonical_iu_runs)]
+
+    def _sum_country(self, canonical_iu_runs) -> _CountryCases:
+        filtered_iu_runs = filter_to_maximum_year_range_for_all_ius(
+            sorted(
+                canonical_iu_runs,
+                key=lambda canonical_iu_run: canonical_iu_run[canonical_columns.IU_NAME].iloc[0],
+            ),
+            keep_na_year_id=False,
+        )
+        draw_columns, all_ius_draws = canonical_columns.extract_draws(filtered_iu_runs)
+        populations = np.array(
+            [self._iu_population(iu_run) for iu_run in filtered_iu_runs]
+        )[:, np.newaxis, np.newaxis]
+        return _CountryCases(
+            composite_columns=filtered_iu_runs[0][_COMPOSITE_COLUMNS],
+            years=filtered_iu_runs[0][canonical_columns.YEAR_ID].to_numpy(),
+            draw_columns=draw_columns,
+            summed_case_numbers=np.sum(all_ius_draws * populations, axis=0),
+        )
+
+    def _iu_population(self, canonical_iu_run):
+        iu = canonical_iu_run[canonical_columns.IU_NAME].iloc[0]
+        if iu not in self._iu_populations:
+            self._iu_populations[iu] = self.iu_data.get_priority_population_for_IU(iu)
+        return self._iu_populations[iu]
+
+    def _canonical_iu_country(self, scenario, iu):
+        if iu not in self._canonical_iu_runs[scenario]:
+            raise Exception(f"IU {iu} not found in {scenario}")
+        return self._canonical_iu_runs[scenario][iu][canonical_columns.COUNTRY_CODE].iloc[0]
+
+    @staticmethod
+    def _ius_by_country(canonical_iu_runs_by_iu):
+        ius_by_country = defaultdict(list)
+        for iu, canonical_iu_run in canonical_iu_runs_by_iu.items():
+            ius_by_country[canonical_iu_run[canonical_columns.COUNTRY_CODE].iloc[0]].append(iu)
+        return ius_by_country
+
+    @staticmethod
+    def _composite(country_cases: _CountryCases, scenario_name, total_population, is_africa=False):
+        composite_columns = country_cases.composite_columns.reset_index(drop=True).assign(
+            **{canonical_columns.SCENARIO: scenario_name}
+        )
+        if is_africa:
+            composite_columns = composite_columns.drop(columns=[canonical_columns.COUNTRY_CODE])
+        return pd.concat(
+            [
+                composite_columns,
+                pd.DataFrame(
+                    country_cases.summed_case_numbers / total_population,
+                    columns=country_cases.draw_columns,
+                ),
+            ],
+            axis=1,
+        )
+
+
+@dataclass
+class MixedScenario:
+    """A mixed scenario (see CompositeDeltaEngine) of the scenarios added to engine"""
+
+    engine: CompositeDeltaEngine
+    scenario_name: str
+    default_scenario: str
+    overridden_ius: Dict[str, List[str]]
+
+    def country_composites(self, iu_data: Optional[IUData] = None) -> Dict[str, pd.DataFrame]:
+        return self.engine.country_composites(
+            self.scenario_name, self.default_scenario, self.overridden_ius, iu_data
+        )
+
+    def africa_composite(self, iu_data: Optional[IUData] = None) -> pd.DataFrame:
+        return self.engine.africa_composite(
+            self.scenario_name, self.default_scenario, self.overridden_ius, iu_data
+        )
+
+    def country_partials(self, thresholds: List[float]) -> List[CountryPartial]:
+        return self.engine.country_partials(
+            self.scenario_name, self.default_scenario, self.overridden_ius, thresholds
+        )
@@ -0,0 +1,102 @@
+import bz2
+import gzip
+import io
+import lzma
+from dataclasses import dataclass
+
+# The file name suffix added to a compressed output for each supported method.
+# These match the suffixes pandas uses to infer the compression when reading.
+COMPRESSION_SUFFIXES = {
+    "gzip": ".gz",
+    "bz2": ".bz2",
+    "xz": ".xz",
+    "zstd": ".zst",
+}
+
+
+@dataclass(frozen=True)
+class OutputCompression:
+    """How to compress the CSVs written by output_directory_structure"""
+
+    method: str = "gzip"
+    # Higher is smaller but slower, the valid range depends on the method
+    # (1-9 for gzip and bz2, 0-9 for xz, 1-22 for zstd)
+    level: int = 6
+
+    def __post_init__(self):
+        if self.method not in COMPRESSION_SUFFIXES:
+            raise ValueError(
+                f"Unsupported compression method {self.method}, "
+                f"expected one of {list(COMPRESSION_SUFFIXES)}"
+            )
+
+    @property
+    def suffix(self) -> str:
+        return COMPRESSION_SUFFIXES[self.method]
+
+
+def strip_compression_suffix(file_name: str) -> str:
+    """
+    Returns file_name without a trailing compression suffix (if it has one), so
+    "AAA00001_scenario_1_canonical.csv.gz" becomes "AAA00001_scenario_1_canonical.csv"
+    """
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if file_name.endswith(suffix):
+            return file_name[: -len(suffix)]
+    return file_name
+
+
+def _compression_from_file_name(file_name: str):
+    for method, suffix in COMPRESSION_SUFFIXES.items():
+        if file_name.endswith(suffix):
+            return method
+    return None
+
+
+def open_text(file_path, mode: str = "r", compression: OutputCompression | None = None):
+    """
+    Opens file_path in text mode (with newline="" as the csv module expects).
+
+    When writing, the file is compressed using compression (if given). When reading,
+    the compression is detected from the suffix of the file name.
+    """
+    if "r" in mode:
+        method = _compression_from_file_name(str(file_path))
+        level = None
+    else:
+        method = compression.method if compression else None
+        level = compression.level if compression else None
+    text_mode = mode.replace("t", "").replace("b", "") + "t"
+
+    if method is None:
+        return open(file_path, mode, newline="")
+    if method == "gzip":
+        if level is None:
+            return gzip.open(file_path, text_mode, newline="")
+        # mtime is fixed so the same output always gives the same bytes
+        return _gzip_open_with_fixed_mtime(file_path, text_mode, level)
+    if method == "bz2":
+        return bz2.open(file_path, text_mode, newline="", **_level_kwarg("compresslevel", level))
+    if method == "xz":
+        return lzma.open(file_path, text_mode, newline="", **_level_kwarg("preset", level))
+    return _zstd_open(file_path, text_mode, level)
+
+
+def _level_kwarg(name, level):
+    return {} if level is None else {name: level}
+
+
+def _gzip_open_with_fixed_mtime(file_path, text_mode, level):
+    binary_file = gzip.GzipFile(
+        file_path, text_mode.replace("t", "b"), compresslevel=level, mtime=0
+    )
+    return io.TextIOWrapper(binary_file, newline="")
+
+
+def _zstd_open(file_path, text_mode, level):
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd compression requires the zstandard package") from e
+    compressor = None if level is None else zstandard.ZstdCompressor(level=level)
+    return zstandard.open(file_path, text_mode, cctx=compressor, newline="")
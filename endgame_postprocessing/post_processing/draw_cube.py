@@ -0,0 +1,192 @@
+import itertools
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from endgame_postprocessing.post_processing import (
+    canonical_columns,
+    canonicalise,
+    output_directory_structure,
+)
+from endgame_postprocessing.post_processing.canonical_manifest import canonical_file_generator
+
+
+@dataclass
+class DrawCube:
+    """
+    The canonical draws for every IU of one scenario, as a single [IU x year x draw] array.
+
+    `draws` is memory mapped from disk, so slicing it only reads (and caches) the pages needed,
+    and the pages are shared by every process reading the same cube.
+    `has_year` is [IU x year] and marks the years each IU has data for (the draws for the
+    other years are NaN).
+    """
+
+    scenario: str
+    ius: list[str]
+    countries: list[str]
+    years: np.ndarray
+    draw_columns: list[str]
+    measure: str
+    has_year: np.ndarray
+    draws: np.ndarray
+
+    def canonical_iu_run(self, iu_index: int) -> pd.DataFrame:
+        """
+        Rebuilds the canonical results for one IU (without the age columns), in the same form
+        as reading the IUs canonical CSV.
+        """
+        year_mask = self.has_year[iu_index]
+        canonical_iu_run = pd.DataFrame(
+            np.array(self.draws[iu_index][year_mask]), columns=self.draw_columns
+        )
+        canonical_iu_run.insert(0, canonical_columns.SCENARIO, self.scenario)
+        canonical_iu_run.insert(1, canonical_columns.COUNTRY_CODE, self.countries[iu_index])
+        canonical_iu_run.insert(2, canonical_columns.IU_NAME, self.ius[iu_index])
+        canonical_iu_run.insert(3, canonical_columns.YEAR_ID, self.years[year_mask])
+        canonical_iu_run.insert(4, canonical_columns.MEASURE, self.measure)
+        return canonical_iu_run
+
+    def canonical_iu_runs(self, country: str = None) -> list[pd.DataFrame]:
+        """
+        The canonical results for every IU (or every IU in country), in the order the
+        canonical files were found.
+        """
+        return [
+            self.canonical_iu_run(iu_index)
+            for iu_index, iu_country in enumerate(self.countries)
+            if country is None or iu_country == country
+        ]
+
+
+def _cube_file_paths(cube_dir, scenario):
+    return (
+        Path(cube_dir) / f"{scenario}_draws.npy",
+        Path(cube_dir) / f"{scenario}_has_year.npy",
+        Path(cube_dir) / f"{scenario}_index.json",
+    )
+
+
+def _source_files(file_infos) -> list[list]:
+    """The path, modification time and size of each canonical file, to tell if a cube is stale"""
+    source_files = []
+    for file_info in file_infos:
+        file_stat = os.stat(file_info.file_path)
+        source_files.append([str(file_info.file_path), file_stat.st_mtime_ns, file_stat.st_size])
+    return source_files
+
+
+def _read_up_to_date_draw_cube(cube_dir, scenario, source_files) -> DrawCube | None:
+    """The existing cube for scenario, if it was built from exactly source_files"""
+    draws_path, has_year_path, index_path = _cube_file_paths(cube_dir, scenario)
+    if not (index_path.exists() and draws_path.exists() and has_year_path.exists()):
+        return None
+    if json.loads(index_path.read_text()).get("source_files") != source_files:
+        return None
+    return read_draw_cube(cube_dir, scenario)
+
+
+def _write_draw_cube(cube_dir, scenario, file_infos, source_files) -> DrawCube:
+    draws_path, has_year_path, index_path = _cube_file_paths(cube_dir, scenario)
+    # The index is written last, so a partly written cube is never reused
+    index_path.unlink(missing_ok=True)
+
+    # Only the years of each IU are read first, so the cube can be allocated and each IU
+    # written into it as it is read, rather than holding every IU of the scenario in memory
+    iu_years = []
+    for file_info in file_infos:
+        years = pd.read_csv(file_info.file_path, usecols=[canonical_columns.YEAR_ID])[
+            canonical_columns.YEAR_ID
+        ].to_numpy()
+        if len(np.unique(years)) != len(years):
+            raise Exception(f"More than one row for a year in {file_info.file_path}")
+        iu_years.append(years)
+    years = np.unique(np.concatenate(iu_years)).astype(np.int64)
+    draw_columns = [
+        column
+        for column in pd.read_csv(file_infos[0].file_path, nrows=0).columns
+        if column.startswith("draw_")
+    ]
+
+    draws = np.lib.format.open_memmap(
+        draws_path,
+        mode="w+",
+        dtype=float,
+        shape=(len(file_infos), len(years), len(draw_columns)),
+    )
+    draws[:] = np.nan
+    has_year = np.zeros((len(file_infos), len(years)), dtype=bool)
+
+    measure = None
+    for iu_index, file_info in enumerate(file_infos):
+        iu = canonicalise.read_canonical(
+            file_info.file_path, canonicalise.COMPOSITE_COLUMNS, scenario=file_info.scenario
+        )
+        if list(iu.loc[:, "draw_0":].columns) != draw_columns:
+            raise Exception(
+                f"Draw columns in {file_info.file_path} do not match the other IUs in {scenario}"
+            )
+        year_indices = np.searchsorted(years, iu[canonical_columns.YEAR_ID].to_numpy())
+        draws[iu_index, year_indices] = iu[draw_columns].to_numpy(dtype=float)
+        has_year[iu_index, year_indices] = True
+        if measure is None:
+            measure = iu[canonical_columns.MEASURE].iloc[0]
+
+    draws.flush()
+    del draws
+    np.save(has_year_path, has_year)
+    index = {
+        "scenario": scenario,
+        "ius": [file_info.iu for file_info in file_infos],
+        "countries": [file_info.country for file_info in file_infos],
+        "years": years.tolist(),
+        "draw_columns": draw_columns,
+        "measure": measure,
+        "source_files": source_files,
+    }
+    Path(index_path).write_text(json.dumps(index, indent=4))
+    return read_draw_cube(cube_dir, scenario)
+
+
+def write_draw_cubes(working_directory) -> list[DrawCube]:
+    """
+    Packs the canonical results in working_directory into one draw cube per scenario
+    (see DrawCube), stored in the draw_cubes directory of working_directory. The existing cube
+    of a scenario is reused if none of its canonical files have changed (by path, modification
+    time and size) since it was written.
+
+    Returns the cubes in the order the scenarios were found.
+    """
+    cube_dir = Path(output_directory_structure.get_draw_cube_dir(working_directory))
+    cube_dir.mkdir(parents=True, exist_ok=True)
+    canonical_files = canonical_file_generator(working_directory)
+    draw_cubes = []
+    for scenario, file_infos in itertools.groupby(
+        canonical_files, lambda file_info: file_info.scenario
+    ):
+        file_infos = list(file_infos)
+        source_files = _source_files(file_infos)
+        draw_cube = _read_up_to_date_draw_cube(cube_dir, scenario, source_files)
+        if draw_cube is None:
+            draw_cube = _write_draw_cube(cube_dir, scenario, file_infos, source_files)
+        draw_cubes.append(draw_cube)
+    return draw_cubes
+
+
+def read_draw_cube(cube_dir, scenario) -> DrawCube:
+    draws_path, has_year_path, index_path = _cube_file_paths(cube_dir, scenario)
+    index = json.loads(Path(index_path).read_text())
+    return DrawCube(
+        scenario=index["scenario"],
+        ius=index["ius"],
+        countries=index["countries"],
+        years=np.array(index["years"]),
+        draw_columns=index["draw_columns"],
+        measure=index["measure"],
+        has_year=np.load(has_year_path),
+        draws=np.load(draws_path, mmap_mode="r"),
+    )
@@ -0,0 +1,155 @@
+import builtins
+import dataclasses
+import json
+import os
+import threading
+import warnings
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
+from endgame_postprocessing.post_processing.file_util import post_process_file_generator
+
+INDEX_FILE_NAME = "canonical_index.json"
+
+
+@dataclass
+class _Catalog:
+    # The modification time of every directory listed to build the catalog
+    directory_mtimes: Dict[str, int]
+    file_infos: List[CustomFileInfo]
+    # The warnings raised while building the catalog (message, category, filename and lineno)
+    file_warnings: List[dict]
+
+    def is_up_to_date(self) -> bool:
+        """
+        Adding, removing or renaming a file or directory changes the modification time of
+        the directory containing it, so the catalog is up to date if none of those have changed.
+        """
+        try:
+            return all(
+                os.stat(directory).st_mtime_ns == mtime
+                for directory, mtime in self.directory_mtimes.items()
+            )
+        except FileNotFoundError:
+            return False
+
+    def warn(self):
+        """Raises the warnings raised while building the catalog again, as they were raised"""
+        for file_warning in self.file_warnings:
+            warnings.warn_explicit(
+                file_warning["message"],
+                getattr(builtins, file_warning["category"], UserWarning),
+                file_warning["filename"],
+                file_warning["lineno"],
+            )
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "directory_mtimes": self.directory_mtimes,
+                "file_infos": [dataclasses.asdict(file_info) for file_info in self.file_infos],
+                "file_warnings": self.file_warnings,
+            }
+        )
+
+    @staticmethod
+    def from_json(json_str: str) -> "_Catalog":
+        data = json.loads(json_str)
+        return _Catalog(
+            directory_mtimes=data["directory_mtimes"],
+            file_infos=[CustomFileInfo(**file_info) for file_info in data["file_infos"]],
+            file_warnings=data["file_warnings"],
+        )
+
+
+# The catalogs built by this process, by (directory, end_of_file), until catalog_scope exits
+_catalogs: Dict[tuple, _Catalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+@contextmanager
+def catalog_scope():
+    """Forgets the catalogs built by catalog_files on exit (e.g. at the end of a pipeline run)"""
+    try:
+        yield
+    finally:
+        with _catalogs_lock:
+            _catalogs.clear()
+
+
+def _build_catalog(file_directory, end_of_file) -> _Catalog:
+    visited_directories = []
+    with warnings.catch_warnings(record=True) as raised_warnings:
+        warnings.simplefilter("always")
+        file_infos = list(
+            post_process_file_generator(
+                file_directory=file_directory,
+                end_of_file=end_of_file,
+                visited_directories=visited_directories,
+            )
+        )
+    return _Catalog(
+        directory_mtimes={
+            directory: os.stat(directory).st_mtime_ns for directory in visited_directories
+        },
+        file_infos=file_infos,
+        file_warnings=[
+            {
+                "message": str(raised_warning.message),
+                "category": raised_warning.category.__name__,
+                "filename": raised_warning.filename,
+                "lineno": raised_warning.lineno,
+            }
+            for raised_warning in raised_warnings
+        ],
+    )
+
+
+def _read_index(index_path) -> _Catalog | None:
+    if index_path is None or not Path(index_path).exists():
+        return None
+    try:
+        return _Catalog.from_json(Path(index_path).read_text())
+    except (ValueError, KeyError, TypeError):
+        # Unreadable (e.g. from an older version), so rebuild it
+        return None
+
+
+def catalog_files(
+    file_directory: str, end_of_file: str = ".csv", index_path=None
+) -> List[CustomFileInfo]:
+    """
+    Returns the same files as post_process_file_generator, but only walks file_directory the
+    first time (or when something in it has changed since).
+
+    The catalog is kept until catalog_scope exits. It is rebuilt if the modification time of
+    any of the directories it was built from has changed, which only needs a stat of each
+    directory rather than a listing. The warnings post_process_file_generator raised while
+    building it are raised again on every call.
+
+    Args:
+        file_directory (str): As for post_process_file_generator.
+        end_of_file (str): As for post_process_file_generator.
+        index_path: If given, the catalog is also saved to (and if still up to date, read
+            from) this file, so it can be reused by later runs.
+    """
+    # The paths returned are relative to file_directory as given
+    key = (os.path.abspath(file_directory), str(file_directory), end_of_file)
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+    if catalog is None:
+        catalog = _read_index(index_path)
+
+    rebuilt = catalog is None or not catalog.is_up_to_date()
+    if rebuilt:
+        catalog = _build_catalog(file_directory, end_of_file)
+    if index_path is not None and (rebuilt or not Path(index_path).exists()):
+        Path(index_path).write_text(catalog.to_json())
+
+    with _catalogs_lock:
+        _catalogs[key] = catalog
+    catalog.warn()
+    return list(catalog.file_infos)
@@ -4,6 +4,7 @@ import re
 import warnings
 from typing import Generator
 
+from .compression import strip_compression_suffix
 from .custom_file_info import CustomFileInfo
 
 
@@ -24,12 +25,23 @@ def custom_progress_bar_update(progress_bar, curr_index: int, total: int):
         progress_bar.refresh()
 
 
+def _scan_directory(directory: str):
+    """Returns the (subdirectories, files) of directory, using the types scandir provides"""
+    with os.scandir(directory) as entries:
+        entries = list(entries)
+    return (
+        [entry.name for entry in entries if entry.is_dir()],
+        [entry.name for entry in entries if not entry.is_dir()],
+    )
+
+
 def subdirectory_generator(directory: str):
-    files_and_folders = os.listdir(directory)
-    for file_or_folder in files_and_folders:
-        full_path = os.path.join(directory, file_or_folder)
-        if os.path.isdir(full_path):
-            yield full_path, file_or_folder
+    with os.scandir(directory) as entries:
+        entries = list(entries)
+    for entry in entries:
+        full_path = os.path.join(directory, entry.name)
+        if entry.is_dir():
+            yield full_path, entry.name
         else:
             warnings.warn(f"Unexpected file {full_path} found in {directory}")
 
@@ -37,6 +49,7 @@ def subdirectory_generator(directory: str):
 def post_process_file_generator(
         file_directory: str,
         end_of_file: str = ".csv",
+        visited_directories: list = None,
 ) -> Generator[CustomFileInfo, None, None]:
     """
     Returns a generator for files in a given directory, only returning files that end
@@ -46,11 +59,16 @@ def post_process_file_generator(
         file_directory (str): The name of the file directory all the files are in. Should be in the
                                 format file_directory/scenario/country/iu/output_file.csv.
         end_of_file (str): A substring that defines the files to be processed. Default is ".csv".
+                            Compressed files (e.g. ending ".csv.gz") are also returned.
+        visited_directories (list): If given, every directory listed is appended to it
+                            (see file_catalog).
 
     Returns:
         Yields a generator, which is a tuple, of form (scenario_index, total_scenarios, scenario,
         country, iu, full_file_path).
     """
+    if visited_directories is not None:
+        visited_directories.append(file_directory)
     scenario_directories = [dir for dir in subdirectory_generator(file_directory)]
     total_scenarios = len(scenario_directories)
 
@@ -60,20 +78,26 @@ def post_process_file_generator(
     for scenario_index, (scenario_dir_path, scenario) in enumerate(
             scenario_directories
     ):
+        if visited_directories is not None:
+            visited_directories.append(scenario_dir_path)
         for country_dir_path, country in subdirectory_generator(scenario_dir_path):
+            if visited_directories is not None:
+                visited_directories.append(country_dir_path)
             for iu_dir_path, iu in subdirectory_generator(country_dir_path):
-                path, directories, files = next(os.walk(iu_dir_path))
+                if visited_directories is not None:
+                    visited_directories.append(iu_dir_path)
+                directories, files = _scan_directory(iu_dir_path)
                 if len(directories) != 0:
                     warnings.warn(
-                        f"{len(directories)} unexpected subdirectories in IU directory {path}, "
-                        "contents will be ignored"
+                        f"{len(directories)} unexpected subdirectories in IU directory "
+                        f"{iu_dir_path}, contents will be ignored"
                     )
 
                 if len(files) == 0:
-                    warnings.warn(f"No IU data files found for IU {path}")
+                    warnings.warn(f"No IU data files found for IU {iu_dir_path}")
 
                 for output_file in files:
-                    if output_file.endswith(end_of_file):
+                    if strip_compression_suffix(output_file).endswith(end_of_file):
                         yield CustomFileInfo(
                             scenario_index,
                             total_scenarios,
@@ -94,7 +118,7 @@ def post_process_file_generator(
 def get_flat_regex(file_name_regex, input_dir, glob_expression="**/*.csv"):
     files = glob.glob(glob_expression, root_dir=input_dir, recursive=True)
     for file in files:
-        file_match = re.search(file_name_regex, file)
+        file_match = re.search(file_name_regex, strip_compression_suffix(file))
         if not file_match:
             warnings.warn(f"Unexpected file: {file}")
             continue
@@ -0,0 +1,243 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from endgame_postprocessing.post_processing import canonical_columns
+from endgame_postprocessing.post_processing.iu_data import IUData
+
+AFRICA_GROUP = "africa"
+
+
+@dataclass
+class IUDrawBlock:
+    """The draws of many canonical IU runs, aligned on a common set of years"""
+
+    # The scenario and IU of each run
+    scenarios: List[str]
+    ius: List[str]
+    # Every year any of the runs has, sorted
+    years: np.ndarray
+    draw_columns: pd.Index
+    measure: str
+    # [run x year x draw], 0 where a run has no row for the year
+    draws: np.ndarray
+    # [run x year], whether the run has a row for the year
+    has_year: np.ndarray
+
+    def runs_draws(self, runs: np.ndarray) -> np.ndarray:
+        """The draws of runs, without copying them if they are consecutive"""
+        if len(runs) > 0 and np.all(np.diff(runs) == 1):
+            return self.draws[runs[0]:runs[-1] + 1]
+        return self.draws[runs]
+
+
+def build_iu_draw_block(canonical_iu_runs: List[pd.DataFrame]) -> IUDrawBlock:
+    draw_columns = canonical_iu_runs[0].loc[:, "draw_0":].columns
+    all_years = pd.concat(
+        [canonical_iu_run[canonical_columns.YEAR_ID] for canonical_iu_run in canonical_iu_runs]
+    )
+    years = np.unique(all_years[all_years.notna()].to_numpy())
+
+    draws = np.zeros((len(canonical_iu_runs), len(years), len(draw_columns)))
+    has_year = np.zeros((len(canonical_iu_runs), len(years)), dtype=bool)
+    for run_index, canonical_iu_run in enumerate(canonical_iu_runs):
+        run_years = canonical_iu_run[canonical_columns.YEAR_ID]
+        with_year = run_years.notna().to_numpy()
+        year_indices = np.searchsorted(years, run_years[with_year].to_numpy())
+        draws[run_index, year_indices] = canonical_iu_run.loc[with_year, draw_columns].to_numpy(
+            dtype=float
+        )
+        has_year[run_index, year_indices] = True
+
+    return IUDrawBlock(
+        scenarios=[run[canonical_columns.SCENARIO].iloc[0] for run in canonical_iu_runs],
+        ius=[run[canonical_columns.IU_NAME].iloc[0] for run in canonical_iu_runs],
+        years=years,
+        draw_columns=draw_columns,
+        measure=canonical_iu_runs[0][canonical_columns.MEASURE].iloc[0],
+        draws=draws,
+        has_year=has_year,
+    )
+
+
+def _common_year_range(has_year: np.ndarray) -> slice:
+    """The years (as a slice of the block's years) that every run (row of has_year) covers"""
+    first_year_indices = np.argmax(has_year, axis=1)
+    last_year_indices = has_year.shape[1] - 1 - np.argmax(has_year[:, ::-1], axis=1)
+    return slice(first_year_indices.max(), max(last_year_indices.min() + 1, 0))
+
+
+def _membership_rows(
+    block: IUDrawBlock, groups: Dict[str, Iterable[str]]
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    The [group and scenario x run] membership matrix, which is very sparse so is stored as
+    the runs in each row: for each group, the runs of its IUs for each scenario.
+    """
+    runs_by_iu = {}
+    for run_index, iu in enumerate(block.ius):
+        runs_by_iu.setdefault(iu, []).append(run_index)
+
+    membership_rows = {}
+    for group, ius in groups.items():
+        group_runs = sorted(
+            run_index for iu in set(ius) for run_index in runs_by_iu.get(iu, [])
+        )
+        runs_by_scenario = {}
+        for run_index in group_runs:
+            runs_by_scenario.setdefault(block.scenarios[run_index], []).append(run_index)
+        if runs_by_scenario:
+            membership_rows[group] = {
+                scenario: np.array(runs) for scenario, runs in runs_by_scenario.items()
+            }
+    return membership_rows
+
+
+def build_group_composites(
+    canonical_iu_runs: List[pd.DataFrame],
+    iu_data: IUData,
+    groups: Dict[str, Iterable[str]],
+    group_populations: Dict[str, float],
+) -> Dict[str, pd.DataFrame]:
+    """
+    Builds the composite run (see composite_run.build_composite_run) of each group of IUs, for
+    every scenario, from a single read of the draws.
+
+    The runs are packed into one [run x year x draw] block, and the composites are the product
+    of a sparse [group and scenario x run] matrix of the IUs' priority populations with the
+    block, normalised by each group's total population. An IU can be in more than one group
+    (e.g. its country and Africa).
+
+    As for the composites built per group, each group covers the years that every one of its
+    IUs covers (in every scenario), and a missing draw makes that year and draw missing for
+    every group the IU is in.
+
+    Args:
+        canonical_iu_runs: The canonical runs of every IU for every scenario.
+        iu_data: Supplies the priority population of each IU.
+        groups: The IUs in each group.
+        group_populations: The total priority population of each group.
+
+    Returns:
+        The composite of each group (with at least one IU in canonical_iu_runs) with the year_id,
+        scenario and measure columns followed by the draws, for every scenario in turn.
+    """
+    block = build_iu_draw_block(canonical_iu_runs)
+    iu_populations = {iu: iu_data.get_priority_population_for_IU(iu) for iu in set(block.ius)}
+    run_populations = np.array([iu_populations[iu] for iu in block.ius], dtype=float)
+
+    composites = {}
+    for group, runs_by_scenario in _membership_rows(block, groups).items():
+        group_runs = np.concatenate(list(runs_by_scenario.values()))
+        group_years = _common_year_range(block.has_year[group_runs])
+        # A year in the range that an IU skips is missing
+        missing_years = ~block.has_year[group_runs, group_years].all(axis=0)
+
+        scenario_composites = []
+        for scenario, runs in runs_by_scenario.items():
+            summed_case_numbers = np.tensordot(
+                run_populations[runs], block.runs_draws(runs)[:, group_years], axes=1
+            )
+            summed_case_numbers[missing_years] = np.nan
+            scenario_composites.append(
+                pd.concat(
+                    [
+                        pd.DataFrame(
+                            {
+                                canonical_columns.YEAR_ID: block.years[group_years],
+                                canonical_columns.SCENARIO: scenario,
+                                canonical_columns.MEASURE: block.measure,
+                            }
+                        ),
+                        pd.DataFrame(
+                            summed_case_numbers / group_populations[group],
+                            columns=block.draw_columns,
+                        ),
+                    ],
+                    axis=1,
+                )
+            )
+        composites[group] = pd.concat(scenario_composites, ignore_index=True)
+    return composites
+
+
+@dataclass
+class Composites:
+    # The composite of each country, with a country_code column
+    countries: Dict[str, pd.DataFrame]
+    africa: pd.DataFrame
+    # The composite of each group of each extra grouping, with a group column
+    groupings: Dict[str, Dict[str, pd.DataFrame]]
+
+
+def build_composites(
+    canonical_iu_runs: List[pd.DataFrame],
+    iu_data: IUData,
+    groupings: Dict[str, Dict[str, Iterable[str]]] | None = None,
+) -> Composites:
+    """
+    Builds the composite of every country, of Africa and of every group of the extra groupings
+    in one pass (see build_group_composites). The country and Africa composites have the same
+    columns as composite_run.build_composite_run_multiple_scenarios.
+
+    Args:
+        canonical_iu_runs: The canonical runs of every IU for every scenario.
+        iu_data: Supplies the priority populations of the IUs and groups.
+        groupings: The IUs in each group of each extra grouping (see iu_grouping), e.g.
+            {"who_region": {"west": ["AAA00001", ...], ...}}. Groups with none of the IUs of
+            canonical_iu_runs are left out.
+
+    Returns:
+        The composites, the countries in the order they first appear in canonical_iu_runs.
+    """
+    countries = {}
+    for canonical_iu_run in canonical_iu_runs:
+        country = canonical_iu_run[canonical_columns.COUNTRY_CODE].iloc[0]
+        iu = canonical_iu_run[canonical_columns.IU_NAME].iloc[0]
+        countries.setdefault(country, set()).add(iu)
+    groups = {**countries, AFRICA_GROUP: set().union(*countries.values())}
+    group_populations = {
+        country: iu_data.get_priority_population_for_country(country) for country in countries
+    }
+    group_populations[AFRICA_GROUP] = iu_data.get_priority_population_for_africa()
+    # Keyed by (grouping, group) so they can't clash with the countries or each other
+    for grouping, grouping_groups in (groupings or {}).items():
+        for group, ius in grouping_groups.items():
+            groups[(grouping, group)] = ius
+            group_populations[(grouping, group)] = iu_data.get_priority_population_for_ius(ius)
+
+    composites = build_group_composites(canonical_iu_runs, iu_data, groups, group_populations)
+    country_composites = {}
+    for country in countries:
+        country_composite = composites[country]
+        country_composite.insert(2, canonical_columns.COUNTRY_CODE, country)
+        country_composites[country] = country_composite
+    grouping_composites = {}
+    for grouping, grouping_groups in (groupings or {}).items():
+        grouping_composites[grouping] = {}
+        for group in grouping_groups:
+            if (grouping, group) in composites:
+                group_composite = composites[(grouping, group)]
+                group_composite.insert(2, canonical_columns.GROUP, group)
+                grouping_composites[grouping][group] = group_composite
+    return Composites(
+        countries=country_composites,
+        africa=composites[AFRICA_GROUP],
+        groupings=grouping_composites,
+    )
+
+
+def build_country_and_africa_composites(
+    canonical_iu_runs: List[pd.DataFrame], iu_data: IUData
+) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    Builds the composite of every country and of Africa in one pass (see build_composites).
+
+    Returns:
+        The composite of each country (in the order the countries first appear in
+        canonical_iu_runs), and the Africa composite.
+    """
+    composites = build_composites(canonical_iu_runs, iu_data)
+    return composites.countries, composites.africa
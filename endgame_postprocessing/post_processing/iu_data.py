@@ -100,6 +100,13 @@ class IUData:
             _get_priority_population_column_for_disease(self.disease)
         ].sum()
 
+    def get_priority_population_for_ius(self, iu_codes):
+        """The priority population of the included IUs of iu_codes (e.g. those in a group)"""
+        included_ius = self.get_included_ius()
+        return included_ius.loc[included_ius["IU_CODE"].isin(set(iu_codes))][
+            _get_priority_population_column_for_disease(self.disease)
+        ].sum()
+
     def get_total_ius_in_country(self, country_code):
         return len(self._get_included_ius_for_country(country_code))
 
@@ -0,0 +1,42 @@
+from typing import Dict, List
+
+import pandas as pd
+
+from endgame_postprocessing.post_processing.iu_data import _is_valid_iu_code
+
+IU_CODE_COLUMN = "IU_CODE"
+GROUP_COLUMN = "GROUP"
+
+
+def read_iu_grouping(grouping_file) -> Dict[str, List[str]]:
+    """
+    Reads a grouping of IUs (e.g. WHO sub-regions) from a CSV with an IU_CODE and a GROUP
+    column, each IU being in at most one group.
+
+    Returns:
+        The IUs in each group, in the order the groups first appear in the file.
+    """
+    grouping = pd.read_csv(grouping_file, dtype=str)
+    missing_columns = {IU_CODE_COLUMN, GROUP_COLUMN} - set(grouping.columns)
+    if missing_columns:
+        raise InvalidIUGroupingFile(
+            f"IU grouping {grouping_file} is missing columns {sorted(missing_columns)}"
+        )
+    if grouping[[IU_CODE_COLUMN, GROUP_COLUMN]].isna().any(axis=None):
+        raise InvalidIUGroupingFile(f"IU grouping {grouping_file} has missing values")
+    if grouping[IU_CODE_COLUMN].nunique() != len(grouping):
+        raise InvalidIUGroupingFile(f"IU grouping {grouping_file} has duplicate IUs")
+    invalid_ius = [iu for iu in grouping[IU_CODE_COLUMN] if not _is_valid_iu_code(iu)]
+    if invalid_ius:
+        raise InvalidIUGroupingFile(
+            f"IU grouping {grouping_file} contains invalid IU codes: {invalid_ius}"
+        )
+
+    return {
+        group: list(group_ius)
+        for group, group_ius in grouping.groupby(GROUP_COLUMN, sort=False)[IU_CODE_COLUMN]
+    }
+
+
+class InvalidIUGroupingFile(Exception):
+    pass
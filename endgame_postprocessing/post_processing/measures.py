@@ -1,5 +1,6 @@
 import numpy as np
 from .constants import PERCENTILES_TO_CALC
+from .streaming_summary import summarise_draws
 
 def _extract_percentiles(
     percentiles_dict: dict[str : list[int]], percentile_names: list[str]
@@ -145,6 +146,126 @@ def find_year_reaching_threshold(
         return year_ids[indeces_of_meeting_threshold[0]]
     return -1
 
+def find_years_reaching_thresholds(
+    comparison_values: np.ndarray,
+    thresholds: list[float],
+    year_ids: list[float],
+    comparitor_function=np.less,
+) -> np.ndarray:
+    """
+    Calculates the year in which each of several thresholds was reached, for one or more series
+    at once (e.g. the probability under the prevalence threshold of each IU in a batch).
+
+    Equivalent to calling find_year_reaching_threshold for each threshold and each series, but
+    compares every threshold against every year in one broadcast operation.
+
+    Args:
+        comparison_values (np.ndarray): an array of shape [# of years] or [# of years, # of series]
+        thresholds (list[float]): The thresholds to compare to
+        year_ids (list[float]): A list of the related year_ids to the rows of comparison_values
+        comparitor_function (function): The numpy comparator function to be used.
+                                            By default this is np.less.
+
+    Returns:
+        An array of shape [# of thresholds] (or [# of thresholds, # of series]) with the year in
+        which each threshold was reached, or -1 if it wasn't.
+    """
+    comparison_values = np.asarray(comparison_values)
+    thresholds = np.asarray(thresholds)
+    result_shape = thresholds.shape + comparison_values.shape[1:]
+    if comparison_values.shape[0] == 0:
+        return np.full(result_shape, -1)
+
+    # [# of thresholds, # of years, (# of series)]
+    meets_threshold = comparitor_function(
+        comparison_values[np.newaxis, ...],
+        thresholds.reshape(thresholds.shape + (1,) * comparison_values.ndim),
+    )
+    # argmax finds the first True, which is 0 if there isn't one, so those are replaced with -1
+    first_year_indices = np.argmax(meets_threshold, axis=1)
+    return np.where(
+        meets_threshold.any(axis=1), np.asarray(year_ids)[first_year_indices], -1
+    )
+
+def calc_sustained_under_threshold_years(
+    prevalence_vals: np.ndarray,
+    threshold: float,
+    year_ids: list[float],
+) -> np.ndarray:
+    """
+    Calculates, for each run, the first year from which prevalence is under the threshold and
+    stays under it for every later year.
+
+    Args:
+        prevalence_vals (np.ndarray): A 2D matrix where columns are different runs, and rows are
+                                        different years (in year order).
+        threshold (float): The number at which a threshold is considered to be passed.
+        year_ids (list[float]): A list of the related year_ids to the rows of prevalence_vals
+
+    Returns:
+        An array with the year for each run, or NaN for the runs that aren't under the threshold
+        in the last year.
+    """
+    prevalence_vals = np.asarray(prevalence_vals, dtype=float)
+    if prevalence_vals.shape[0] == 0:
+        return np.full(prevalence_vals.shape[1:], np.nan)
+
+    # A year is under the threshold for good if it and every later year is, so accumulate the
+    # and from the last year backwards
+    under_threshold_from_year = np.logical_and.accumulate(
+        prevalence_vals[::-1] < threshold, axis=0
+    )[::-1]
+    first_year_indices = np.argmax(under_threshold_from_year, axis=0)
+    return np.where(
+        under_threshold_from_year[-1],
+        np.asarray(year_ids, dtype=float)[first_year_indices],
+        np.nan,
+    )
+
+
+def summarise_run_values(values: np.ndarray, measure_name: str) -> np.ndarray:
+    """
+    Summarises a single value per run (e.g. from calc_sustained_under_threshold_years) into a
+    single row with the mean, median, std and percentiles, ignoring the runs that are NaN.
+
+    Args:
+        values (np.ndarray): The value for each run.
+        measure_name (str): The measure name for the row.
+
+    Returns:
+        Returns a summarized (using build_summary) 2D matrix with a single row, with NaN for the
+        summary values if every run is NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    none_array = np.full(1, None)
+    if np.isnan(values).all():
+        nan_array = np.full(1, np.nan)
+        summaries = {
+            "mean": nan_array,
+            "percentiles": {k: nan_array for k in PERCENTILES_TO_CALC},
+            "standard_deviation": nan_array,
+            "median": nan_array,
+        }
+    else:
+        summaries = {
+            "mean": [np.nanmean(values)],
+            "percentiles": {k: [np.nanpercentile(values, k)] for k in PERCENTILES_TO_CALC},
+            "standard_deviation": [np.nanstd(values)],
+            "median": [np.nanmedian(values)],
+        }
+    return build_summary(
+        year_id=none_array,
+        age_start=none_array,
+        age_end=none_array,
+        measure_name=[measure_name],
+        mean=summaries["mean"],
+        percentiles_dict=summaries["percentiles"],
+        percentile_name_order=PERCENTILES_TO_CALC,
+        standard_deviation=summaries["standard_deviation"],
+        median=summaries["median"],
+    )
+
+
 def measure_summary_float(
     data_to_summarize: np.ndarray,
     year_id_loc: int,
@@ -152,11 +273,16 @@ def measure_summary_float(
     age_start_loc: int,
     age_end_loc: int,
     draws_loc: list[int],
+    quantile_relative_accuracy: float | None = None,
 ) -> np.ndarray:
     """
     The default summary calculation for a float measure, including calculation of mean, median, std,
     and percentiles.
 
+    quantile_relative_accuracy can be given to summarise the draws without sorting them (see
+    streaming_summary.summarise_draws): the mean and std are still exact, but the percentiles
+    and median are estimated to within that relative error.
+
     Args:
         data_to_summarize (np.ndarray): A 2D numpy matrix that contains the data to be summarized.
         year_id_loc (int): the location of the year_id column.
@@ -164,12 +290,29 @@ def measure_summary_float(
         age_end_loc (int): the location of the age_end column.
         measure_column_loc (int): the location of the measure column.
         draws_loc (list[int]): the locations of the draw columns.
+        quantile_relative_accuracy (float | None): if given, estimate the percentiles and median
+                                                    to within this relative error.
 
     Returns:
         Returns a summarized (using build_summary) 2D matrix where each column represents a unique
         summarized value.
     """
     values = data_to_summarize[:, draws_loc].astype(float)
+    if quantile_relative_accuracy is not None:
+        mean, standard_deviation, percentiles, median = summarise_draws(
+            values, PERCENTILES_TO_CALC, quantile_relative_accuracy
+        )
+        return build_summary(
+            year_id=data_to_summarize[:, year_id_loc],
+            age_start=data_to_summarize[:, age_start_loc],
+            age_end=data_to_summarize[:, age_end_loc],
+            measure_name=data_to_summarize[:, measure_column_loc],
+            mean=mean,
+            percentiles_dict=percentiles,
+            percentile_name_order=PERCENTILES_TO_CALC,
+            standard_deviation=standard_deviation,
+            median=median,
+        )
     return build_summary(
         year_id=data_to_summarize[:, year_id_loc],
         age_start=data_to_summarize[:, age_start_loc],
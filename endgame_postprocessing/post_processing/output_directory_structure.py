@@ -1,40 +1,339 @@
 import json
+import os
+import queue
+import threading
+import zipfile
+from contextlib import nullcontext
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 from endgame_postprocessing.post_processing import canonical_file_name
+from endgame_postprocessing.post_processing.compression import OutputCompression, open_text
 from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
 from endgame_postprocessing.post_processing.disease import Disease
 
 
+FLOAT_FORMAT = "%g"
+
+
+def _csv_field(value) -> str:
+    text = str(value)
+    if any(special in text for special in (",", '"', "\n", "\r")):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _is_plain_column(dtype) -> bool:
+    """Whether str() of the column's values is how pandas writes them"""
+    return isinstance(dtype, np.dtype) and dtype.kind in "biuO"
+
+
+def _pandas_formatted_column(column: pd.Series) -> list:
+    """
+    The fields pandas writes for column (e.g. nullable Int64 or datetimes, which it formats
+    its own way). A constant second column is written alongside so an empty field isn't
+    quoted as it would be on its own.
+    """
+    row_end = "\x1e"
+    text = pd.DataFrame({"value": column.to_numpy(), "end": 0}, copy=False).to_csv(
+        index=False, header=False, float_format=FLOAT_FORMAT, lineterminator=row_end
+    )
+    return [row[: -len(",0")] for row in text.split(row_end)[:-1]]
+
+
+def format_csv(data: pd.DataFrame) -> str:
+    """
+    Returns exactly the same text as data.to_csv(index=False, float_format="%g").
+
+    The float columns are the bulk of the outputs (one per draw) and pandas formats each
+    value separately, so instead each row is formatted with a single %-format of the
+    whole row. Rows containing a NaN (written as an empty field) are formatted value
+    by value. Columns that pandas formats itself (anything but floats, ints, bools and
+    objects) are formatted by pandas.
+    """
+    if len(data.columns) < 2:
+        # A lone empty field gets quoted by pandas, so leave the trivial case to it
+        return data.to_csv(index=False, float_format=FLOAT_FORMAT)
+
+    # Includes the nullable Float64 columns, with NA as NaN
+    is_float_column = [dtype.kind == "f" for dtype in data.dtypes]
+    column_values = []
+    for column_index, is_float in enumerate(is_float_column):
+        column = data.iloc[:, column_index]
+        if is_float:
+            column_values.append(column.to_numpy(dtype=float, na_value=np.nan).tolist())
+        elif _is_plain_column(column.dtype):
+            column_values.append(
+                [
+                    "" if pd.isna(value) else _csv_field(value)
+                    for value in column.to_numpy().tolist()
+                ]
+            )
+        else:
+            column_values.append(_pandas_formatted_column(column))
+
+    row_format = ",".join(FLOAT_FORMAT if is_float else "%s" for is_float in is_float_column)
+    float_block = data.loc[:, is_float_column].to_numpy(dtype=float, na_value=np.nan)
+    rows_with_nan = set(np.flatnonzero(np.isnan(float_block).any(axis=1)).tolist())
+
+    lines = [",".join(_csv_field(column) for column in data.columns)]
+    for row_index, row in enumerate(zip(*column_values)):
+        if row_index in rows_with_nan:
+            lines.append(",".join(
+                ("" if value != value else FLOAT_FORMAT % value) if is_float else value
+                for value, is_float in zip(row, is_float_column)
+            ))
+        else:
+            lines.append(row_format % row)
+    lines.append("")
+    return os.linesep.join(lines)
+
+
+def write_csv(
+    data: pd.DataFrame, file_path, compression: OutputCompression | None = None
+) -> str:
+    """
+    Writes data to file_path, producing exactly the same text as
+    data.to_csv(file_path, index=False, float_format="%g") (see format_csv).
+
+    If compression is given, the text is compressed and the suffix for the method
+    (e.g. .gz) is added to file_path.
+    """
+    file_path = f"{file_path}{compression.suffix}" if compression else str(file_path)
+    with open_text(file_path, "w", compression) as file:
+        file.write(format_csv(data))
+    return file_path
+
+
+class OutputBundle:
+    """
+    A zip archive holding all the files of one output directory (e.g. ius/), to avoid
+    writing tens of thousands of small files.
+
+    The entries have the same names the files would have had in the directory. The zip's
+    central directory indexes them, and index.csv lists every entry with its row count.
+    An existing bundle at path is replaced (as rerunning the pipeline overwrites each file of
+    a directory). Safe to write to from multiple threads.
+    """
+
+    INDEX_FILE_NAME = "index.csv"
+
+    def __init__(self, path):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._archive = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._lock = threading.Lock()
+        self._index = []
+
+    def write_csv(self, name: str, data: pd.DataFrame) -> str:
+        text = format_csv(data)
+        with self._lock:
+            self._archive.writestr(name, text)
+            self._index.append((name, len(data)))
+        return name
+
+    def write_file(self, file_path, name: str) -> str:
+        """Copies an existing file into the bundle (its row count is not indexed)"""
+        with self._lock:
+            self._archive.write(file_path, name)
+            self._index.append((name, None))
+        return name
+
+    def read_csv(self, name: str) -> pd.DataFrame:
+        with self._lock:
+            with self._archive.open(name) as entry:
+                return pd.read_csv(entry)
+
+    def close(self):
+        with self._lock:
+            if self._archive is None:
+                return
+            if self._index:
+                index = pd.DataFrame(self._index, columns=["file_name", "rows"])
+                self._archive.writestr(self.INDEX_FILE_NAME, format_csv(index))
+            self._archive.close()
+            self._archive = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BackgroundWriter:
+    """
+    Writes CSVs (see write_csv) on a pool of background threads, so the pipeline can carry on
+    computing the next output while the previous ones are written to disk.
+
+    The queue of pending writes is bounded, so if the disk can't keep up write_csv blocks
+    rather than holding every pending output in memory. Each directory written to is only
+    created once.
+
+    If a write fails, the error is raised by the next call to write_csv, flush or close.
+    flush must be called before reading back anything that has been written.
+    """
+
+    _STOP = object()
+
+    def __init__(self, num_threads: int = 2, max_queued: int = 16):
+        if num_threads < 1:
+            raise ValueError(f"A BackgroundWriter needs at least one thread, not {num_threads}")
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._created_dirs = set()
+        self._lock = threading.Lock()
+        self._errors = []
+        self._threads = [
+            threading.Thread(target=self._write_queued, daemon=True) for _ in range(num_threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def write_csv(
+        self, data: pd.DataFrame, file_path, compression: OutputCompression | None = None
+    ) -> str:
+        """Queues data to be written to file_path, returning the path that will be written"""
+        self._raise_error()
+        if not self._threads:
+            raise Exception("Cannot write using a closed BackgroundWriter")
+        self._queue.put((data, file_path, compression))
+        return f"{file_path}{compression.suffix}" if compression else str(file_path)
+
+    def flush(self):
+        """Waits for the queued writes to finish, raising the first error (if any)"""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            for _ in self._threads:
+                self._queue.put(self._STOP)
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _raise_error(self):
+        with self._lock:
+            if not self._errors:
+                return
+            error = self._errors[0]
+            self._errors.clear()
+        raise error
+
+    def _write_queued(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                data, file_path, compression = item
+                directory = Path(file_path).parent
+                self._make_dir(directory)
+                try:
+                    write_csv(data, file_path, compression)
+                except FileNotFoundError:
+                    # The directory has been removed since it was created
+                    self._make_dir(directory, cached=False)
+                    write_csv(data, file_path, compression)
+            except Exception as error:
+                with self._lock:
+                    self._errors.append(error)
+            finally:
+                self._queue.task_done()
+
+    def _make_dir(self, directory: Path, cached: bool = True):
+        with self._lock:
+            if cached and directory in self._created_dirs:
+                return
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._created_dirs.add(directory)
+
+
+def open_background_writer(num_threads: int):
+    """
+    Returns a BackgroundWriter with num_threads threads, or if num_threads is 0 a context
+    manager giving None (meaning each output is written before carrying on).
+    """
+    if num_threads <= 0:
+        return nullcontext()
+    return BackgroundWriter(num_threads)
+
+
+def get_bundle_path(root_dir, artifact: str):
+    return f"{root_dir}/{artifact}.zip"
+
+
+def bundle_directory(directory, bundle_path):
+    """
+    Copies every file under directory into a bundle at bundle_path (keeping their paths
+    relative to directory as the entry names). The directory is kept, as the canonical
+    results are read from it by later runs.
+    """
+    with OutputBundle(bundle_path) as bundle:
+        for file_path in sorted(Path(directory).rglob("*")):
+            if file_path.is_file():
+                bundle.write_file(file_path, file_path.relative_to(directory).as_posix())
+
+
 def write_canonical(
-    root_dir, file_info: CustomFileInfo, canonical_result: pd.DataFrame
+    root_dir,
+    file_info: CustomFileInfo,
+    canonical_result: pd.DataFrame,
+    compression: OutputCompression | None = None,
+    writer: BackgroundWriter | None = None,
 ):
     scenario = file_info.scenario
     country = file_info.country
     iu = file_info.iu
     file_name = canonical_file_name.get_name(file_info)
     path = Path(f"{get_canonical_dir(root_dir)}/{scenario}/{country}/{iu}/")
+    if writer is not None:
+        return writer.write_csv(canonical_result, f"{path}/{file_name}", compression)
     path.mkdir(parents=True, exist_ok=True)
-    canonical_result.to_csv(f"{path}/{file_name}", index=False, float_format="%g")
+    return write_csv(canonical_result, f"{path}/{file_name}", compression)
 
 
 def get_canonical_dir(working_dir):
     return f"{working_dir}/canonical_results/"
 
 
+def get_draw_cube_dir(working_dir):
+    return f"{working_dir}/draw_cubes/"
+
+
+def get_threshold_dir(working_dir, threshold: float):
+    return f"{working_dir}/threshold_{threshold}"
+
+
 def write_iu_stat_agg(
-    root_dir, file_info: CustomFileInfo, iu_statistical_aggregate: pd.DataFrame
+    root_dir,
+    file_info: CustomFileInfo,
+    iu_statistical_aggregate: pd.DataFrame,
+    compression: OutputCompression | None = None,
+    bundle: OutputBundle | None = None,
+    writer: BackgroundWriter | None = None,
 ):
     scenario = file_info.scenario
     iu = file_info.iu
     file_name = f"{scenario}_{iu}_post_processed.csv"
+    if bundle is not None:
+        return bundle.write_csv(file_name, iu_statistical_aggregate)
     path = Path(f"{root_dir}/ius/")
+    if writer is not None:
+        return writer.write_csv(iu_statistical_aggregate, f"{path}/{file_name}", compression)
     path.mkdir(parents=True, exist_ok=True)
-    iu_statistical_aggregate.to_csv(
-        f"{path}/{file_name}", index=False, float_format="%g"
-    )
+    return write_csv(iu_statistical_aggregate, f"{path}/{file_name}", compression)
 
 
 def write_combined_iu_stat_agg(
@@ -43,7 +342,7 @@ def write_combined_iu_stat_agg(
     file_name = f"combined-{disease.name.lower()}-iu-lvl-agg.csv"
     path = Path(f"{root_dir}/aggregated/")
     path.mkdir(parents=True, exist_ok=True)
-    all_ius_stat_agg.to_csv(f"{path}/{file_name}", index=False, float_format="%g")
+    write_csv(all_ius_stat_agg, f"{path}/{file_name}")
 
 
 def write_country_stat_agg(
@@ -52,23 +351,67 @@ def write_country_stat_agg(
     file_name = f"combined-{disease.name.lower()}-country-lvl-agg.csv"
     path = Path(f"{root_dir}/aggregated/")
     path.mkdir(parents=True, exist_ok=True)
-    country_statistical_aggregate.to_csv(
-        f"{path}/{file_name}", index=False, float_format="%g"
-    )
+    write_csv(country_statistical_aggregate, f"{path}/{file_name}")
 
 
-def write_country_composite(root_dir, country: str, country_composite: pd.DataFrame):
+def write_grouping_stat_agg(
+    root_dir, grouping_statistical_aggregate: pd.DataFrame, disease: Disease, grouping: str
+):
+    file_name = f"combined-{disease.name.lower()}-{grouping}-lvl-agg.csv"
+    path = Path(f"{root_dir}/aggregated/")
+    path.mkdir(parents=True, exist_ok=True)
+    write_csv(grouping_statistical_aggregate, f"{path}/{file_name}")
+
+
+def write_country_composite(
+    root_dir,
+    country: str,
+    country_composite: pd.DataFrame,
+    compression: OutputCompression | None = None,
+    bundle: OutputBundle | None = None,
+    writer: BackgroundWriter | None = None,
+):
     file_name = f"{country}_composite.csv"
+    if bundle is not None:
+        return bundle.write_csv(file_name, country_composite)
     path = Path(f"{root_dir}/composite/")
+    if writer is not None:
+        return writer.write_csv(country_composite, f"{path}/{file_name}", compression)
     path.mkdir(parents=True, exist_ok=True)
-    country_composite.to_csv(f"{path}/{file_name}", index=False, float_format="%g")
+    return write_csv(country_composite, f"{path}/{file_name}", compression)
 
 
-def write_africa_composite(root_dir, country_composite: pd.DataFrame):
+def write_group_composite(
+    root_dir,
+    grouping: str,
+    group: str,
+    group_composite: pd.DataFrame,
+    compression: OutputCompression | None = None,
+    bundle: OutputBundle | None = None,
+    writer: BackgroundWriter | None = None,
+):
+    file_name = f"{grouping}-{group}_composite.csv"
+    if bundle is not None:
+        return bundle.write_csv(file_name, group_composite)
+    path = Path(f"{root_dir}/composite/")
+    if writer is not None:
+        return writer.write_csv(group_composite, f"{path}/{file_name}", compression)
+    path.mkdir(parents=True, exist_ok=True)
+    return write_csv(group_composite, f"{path}/{file_name}", compression)
+
+
+def write_africa_composite(
+    root_dir,
+    country_composite: pd.DataFrame,
+    compression: OutputCompression | None = None,
+    bundle: OutputBundle | None = None,
+):
     file_name = "africa_composite.csv"
+    if bundle is not None:
+        return bundle.write_csv(file_name, country_composite)
     path = Path(f"{root_dir}/composite/")
     path.mkdir(parents=True, exist_ok=True)
-    country_composite.to_csv(f"{path}/{file_name}", index=False, float_format="%g")
+    return write_csv(country_composite, f"{path}/{file_name}", compression)
 
 
 def write_africa_stat_agg(
@@ -77,15 +420,11 @@ def write_africa_stat_agg(
     file_name = f"combined-{disease.name.lower()}-africa-lvl-agg.csv"
     path = Path(f"{root_dir}/aggregated/")
     path.mkdir(parents=True, exist_ok=True)
-    africa_statistical_aggregate.to_csv(
-        f"{path}/{file_name}", index=False, float_format="%g"
-    )
+    write_csv(africa_statistical_aggregate, f"{path}/{file_name}")
 
 
 def write_meta_data_file(root_dir, iu_metadata_file):
-    iu_metadata_file.to_csv(
-        f"{root_dir}/iu_metadata.csv", index=False, float_format="%g"
-    )
+    write_csv(iu_metadata_file, f"{root_dir}/iu_metadata.csv")
 
 def write_results_metadata_file(root_dir, results_meta_data):
     file_name = "aggregation_info.json"
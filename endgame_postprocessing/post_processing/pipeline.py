@@ -1,92 +1,296 @@
 import itertools
+import warnings
 from collections import defaultdict
+from functools import partial
+from typing import Dict
 
 import pandas as pd
+from joblib import Parallel, delayed
 from tqdm import tqdm
 
 import endgame_postprocessing.model_wrappers.constants as constants
 from endgame_postprocessing.post_processing import (
+    canonical_manifest,
+    canonicalise,
+    composite_delta,
     composite_run,
+    draw_cube,
+    file_catalog,
+    group_composite,
     iu_data_fixup,
+    iu_grouping,
     output_directory_structure,
     canonical_columns,
 )
 from endgame_postprocessing.post_processing.aggregation import (
     africa_lvl_aggregate,
+    africa_lvl_aggregate_from_country_partials,
     aggregate_post_processed_files,
+    build_country_partials,
     single_country_aggregate,
-    africa_composite,
+    single_group_aggregate,
+    africa_composite_from_country_partials,
+    country_sustained_under_threshold_year,
     filter_to_maximum_year_range_for_all_ius,
 )
 from endgame_postprocessing.post_processing.aggregation import (
     iu_lvl_aggregate,
     country_lvl_aggregate,
 )
-from endgame_postprocessing.post_processing.file_util import (
-    post_process_file_generator,
-    custom_progress_bar_update,
-)
+from endgame_postprocessing.post_processing.file_util import custom_progress_bar_update
 from endgame_postprocessing.post_processing.iu_data import IUData, IUSelectionCriteria
 from endgame_postprocessing.post_processing.pipeline_config import PipelineConfig
+from endgame_postprocessing.post_processing.prefetch import prefetch
 from endgame_postprocessing.post_processing.single_file_post_processing import (
-    process_single_file,
+    process_single_file_for_thresholds,
     measure_summary_float,
 )
+from endgame_postprocessing.post_processing.warnings_collector import (
+    flush_worker_warnings,
+    forward_worker_warnings,
+)
 
 
-def iu_statistical_aggregates(working_directory, threshold):
-    file_iter = post_process_file_generator(
-        file_directory=output_directory_structure.get_canonical_dir(working_directory),
-        end_of_file="_canonical.csv",
-    )
-    with tqdm(total=1, desc="Post-processing Scenarios") as pbar:
-        for file_info in file_iter:
-            iu_statistical_aggregate = process_single_file(
-                raw_model_outputs=pd.read_csv(file_info.file_path),
-                scenario=file_info.scenario,
-                iuName=file_info.iu,
-                prevalence_marker_name=canonical_columns.PROCESSED_PREVALENCE,
-                post_processing_start_time=1970,
-                post_processing_end_time=2041,
-                threshold=threshold,
-                measure_summary_map={canonical_columns.PROCESSED_PREVALENCE: measure_summary_float},
-                pct_runs_under_threshold=constants.PCT_RUNS_UNDER_THRESHOLD,
-            )
+def _read_canonical_file(file_info):
+    return canonicalise.read_canonical(file_info.file_path, scenario=file_info.scenario)
+
 
-            output_directory_structure.write_iu_stat_agg(
-                working_directory, file_info, iu_statistical_aggregate
+def _statistical_aggregates(
+    file_info,
+    canonical_result,
+    thresholds,
+    include_sustained_under_threshold_year=False,
+    quantile_relative_accuracy=None,
+):
+    return process_single_file_for_thresholds(
+        raw_model_outputs=canonical_result,
+        scenario=file_info.scenario,
+        iuName=file_info.iu,
+        prevalence_marker_name=canonical_columns.PROCESSED_PREVALENCE,
+        post_processing_start_time=1970,
+        post_processing_end_time=2041,
+        thresholds=thresholds,
+        measure_summary_map={
+            canonical_columns.PROCESSED_PREVALENCE: (
+                measure_summary_float
+                if quantile_relative_accuracy is None
+                else partial(
+                    measure_summary_float, quantile_relative_accuracy=quantile_relative_accuracy
+                )
             )
+        },
+        pct_runs_under_threshold=constants.PCT_RUNS_UNDER_THRESHOLD,
+        include_sustained_under_threshold_year=include_sustained_under_threshold_year,
+    )
 
-            custom_progress_bar_update(pbar, file_info.scenario_index, file_info.total_scenarios)
 
+def _compute_iu_statistical_aggregates(
+    file_info,
+    thresholds,
+    include_sustained_under_threshold_year=False,
+    quantile_relative_accuracy=None,
+):
+    return _statistical_aggregates(
+        file_info,
+        _read_canonical_file(file_info),
+        thresholds,
+        include_sustained_under_threshold_year,
+        quantile_relative_accuracy,
+    )
 
-def country_composite(
-    working_directory,
-    iu_meta_data,
+
+def _write_iu_statistical_aggregates(
+    output_directories, file_info, iu_statistical_aggregates, compression=None, bundles=None,
+    writer=None,
 ):
-    canonical_file_iter = post_process_file_generator(
-        file_directory=output_directory_structure.get_canonical_dir(working_directory),
-        end_of_file="_canonical.csv",
+    for threshold, output_directory in output_directories.items():
+        output_directory_structure.write_iu_stat_agg(
+            output_directory,
+            file_info,
+            iu_statistical_aggregates[threshold],
+            compression,
+            bundles[threshold] if bundles is not None else None,
+            writer,
+        )
+
+
+def _iu_statistical_aggregate(
+    output_directories,
+    file_info,
+    compression=None,
+    include_sustained_under_threshold_year=False,
+    quantile_relative_accuracy=None,
+):
+    _write_iu_statistical_aggregates(
+        output_directories,
+        file_info,
+        _compute_iu_statistical_aggregates(
+            file_info,
+            list(output_directories),
+            include_sustained_under_threshold_year,
+            quantile_relative_accuracy,
+        ),
+        compression,
     )
 
+
+def iu_statistical_aggregates(
+    working_directory,
+    output_directories,
+    num_jobs=1,
+    compression=None,
+    bundles=None,
+    prefetch_depth=0,
+    writer=None,
+    include_sustained_under_threshold_year=False,
+    quantile_relative_accuracy=None,
+):
+    """
+    Writes the statistical aggregates of every canonical IU in working_directory, for each
+    threshold in output_directories (a map from threshold to the directory to write its ius/
+    in). The canonical result of each IU is only read once, however many thresholds there are.
+    If quantile_relative_accuracy is given the percentiles are estimated (see
+    measure_summary_float).
+    """
+    thresholds = list(output_directories)
+    file_iter = canonical_manifest.canonical_file_generator(working_directory)
+    if num_jobs == 1:
+        with tqdm(total=1, desc="Post-processing Scenarios") as pbar:
+            for file_info, canonical_result in prefetch(
+                file_iter, _read_canonical_file, prefetch_depth
+            ):
+                _write_iu_statistical_aggregates(
+                    output_directories,
+                    file_info,
+                    _statistical_aggregates(
+                        file_info,
+                        canonical_result,
+                        thresholds,
+                        include_sustained_under_threshold_year,
+                        quantile_relative_accuracy,
+                    ),
+                    compression,
+                    bundles,
+                    writer,
+                )
+                custom_progress_bar_update(
+                    pbar, file_info.scenario_index, file_info.total_scenarios
+                )
+        return
+
+    all_files = list(file_iter)
+    if bundles is None:
+        iu_statistical_aggregate_jobs = Parallel(n_jobs=num_jobs, return_as="generator")(
+            delayed(
+                forward_worker_warnings(
+                    _iu_statistical_aggregate, key=(file_info.scenario, file_info.iu)
+                )
+            )(
+                output_directories,
+                file_info,
+                compression,
+                include_sustained_under_threshold_year,
+                quantile_relative_accuracy,
+            )
+            for file_info in all_files
+        )
+        for _ in tqdm(
+            iu_statistical_aggregate_jobs, total=len(all_files), desc="Post-processing Scenarios"
+        ):
+            pass
+    else:
+        # The bundles can only be written to from this process, so the workers just compute
+        iu_statistical_aggregate_jobs = Parallel(n_jobs=num_jobs, return_as="generator")(
+            delayed(
+                forward_worker_warnings(
+                    _compute_iu_statistical_aggregates, key=(file_info.scenario, file_info.iu)
+                )
+            )(
+                file_info,
+                thresholds,
+                include_sustained_under_threshold_year,
+                quantile_relative_accuracy,
+            )
+            for file_info in all_files
+        )
+        for file_info, iu_statistical_aggregates in tqdm(
+            zip(all_files, iu_statistical_aggregate_jobs),
+            total=len(all_files),
+            desc="Post-processing Scenarios",
+        ):
+            _write_iu_statistical_aggregates(
+                output_directories, file_info, iu_statistical_aggregates, bundles=bundles
+            )
+    flush_worker_warnings()
+
+
+def _canonical_iu_readers_by_country(working_directory, draw_cubes=None):
+    canonical_ius_by_country = defaultdict(list)
+
+    if draw_cubes is not None:
+        for cube in draw_cubes:
+            for iu_index, country in enumerate(cube.countries):
+                canonical_ius_by_country[country].append(
+                    partial(cube.canonical_iu_run, iu_index)
+                )
+        return canonical_ius_by_country
+
+    canonical_file_iter = canonical_manifest.canonical_file_generator(working_directory)
+
     canonical_ius = list(canonical_file_iter)
 
     canoncial_ius_by_country_iter = itertools.groupby(
         canonical_ius, lambda file_info: file_info.country
     )
 
-    canonical_ius_by_country = defaultdict(list)
-
     for country, file_info_for_canonical_iu in canoncial_ius_by_country_iter:
-        canonical_ius_by_country[country] += file_info_for_canonical_iu
+        canonical_ius_by_country[country] += [
+            partial(
+                canonicalise.read_canonical,
+                file_info.file_path,
+                canonicalise.COMPOSITE_COLUMNS,
+                scenario=file_info.scenario,
+            )
+            for file_info in file_info_for_canonical_iu
+        ]
+    return canonical_ius_by_country
+
+
+def country_composite(
+    working_directory,
+    iu_meta_data,
+    compression=None,
+    draw_cubes=None,
+    bundle=None,
+    prefetch_depth=0,
+    writer=None,
+    country_partials=None,
+    thresholds=(),
+):
+    """
+    Builds and writes the composite of each country, yielding them in turn.
+
+    If country_partials is given, the partials of each country (see
+    aggregation.build_country_partials, for thresholds) are appended to it as the countries
+    are built, so the Africa composite can be built from them without reading the IUs again.
+    """
+    canonical_ius_by_country = _canonical_iu_readers_by_country(working_directory, draw_cubes)
 
-    for country, ius_for_country in tqdm(
-        canonical_ius_by_country.items(), desc="Building country composites"
+    # Read ahead by country, so the IUs for the next countries are loaded while this
+    # country's composite is built
+    for country, canonical_iu_data_for_country in tqdm(
+        prefetch(
+            canonical_ius_by_country,
+            lambda country: [
+                read_iu_for_country() for read_iu_for_country in canonical_ius_by_country[country]
+            ],
+            prefetch_depth,
+        ),
+        total=len(canonical_ius_by_country),
+        desc="Building country composites",
     ):
         cannonical_iu_data_for_country_composite = filter_to_maximum_year_range_for_all_ius(
-            list(
-                [pd.read_csv(iu_for_country.file_path) for iu_for_country in ius_for_country]
-            ),
+            canonical_iu_data_for_country,
             keep_na_year_id=False
         )
         country_composite = composite_run.build_composite_run_multiple_scenarios(
@@ -94,19 +298,21 @@ def country_composite(
             iu_meta_data,
         )
         output_directory_structure.write_country_composite(
-            working_directory, country, country_composite
+            working_directory, country, country_composite, compression, bundle, writer
         )
+        if country_partials is not None:
+            country_partials.extend(
+                build_country_partials(
+                    cannonical_iu_data_for_country_composite, iu_meta_data, thresholds
+                )
+            )
         yield country_composite
 
 
-def country_aggregate(
-    country_composite: pd.DataFrame,
-    iu_lvl_data: pd.DataFrame,
-    country_code: str,
-    iu_meta_data: IUData,
+def _country_iu_summary_aggregates(
+    iu_lvl_data: pd.DataFrame, country_code: str, iu_meta_data: IUData
 ):
-    country_statistical_aggregates = single_country_aggregate(country_composite)
-    country_iu_summary_aggregates = country_lvl_aggregate(
+    return country_lvl_aggregate(
         iu_lvl_data,
         constants.COUNTRY_THRESHOLD_SUMMARY_COLUMNS,
         constants.COUNTRY_THRESHOLD_SUMMARY_GROUP_COLUMNS,
@@ -114,92 +320,424 @@ def country_aggregate(
         constants.PCT_RUNS_UNDER_THRESHOLD,
         iu_meta_data.get_total_ius_in_country(country_code),
     )
-    return pd.concat([country_statistical_aggregates, country_iu_summary_aggregates])
 
 
-def pipeline(input_dir, working_directory, pipeline_config: PipelineConfig):
-    iu_statistical_aggregates(working_directory, threshold=pipeline_config.threshold)
+def _single_pass_composites(
+    working_directory,
+    iu_meta_data: IUData,
+    pipeline_config: PipelineConfig,
+    draw_cubes=None,
+    bundle=None,
+    writer=None,
+    groupings=None,
+):
+    """
+    Builds and writes every country composite, the Africa composite and the composite of every
+    group of groupings from one read of the canonical results (see
+    group_composite.build_composites).
 
-    all_ius = set(
-        [
-            file_info.iu
-            for file_info in post_process_file_generator(
-                file_directory=output_directory_structure.get_canonical_dir(working_directory),
-                end_of_file="_canonical.csv",
+    Returns:
+        The country composites, the canonical IUs filtered to the years of the Africa composite
+        (as africa_composite returns them), the Africa composite and the group composites of
+        each grouping.
+    """
+    canonical_iu_readers = [
+        read_canonical_iu
+        for canonical_iu_readers_for_country in _canonical_iu_readers_by_country(
+            working_directory, draw_cubes
+        ).values()
+        for read_canonical_iu in canonical_iu_readers_for_country
+    ]
+    canonical_iu_runs = [
+        canonical_iu_run
+        for _, canonical_iu_run in tqdm(
+            prefetch(
+                canonical_iu_readers,
+                lambda read_canonical_iu: read_canonical_iu(),
+                pipeline_config.prefetch_depth,
+            ),
+            total=len(canonical_iu_readers),
+            desc="Reading canonical results for composites",
+        )
+    ]
+
+    composites = group_composite.build_composites(canonical_iu_runs, iu_meta_data, groupings)
+    for country, composite in composites.countries.items():
+        output_directory_structure.write_country_composite(
+            working_directory,
+            country,
+            composite,
+            pipeline_config.output_compression,
+            bundle,
+            writer,
+        )
+    for grouping, group_composites in composites.groupings.items():
+        for group, composite in group_composites.items():
+            output_directory_structure.write_group_composite(
+                working_directory,
+                grouping,
+                group,
+                composite,
+                pipeline_config.output_compression,
+                bundle,
+                writer,
             )
-        ]
+    output_directory_structure.write_africa_composite(
+        working_directory, composites.africa, pipeline_config.output_compression, bundle
     )
-
-    fixedup_meta_data_file = iu_data_fixup.fixup_iu_meta_data_file(
-        pd.read_csv(f"{input_dir}/PopulationMetadatafile.csv"),
-        simulated_IUs=all_ius,
+    # The extinction metrics expect each scenario's IUs together, the readers are by country
+    scenario_order = {
+        scenario: index
+        for index, scenario in enumerate(
+            dict.fromkeys(run[canonical_columns.SCENARIO].iloc[0] for run in canonical_iu_runs)
+        )
+    }
+    canonical_iu_runs.sort(key=lambda run: scenario_order[run[canonical_columns.SCENARIO].iloc[0]])
+    return (
+        list(composites.countries.values()),
+        filter_to_maximum_year_range_for_all_ius(canonical_iu_runs, keep_na_year_id=False),
+        composites.africa,
+        composites.groupings,
     )
 
-    output_directory_structure.write_meta_data_file(working_directory, fixedup_meta_data_file)
 
-    iu_meta_data = IUData(
-        fixedup_meta_data_file,
-        pipeline_config.disease,
-        iu_selection_criteria=IUSelectionCriteria.SIMULATED_IUS,
-        simulated_IUs=all_ius,
-    )
+def _mixed_scenario_composites(
+    working_directory,
+    iu_meta_data: IUData,
+    pipeline_config: PipelineConfig,
+    mixed_scenario: composite_delta.MixedScenario,
+    thresholds,
+    bundle=None,
+    writer=None,
+):
+    """
+    Builds and writes every country composite of mixed_scenario from the scenarios its engine
+    already holds, rather than reading the canonical results again.
 
-    all_iu_data = (
-        iu_lvl_aggregate(aggregate_post_processed_files(f"{working_directory}/ius/"))
-        .sort_values(["scenario", "country_code", "iu_name", "year_id"])
-        .reset_index(drop=True)
-        .convert_dtypes()  # attempt to reconstruct the types (TODO: why are they lost)
-    )
+    Returns:
+        The country composites and the partials of each country for the Africa composite (see
+        aggregation.build_country_partials, for thresholds).
+    """
+    country_composites = mixed_scenario.country_composites(iu_meta_data)
+    for country, composite in country_composites.items():
+        output_directory_structure.write_country_composite(
+            working_directory,
+            country,
+            composite,
+            pipeline_config.output_compression,
+            bundle,
+            writer,
+        )
+    return list(country_composites.values()), mixed_scenario.country_partials(thresholds)
 
-    output_directory_structure.write_combined_iu_stat_agg(
-        working_directory, all_iu_data, pipeline_config.disease
+
+def _country_and_africa_summaries(
+    working_directory,
+    pipeline_config: PipelineConfig,
+    output_directories: Dict[float, str],
+    all_iu_data: Dict[float, pd.DataFrame],
+    iu_meta_data: IUData,
+    composite_bundle=None,
+    writer=None,
+    mixed_scenario: composite_delta.MixedScenario = None,
+):
+    """
+    Builds the country, Africa and extra grouping composites (once, in working_directory) and
+    writes their aggregates for each threshold to its directory in output_directories.
+    all_iu_data is the combined IU level aggregates for each threshold. If mixed_scenario is
+    given the country and Africa composites are built from it (see _mixed_scenario_composites).
+    """
+    groupings = {
+        grouping: iu_grouping.read_iu_grouping(grouping_file)
+        for grouping, grouping_file in (pipeline_config.groupings or {}).items()
+    }
+    if mixed_scenario is not None and groupings:
+        raise ValueError("Groupings can't be built for a mixed scenario's composites")
+    draw_cubes = (
+        draw_cube.write_draw_cubes(working_directory)
+        if pipeline_config.use_draw_cube and mixed_scenario is None
+        else None
     )
+    # The groupings can only be built alongside the countries and Africa
+    single_pass_composites = pipeline_config.single_pass_composites or bool(groupings)
 
-    if not pipeline_config.include_country_and_continent_summaries:
-        return
+    grouping_composites = {}
+    # The partials of each country for the Africa composite, unless it is built in one pass
+    country_partials = None
+    if mixed_scenario is not None:
+        country_composites, country_partials = _mixed_scenario_composites(
+            working_directory,
+            iu_meta_data,
+            pipeline_config,
+            mixed_scenario,
+            list(all_iu_data),
+            composite_bundle,
+            writer,
+        )
+    elif single_pass_composites:
+        country_composites, canonical_ius, composite_africa, grouping_composites = (
+            _single_pass_composites(
+                working_directory,
+                iu_meta_data,
+                pipeline_config,
+                draw_cubes,
+                composite_bundle,
+                writer,
+                groupings,
+            )
+        )
+    else:
+        country_partials = []
+        country_composites = country_composite(
+            working_directory,
+            iu_meta_data,
+            pipeline_config.output_compression,
+            draw_cubes,
+            composite_bundle,
+            pipeline_config.prefetch_depth,
+            writer,
+            country_partials,
+            list(all_iu_data),
+        )
 
-    country_aggregates = [
-        country_aggregate(
-            country_composite,
-            # The function returns a list, since the compiled iu aggregates already exist in a
-            # single data frame, its passed in as the sole item in the list
-            # and it will be the sole item returned
-            # The compiled iu aggregate dataframe is used because it contains newly calculated
-            # metrics needed for country level statistics.
-            filter_to_maximum_year_range_for_all_ius(
-                [all_iu_data[
-                    (all_iu_data["country_code"] == country_composite["country_code"].values[0])
-                ]],
-                keep_na_year_id=True
-            )[0],
-            country_composite["country_code"].values[0],
+    country_aggregates = defaultdict(list)
+    for composite in country_composites:
+        country_code = composite["country_code"].values[0]
+        # The composite statistics don't depend on the threshold
+        country_statistical_aggregates = single_country_aggregate(
+            composite, pipeline_config.quantile_relative_accuracy
+        )
+        for threshold, threshold_iu_data in all_iu_data.items():
+            country_aggregates[threshold].append(
+                pd.concat(
+                    [
+                        country_statistical_aggregates,
+                        *(
+                            [country_sustained_under_threshold_year(composite, threshold)]
+                            if pipeline_config.include_sustained_under_threshold_year
+                            else []
+                        ),
+                        _country_iu_summary_aggregates(
+                            # The function returns a list, since the compiled iu aggregates
+                            # already exist in a single data frame, its passed in as the sole
+                            # item in the list and it will be the sole item returned
+                            # The compiled iu aggregate dataframe is used because it contains
+                            # newly calculated metrics needed for country level statistics.
+                            filter_to_maximum_year_range_for_all_ius(
+                                [threshold_iu_data[
+                                    (threshold_iu_data["country_code"] == country_code)
+                                ]],
+                                keep_na_year_id=True
+                            )[0],
+                            country_code,
+                            iu_meta_data,
+                        ),
+                    ]
+                )
+            )
+
+    for threshold, output_directory in output_directories.items():
+        all_country_aggregates = (
+            pd.concat(country_aggregates[threshold])
+            .sort_values(["scenario", "country_code", "year_id"])
+            .reset_index(drop=True)
+            .convert_dtypes()  # attempt to reconstruct the types (TODO: why are they lost)
+        )
+        output_directory_structure.write_country_stat_agg(
+            output_directory, all_country_aggregates, pipeline_config.disease
+        )
+
+    for grouping, group_composites in grouping_composites.items():
+        if not group_composites:
+            warnings.warn(f"None of the IUs of grouping {grouping} were simulated")
+            continue
+        # The composite statistics don't depend on the threshold
+        grouping_aggregates = (
+            pd.concat(
+                [
+                    single_group_aggregate(
+                        composite,
+                        canonical_columns.GROUP,
+                        pipeline_config.quantile_relative_accuracy,
+                    )
+                    for composite in group_composites.values()
+                ]
+            )
+            .sort_values(["scenario", canonical_columns.GROUP, "year_id"])
+            .reset_index(drop=True)
+            .convert_dtypes()
+        )
+        for output_directory in output_directories.values():
+            output_directory_structure.write_grouping_stat_agg(
+                output_directory, grouping_aggregates, pipeline_config.disease, grouping
+            )
+
+    if country_partials is not None:
+        country_partials, composite_africa = africa_composite_from_country_partials(
+            working_directory,
+            country_partials,
             iu_meta_data,
+            pipeline_config.output_compression,
+            composite_bundle,
+        )
+    for threshold, output_directory in output_directories.items():
+        africa_aggregates = (
+            (
+                africa_lvl_aggregate(
+                    canonical_ius,
+                    composite_africa,
+                    prevalence_threshold=threshold,
+                    pct_runs_threshold=[0.9, 1.0],
+                    quantile_relative_accuracy=pipeline_config.quantile_relative_accuracy,
+                )
+                if country_partials is None
+                else africa_lvl_aggregate_from_country_partials(
+                    country_partials,
+                    composite_africa,
+                    prevalence_threshold=threshold,
+                    pct_runs_threshold=[0.9, 1.0],
+                    quantile_relative_accuracy=pipeline_config.quantile_relative_accuracy,
+                )
+            )
+            .sort_values(["scenario", "year_id"])
+            .reset_index(drop=True)
+            .convert_dtypes()  # attempt to reconstruct the types (TODO: why are they lost)
+        )
+        output_directory_structure.write_africa_stat_agg(
+            output_directory, africa_aggregates, pipeline_config.disease
         )
-        for country_composite in country_composite(working_directory, iu_meta_data)
-    ]
 
-    all_country_aggregates = (
-        pd.concat(country_aggregates)
-        .sort_values(["scenario", "country_code", "year_id"])
-        .reset_index(drop=True)
-        .convert_dtypes()  # attempt to reconstruct the types (TODO: why are they lost)
-    )
-    output_directory_structure.write_country_stat_agg(
-        working_directory, all_country_aggregates, pipeline_config.disease
+
+def _threshold_output_directories(working_directory, pipeline_config: PipelineConfig):
+    if pipeline_config.thresholds is None:
+        return {pipeline_config.threshold: working_directory}
+    return {
+        threshold: output_directory_structure.get_threshold_dir(working_directory, threshold)
+        for threshold in pipeline_config.thresholds
+    }
+
+
+def _open_bundle(working_directory, artifact, pipeline_config: PipelineConfig):
+    if not pipeline_config.bundle_outputs:
+        return None
+    return output_directory_structure.OutputBundle(
+        output_directory_structure.get_bundle_path(working_directory, artifact)
     )
 
-    africa_aggregates = (
-        africa_lvl_aggregate(
-            *africa_composite(
-                working_directory, iu_meta_data,
-            ),
-            prevalence_threshold=pipeline_config.threshold,
-            pct_runs_threshold=[0.9, 1.0],
+
+def pipeline(
+    input_dir,
+    working_directory,
+    pipeline_config: PipelineConfig,
+    mixed_scenario: composite_delta.MixedScenario = None,
+):
+    """
+    Post-processes the canonical results in working_directory. If the canonical results are
+    those of mixed_scenario, its country and Africa composites are built from the scenarios
+    its engine holds (see composite_delta.CompositeDeltaEngine).
+    """
+    with file_catalog.catalog_scope(), output_directory_structure.open_background_writer(
+        pipeline_config.writer_threads
+    ) as writer:
+        if pipeline_config.persist_file_index:
+            canonical_manifest.canonical_file_generator(
+                working_directory,
+                index_path=f"{working_directory}/{file_catalog.INDEX_FILE_NAME}",
+            )
+
+        output_directories = _threshold_output_directories(working_directory, pipeline_config)
+        ius_bundles = (
+            {
+                threshold: _open_bundle(output_directory, "ius", pipeline_config)
+                for threshold, output_directory in output_directories.items()
+            }
+            if pipeline_config.bundle_outputs
+            else None
         )
-        .sort_values(["scenario", "year_id"])
-        .reset_index(drop=True)
-        .convert_dtypes()  # attempt to reconstruct the types (TODO: why are they lost)
-    )
-    output_directory_structure.write_africa_stat_agg(
-        working_directory, africa_aggregates, pipeline_config.disease
-    )
+        try:
+            iu_statistical_aggregates(
+                working_directory,
+                output_directories,
+                num_jobs=pipeline_config.num_jobs,
+                compression=pipeline_config.output_compression,
+                bundles=ius_bundles,
+                prefetch_depth=pipeline_config.prefetch_depth,
+                writer=writer,
+                include_sustained_under_threshold_year=(
+                    pipeline_config.include_sustained_under_threshold_year
+                ),
+                quantile_relative_accuracy=pipeline_config.quantile_relative_accuracy,
+            )
+        finally:
+            if ius_bundles is not None:
+                for ius_bundle in ius_bundles.values():
+                    ius_bundle.close()
+        if writer is not None:
+            # The per IU files are read back below
+            writer.flush()
+
+        all_ius = set(
+            [
+                file_info.iu
+                for file_info in canonical_manifest.canonical_file_generator(working_directory)
+            ]
+        )
+
+        fixedup_meta_data_file = iu_data_fixup.fixup_iu_meta_data_file(
+            pd.read_csv(f"{input_dir}/PopulationMetadatafile.csv"),
+            simulated_IUs=all_ius,
+        )
+
+        output_directory_structure.write_meta_data_file(working_directory, fixedup_meta_data_file)
+
+        iu_meta_data = IUData(
+            fixedup_meta_data_file,
+            pipeline_config.disease,
+            iu_selection_criteria=IUSelectionCriteria.SIMULATED_IUS,
+            simulated_IUs=all_ius,
+        )
+
+        all_iu_data = {}
+        for threshold, output_directory in output_directories.items():
+            all_iu_data[threshold] = (
+                iu_lvl_aggregate(
+                    aggregate_post_processed_files(
+                        ius_bundles[threshold].path
+                        if ius_bundles is not None
+                        else f"{output_directory}/ius/"
+                    )
+                )
+                .sort_values(["scenario", "country_code", "iu_name", "year_id"])
+                .reset_index(drop=True)
+                .convert_dtypes()  # attempt to reconstruct the types (TODO: why are they lost)
+            )
+
+            output_directory_structure.write_combined_iu_stat_agg(
+                output_directory, all_iu_data[threshold], pipeline_config.disease
+            )
+
+        if pipeline_config.include_country_and_continent_summaries:
+            composite_bundle = _open_bundle(working_directory, "composite", pipeline_config)
+            try:
+                _country_and_africa_summaries(
+                    working_directory,
+                    pipeline_config,
+                    output_directories,
+                    all_iu_data,
+                    iu_meta_data,
+                    composite_bundle,
+                    writer,
+                    mixed_scenario,
+                )
+            finally:
+                if composite_bundle is not None:
+                    composite_bundle.close()
+
+        if pipeline_config.bundle_outputs and not canonical_manifest.get_manifest_path(
+            working_directory
+        ).exists():
+            # A single archive of the canonical results to share, the directory is kept
+            output_directory_structure.bundle_directory(
+                output_directory_structure.get_canonical_dir(working_directory),
+                output_directory_structure.get_bundle_path(working_directory, "canonical_results"),
+            )
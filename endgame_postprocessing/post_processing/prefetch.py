@@ -0,0 +1,45 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Generator, Iterable, Tuple, TypeVar
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+
+def prefetch(
+    items: Iterable[Item], read: Callable[[Item], Result], depth: int = 0
+) -> Generator[Tuple[Item, Result], None, None]:
+    """
+    Yields (item, read(item)) for each item, in order, while reading up to depth of the
+    following items on background threads. This lets the (I/O bound) reading of the next
+    files overlap with the (CPU bound) processing of the current one.
+
+    At most depth + 1 results are held at once, so depth caps the extra memory used.
+    Any exception raised by read is raised when its item is reached.
+
+    Args:
+        items: The items to read (e.g. CustomFileInfos).
+        read: Reads a single item (e.g. loads the CSV for a CustomFileInfo).
+        depth (int): How many items to read ahead. 0 (the default) reads each item
+            only when it is needed, without any background threads.
+    """
+    if depth <= 0:
+        for item in items:
+            yield item, read(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=depth) as executor:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append((item, executor.submit(read, item)))
+                if len(pending) > depth:
+                    next_item, next_result = pending.popleft()
+                    yield next_item, next_result.result()
+            while pending:
+                next_item, next_result = pending.popleft()
+                yield next_item, next_result.result()
+        finally:
+            # If the caller stops early, don't read anything that hasn't been started
+            for _, not_needed in pending:
+                not_needed.cancel()
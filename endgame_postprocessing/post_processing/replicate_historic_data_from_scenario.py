@@ -1,50 +1,82 @@
 import warnings
 from collections import defaultdict
+from typing import Collection, Mapping
 
 import pandas as pd
 
 from endgame_postprocessing.post_processing import canonical_columns
 from endgame_postprocessing.post_processing.canonical_results import CanonicalResults
+from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
 
 
-def replicate_historic_data_in_all_scenarios(results: CanonicalResults,
-                                             source_scenario: str) -> CanonicalResults:  # noqa E501
-    if source_scenario not in results:
-        raise ValueError(f"Invalid source_scenario: '{source_scenario}' as not in {list(results.keys())}")  # noqa E501
-    updated_results = defaultdict(dict)
-    ius_to_exclude = []
-    for other_scenario in results:
+def validate_source_scenario(scenarios: Collection[str], source_scenario: str):
+    if source_scenario not in scenarios:
+        raise ValueError(f"Invalid source_scenario: '{source_scenario}' as not in {list(scenarios)}")  # noqa E501
+
+
+def find_ius_to_exclude(ius_by_scenario: Mapping[str, Mapping[str, object]],
+                        source_scenario: str) -> set[str]:
+    """
+    Works out which IUs cannot have the historic data from source_scenario replicated
+    into every other scenario, warning about each one.
+
+    Only the IU codes are needed (ius_by_scenario maps scenario -> iu -> anything) so this
+    can be done up front, before any of the data has been loaded.
+    """
+    ius_to_exclude = set()
+    for other_scenario in ius_by_scenario:
         if other_scenario == source_scenario:
-            updated_results[other_scenario] = results[other_scenario]
             continue
-        updated_results[other_scenario] = {}
-        for iu in results[source_scenario]:
-            if iu not in results[other_scenario]:
+        for iu in ius_by_scenario[source_scenario]:
+            if iu not in ius_by_scenario[other_scenario]:
                 warnings.warn(f"IU {iu} found in {source_scenario} but not found in {other_scenario}")  # noqa E501
-                ius_to_exclude.append(iu)
-                continue
-            _, source_scenario_data = results[source_scenario][iu]
-            other_scenario_file, other_scenario_data = results[other_scenario][iu]
-            first_year_of_other_scenario = other_scenario_data[canonical_columns.YEAR_ID].min()
-            source_scenario_data_up_to_start = source_scenario_data.loc[
-                source_scenario_data[canonical_columns.YEAR_ID] < first_year_of_other_scenario
-                ]
-            new_scenario_data = pd.concat([source_scenario_data_up_to_start, other_scenario_data])
-            new_scenario_data["scenario"] = other_scenario_file.scenario
-            updated_results[other_scenario][iu] = (other_scenario_file, new_scenario_data)
-
-    for scenario in results:
+                ius_to_exclude.add(iu)
+
+    for scenario in ius_by_scenario:
         if scenario == source_scenario:
             continue
-        ius_without_historic_data = results[scenario].keys() - results[source_scenario].keys()
+        ius_without_historic_data = (
+            ius_by_scenario[scenario].keys() - ius_by_scenario[source_scenario].keys()
+        )
         for iu in ius_without_historic_data:
             warnings.warn(
                 f"IU {iu} was not found in {source_scenario} and as such will not have the historic data")  # noqa E501
-            ius_to_exclude.append(iu)
+            ius_to_exclude.add(iu)
+    return ius_to_exclude
+
 
-    for excluded_iu in ius_to_exclude:
-        for scenario in updated_results:
-            if excluded_iu in updated_results[scenario]:
-                del updated_results[scenario][excluded_iu]
+def prepend_historic_data(source_scenario_data: pd.DataFrame,
+                          other_scenario_file: CustomFileInfo,
+                          other_scenario_data: pd.DataFrame) -> pd.DataFrame:
+    first_year_of_other_scenario = other_scenario_data[canonical_columns.YEAR_ID].min()
+    source_scenario_data_up_to_start = source_scenario_data.loc[
+        source_scenario_data[canonical_columns.YEAR_ID] < first_year_of_other_scenario
+        ]
+    new_scenario_data = pd.concat([source_scenario_data_up_to_start, other_scenario_data])
+    new_scenario_data["scenario"] = other_scenario_file.scenario
+    return new_scenario_data
+
+
+def replicate_historic_data_in_all_scenarios(results: CanonicalResults,
+                                             source_scenario: str) -> CanonicalResults:  # noqa E501
+    validate_source_scenario(results.keys(), source_scenario)
+    ius_to_exclude = find_ius_to_exclude(results, source_scenario)
+
+    updated_results = defaultdict(dict)
+    for other_scenario in results:
+        updated_results[other_scenario] = {}
+        for iu in results[source_scenario]:
+            if iu in ius_to_exclude:
+                continue
+            if other_scenario == source_scenario:
+                updated_results[other_scenario][iu] = results[other_scenario][iu]
+                continue
+            _, source_scenario_data = results[source_scenario][iu]
+            other_scenario_file, other_scenario_data = results[other_scenario][iu]
+            updated_results[other_scenario][iu] = (
+                other_scenario_file,
+                prepend_historic_data(source_scenario_data, other_scenario_file,
+                                      other_scenario_data),
+            )
 
     return updated_results
@@ -9,13 +9,16 @@ from .constants import (
     PERCENTILES_TO_CALC,
     YEAR_COLUMN_NAME,
     DEFAULT_PREVALENCE_MEASURE_NAME,
-    PROB_UNDER_THRESHOLD_MEASURE_NAME
+    PROB_UNDER_THRESHOLD_MEASURE_NAME,
+    SUSTAINED_UNDER_THRESHOLD_YEAR_MEASURE_NAME,
 )
 from .measures import (
     build_summary,
     calc_prob_under_threshold,
-    find_year_reaching_threshold,
+    calc_sustained_under_threshold_years,
+    find_years_reaching_thresholds,
     measure_summary_float,
+    summarise_run_values,
 )
 
 
@@ -138,19 +141,15 @@ def _calculate_probabilities_and_thresholds(
         median=none_array,
     )
 
-    # find the rows where the proportion is >= pct_runs_under_threshold, select the top row as the
-    # first index
+    # find the rows where the proportion is >= each of pct_runs_under_threshold, select the top
+    # row as the first index
     # todo: verify/dynamically select the lowest year
-    years_of_pct_runs_under_threshold = []
-    for pct in pct_runs_under_threshold:
-        years_of_pct_runs_under_threshold.append(
-            find_year_reaching_threshold(
-                prob_prevalence_under_threshold,
-                pct,
-                filtered_model_outputs[prevalence_mask, year_column_loc],
-                np.greater_equal,
-            )
-        )
+    years_of_pct_runs_under_threshold = find_years_reaching_thresholds(
+        prob_prevalence_under_threshold,
+        pct_runs_under_threshold,
+        filtered_model_outputs[prevalence_mask, year_column_loc],
+        np.greater_equal,
+    )
 
     none_array = np.full(len(years_of_pct_runs_under_threshold), None)
     year_of_pct_runs_under_threshold_output = build_summary(
@@ -178,6 +177,45 @@ def _calculate_probabilities_and_thresholds(
     )
 
 
+def _calculate_sustained_under_threshold_year(
+    filtered_model_outputs: np.array,
+    year_column_loc: int,
+    measure_column_loc: int,
+    draws_loc: list[int],
+    prevalence_marker_name: str,
+    threshold: float,
+) -> np.ndarray:
+    """
+    A helper function that summarises, across the draws, the year from which each draw's
+    prevalence is under the threshold for good (see calc_sustained_under_threshold_years).
+
+    Args:
+        filtered_model_outputs (pd.DataFrame): The filtered data output in the form of a dataframe
+                                                from multiple runs of the model.
+        year_column_loc (int): Location of the year column.
+        measure_column_loc (int): Location of the measure column.
+        draws_loc list(int): Location of the draw columns.
+        prevalence_marker_name (str): The name of the prevalence measure that is used to
+                                        compare with the threhsold.
+        threshold (float): the value of the threshold we compare prevalence values
+                            to (value < threhsold).
+    Returns:
+        Returns a 2D Matrix with a single row summarising the year
+    """
+    prevalence_mask = (
+        filtered_model_outputs[:, measure_column_loc] == prevalence_marker_name
+    )
+    year_ids = filtered_model_outputs[prevalence_mask, year_column_loc].astype(float)
+    year_order = np.argsort(year_ids, kind="stable")
+    prevalence_vals = filtered_model_outputs[prevalence_mask, :][:, draws_loc].astype(float)
+    return summarise_run_values(
+        calc_sustained_under_threshold_years(
+            prevalence_vals[year_order], threshold, year_ids[year_order]
+        ),
+        SUSTAINED_UNDER_THRESHOLD_YEAR_MEASURE_NAME,
+    )
+
+
 def _summarize_measures(
     raw_output_data: np.array,
     year_column_loc: int,
@@ -260,6 +298,7 @@ def process_single_file(
     threshold: float = 0.01,
     pct_runs_under_threshold: list[float] = [0.90],
     measure_summary_map: dict = None,
+    include_sustained_under_threshold_year: bool = False,
 ) -> pd.DataFrame:
     """
     Takes in non-age-grouped model outputs and generates a summarized output file that summarizes
@@ -291,9 +330,50 @@ def process_single_file(
                                 summarize the measure passed in `prevalence_marker_name` using the
                                 `measure_summary_float` function. If a measure is supplied without a
                                 callable function, `measure_summary_float` will be used by default.
+        include_sustained_under_threshold_year (bool): also summarise, across the draws, the year
+                                from which each draw is under the threshold and stays under it
+                                (the year_of_sustained_under_threshold measure). Default is False.
     Returns:
         Returns a dataframe with post-processed metrics for the given input
     """
+    return process_single_file_for_thresholds(
+        raw_model_outputs,
+        scenario,
+        iuName,
+        num_draws,
+        prevalence_marker_name,
+        post_processing_start_time,
+        post_processing_end_time,
+        [threshold],
+        pct_runs_under_threshold,
+        measure_summary_map,
+        include_sustained_under_threshold_year,
+    )[threshold]
+
+
+def process_single_file_for_thresholds(
+    raw_model_outputs: pd.DataFrame,
+    scenario: str,
+    iuName: str,
+    num_draws: int = 200,
+    prevalence_marker_name: str = "prevalence",
+    post_processing_start_time: int = 1970,
+    post_processing_end_time: int = 2041,
+    thresholds: list[float] = [0.01],
+    pct_runs_under_threshold: list[float] = [0.90],
+    measure_summary_map: dict = None,
+    include_sustained_under_threshold_year: bool = False,
+) -> dict[float, pd.DataFrame]:
+    """
+    As process_single_file, but for each of several thresholds. The measure summaries don't
+    depend on the threshold so are only calculated once.
+
+    Args:
+        As process_single_file, except:
+        thresholds (list[float]): the values of the thresholds we compare prevalence values to.
+    Returns:
+        A map from each threshold to the output process_single_file would give for it
+    """
     column_names = raw_model_outputs.columns
 
     measure_column_loc = column_names.get_loc(MEASURE_COLUMN_NAME)
@@ -303,27 +383,17 @@ def process_single_file(
     draw_names = [f"{DRAW_COLUMNN_NAME_START}{i}" for i in range(0, num_draws)]
     draws_loc = [column_names.get_loc(name) for name in draw_names]
 
+    raw_model_outputs_array = raw_model_outputs.to_numpy()
     # Making sure we start the calculations from where we want
     filtered_model_outputs = _filter_out_old_data(
-        raw_model_outputs.to_numpy(),
+        raw_model_outputs_array,
         year_column_loc,
         post_processing_start_time,
         post_processing_end_time,
     )
-    probabilities_and_threshold_outputs = _calculate_probabilities_and_thresholds(
-        filtered_model_outputs,
-        year_column_loc,
-        measure_column_loc,
-        age_start_column_loc,
-        age_end_column_loc,
-        draws_loc,
-        prevalence_marker_name,
-        threshold,
-        pct_runs_under_threshold,
-    )
 
     summarized_measure_outputs = _summarize_measures(
-        raw_model_outputs.to_numpy(),
+        raw_model_outputs_array,
         year_column_loc,
         measure_column_loc,
         age_start_column_loc,
@@ -339,21 +409,50 @@ def process_single_file(
         summarized_measure_outputs[:, 3]
     )
 
-    # combine all the outputs together
-    output = np.row_stack(
-        (summarized_measure_outputs, probabilities_and_threshold_outputs)
-    )
+    outputs = {}
+    for threshold in thresholds:
+        probabilities_and_threshold_outputs = _calculate_probabilities_and_thresholds(
+            filtered_model_outputs,
+            year_column_loc,
+            measure_column_loc,
+            age_start_column_loc,
+            age_end_column_loc,
+            draws_loc,
+            prevalence_marker_name,
+            threshold,
+            pct_runs_under_threshold,
+        )
 
-    # add the necessary descriptor columns
-    descriptor_output = np.column_stack(
-        (
-            np.full(output.shape[0], iuName),
-            # extracting country code
-            np.full(output.shape[0], iuName[:3]),
-            np.full(output.shape[0], scenario),
-            output,
+        if include_sustained_under_threshold_year:
+            probabilities_and_threshold_outputs = np.row_stack(
+                (
+                    probabilities_and_threshold_outputs,
+                    _calculate_sustained_under_threshold_year(
+                        filtered_model_outputs,
+                        year_column_loc,
+                        measure_column_loc,
+                        draws_loc,
+                        prevalence_marker_name,
+                        threshold,
+                    ),
+                )
+            )
+
+        # combine all the outputs together
+        output = np.row_stack(
+            (summarized_measure_outputs, probabilities_and_threshold_outputs)
+        )
+
+        # add the necessary descriptor columns
+        descriptor_output = np.column_stack(
+            (
+                np.full(output.shape[0], iuName),
+                # extracting country code
+                np.full(output.shape[0], iuName[:3]),
+                np.full(output.shape[0], scenario),
+                output,
+            )
         )
-    )
 
-    # return a dataframe
-    return pd.DataFrame(descriptor_output, columns=FINAL_COLUMNS)
+        outputs[threshold] = pd.DataFrame(descriptor_output, columns=FINAL_COLUMNS)
+    return outputs
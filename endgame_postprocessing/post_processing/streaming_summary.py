@@ -0,0 +1,198 @@
+import numpy as np
+
+# How many draws are added to the summaries at a time by summarise_draws
+DRAWS_CHUNK_SIZE = 1000
+
+
+class RunningMoments:
+    """
+    The count, mean and sum of squared differences from the mean (Welford's algorithm) of the
+    values of each row, updated a chunk of values at a time. Two can be merged (Chan et al.),
+    so the rows can be summarised in pieces (e.g. on different workers) and combined.
+
+    As with np.mean and np.std, a row with a NaN value has a NaN mean and standard deviation.
+    """
+
+    def __init__(self, num_rows: int):
+        self.count = 0
+        self._mean = np.zeros(num_rows)
+        self._sum_squared_differences = np.zeros(num_rows)
+
+    def add(self, values: np.ndarray):
+        """Adds values, of shape [rows x values]"""
+        if values.shape[1] == 0:
+            return
+        chunk_mean = values.mean(axis=1)
+        self._combine(
+            values.shape[1],
+            chunk_mean,
+            ((values - chunk_mean[:, np.newaxis]) ** 2).sum(axis=1),
+        )
+
+    def merge(self, other: "RunningMoments"):
+        if other.count > 0:
+            self._combine(other.count, other._mean, other._sum_squared_differences)
+
+    def _combine(self, count, mean, sum_squared_differences):
+        total_count = self.count + count
+        delta = mean - self._mean
+        self._mean = self._mean + delta * count / total_count
+        self._sum_squared_differences = (
+            self._sum_squared_differences
+            + sum_squared_differences
+            + delta**2 * self.count * count / total_count
+        )
+        self.count = total_count
+
+    def mean(self) -> np.ndarray:
+        return self._mean
+
+    def standard_deviation(self) -> np.ndarray:
+        """The population standard deviation (as np.std)"""
+        return np.sqrt(self._sum_squared_differences / self.count)
+
+
+class QuantileSketch:
+    """
+    A mergeable sketch of the values of each row (a DDSketch) from which any quantile can be
+    estimated to within relative_accuracy of the value of that rank, without keeping the values.
+
+    Each value is counted in a bucket (gamma^(k-1), gamma^k] where gamma =
+    (1 + relative_accuracy) / (1 - relative_accuracy), so the number of buckets grows with the
+    log of the range of the values rather than with the number of values. Values closer to 0
+    than min_value are counted as 0.
+    """
+
+    def __init__(self, num_rows: int, relative_accuracy: float = 0.01, min_value: float = 1e-12):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be in (0, 1), got {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._log_gamma = np.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.count = 0
+        self._zero_counts = np.zeros(num_rows, dtype=np.int64)
+        self._has_nan = np.zeros(num_rows, dtype=bool)
+        # The counts of the positive values and of the magnitudes of the negative values, each
+        # [rows x buckets] starting from the bucket with the key in the first element
+        self._positive = (0, np.zeros((num_rows, 0), dtype=np.int64))
+        self._negative = (0, np.zeros((num_rows, 0), dtype=np.int64))
+
+    def add(self, values: np.ndarray):
+        """Adds values, of shape [rows x values]"""
+        self.count += values.shape[1]
+        is_nan = np.isnan(values)
+        self._has_nan |= is_nan.any(axis=1)
+        magnitudes = np.where(is_nan, 0.0, np.abs(values))
+        is_zero = magnitudes <= self.min_value
+        self._zero_counts += is_zero.sum(axis=1)
+
+        keys = np.ceil(
+            np.log(np.where(is_zero, 1.0, magnitudes)) / self._log_gamma
+        ).astype(np.int64)
+        rows = np.broadcast_to(np.arange(values.shape[0])[:, np.newaxis], values.shape)
+        for store, in_store in [
+            ("_positive", ~is_zero & (values > 0)),
+            ("_negative", ~is_zero & (values < 0)),
+        ]:
+            if in_store.any():
+                self._add_to_store(store, rows[in_store], keys[in_store])
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative_accuracy can be merged")
+        self.count += other.count
+        self._zero_counts += other._zero_counts
+        self._has_nan |= other._has_nan
+        for store in ["_positive", "_negative"]:
+            other_first_key, other_counts = getattr(other, store)
+            if other_counts.shape[1] > 0:
+                counts = self._extend_store(
+                    store, other_first_key, other_first_key + other_counts.shape[1] - 1
+                )
+                start = other_first_key - getattr(self, store)[0]
+                counts[:, start:start + other_counts.shape[1]] += other_counts
+
+    def _extend_store(self, store, min_key, max_key) -> np.ndarray:
+        """Grows the store's buckets to cover min_key to max_key, returning its counts"""
+        first_key, counts = getattr(self, store)
+        if counts.shape[1] == 0:
+            first_key = min_key
+        new_first_key = min(first_key, min_key)
+        new_last_key = max(first_key + counts.shape[1] - 1, max_key)
+        if new_first_key != first_key or new_last_key - new_first_key + 1 != counts.shape[1]:
+            extended_counts = np.zeros(
+                (counts.shape[0], new_last_key - new_first_key + 1), dtype=np.int64
+            )
+            start = first_key - new_first_key
+            extended_counts[:, start:start + counts.shape[1]] = counts
+            counts = extended_counts
+        setattr(self, store, (new_first_key, counts))
+        return counts
+
+    def _add_to_store(self, store, rows, keys):
+        counts = self._extend_store(store, keys.min(), keys.max())
+        np.add.at(counts, (rows, keys - getattr(self, store)[0]), 1)
+
+    def _bucket_values(self, first_key, num_buckets):
+        """The value each bucket's values are estimated as, within relative_accuracy of them"""
+        gamma = np.exp(self._log_gamma)
+        return 2 * gamma ** np.arange(first_key, first_key + num_buckets) / (gamma + 1)
+
+    def quantiles(self, quantiles) -> np.ndarray:
+        """
+        Estimates the quantiles (each in [0, 1]) of each row, as the value of rank
+        quantile * (count - 1) (rounded down, as np.quantile with method="lower").
+
+        Returns:
+            The quantiles of each row, shape [rows x quantiles]. NaN for rows with a NaN value.
+        """
+        negative_first_key, negative_counts = self._negative
+        positive_first_key, positive_counts = self._positive
+        # All the buckets of each row in increasing order of value
+        counts = np.concatenate(
+            [negative_counts[:, ::-1], self._zero_counts[:, np.newaxis], positive_counts],
+            axis=1,
+        )
+        bucket_values = np.concatenate(
+            [
+                -self._bucket_values(negative_first_key, negative_counts.shape[1])[::-1],
+                [0.0],
+                self._bucket_values(positive_first_key, positive_counts.shape[1]),
+            ]
+        )
+        cumulative_counts = np.cumsum(counts, axis=1)
+
+        ranks = np.floor(np.asarray(quantiles, dtype=float) * (self.count - 1))
+        # Shape: [rows x quantiles], the first bucket with more values than the rank
+        bucket_indices = np.argmax(
+            cumulative_counts[:, np.newaxis, :] > ranks[np.newaxis, :, np.newaxis], axis=2
+        )
+        estimates = bucket_values[bucket_indices]
+        estimates[self._has_nan] = np.nan
+        return estimates
+
+
+def summarise_draws(values: np.ndarray, percentiles, relative_accuracy: float):
+    """
+    Summarises the draws of each row of values ([rows x draws]) a chunk of draws at a time:
+    the mean and standard deviation exactly (see RunningMoments) and the percentiles and
+    median estimated by a QuantileSketch with relative_accuracy. values already holds every
+    draw, so this saves sorting the draws rather than memory.
+
+    Returns:
+        The mean, the standard deviation, a dict of each percentile's values and the median.
+    """
+    moments = RunningMoments(values.shape[0])
+    sketch = QuantileSketch(values.shape[0], relative_accuracy)
+    for start in range(0, values.shape[1], DRAWS_CHUNK_SIZE):
+        chunk = values[:, start:start + DRAWS_CHUNK_SIZE]
+        moments.add(chunk)
+        sketch.add(chunk)
+
+    percentile_values = sketch.quantiles([p / 100 for p in percentiles] + [0.5])
+    return (
+        moments.mean(),
+        moments.standard_deviation(),
+        {p: percentile_values[:, index] for index, p in enumerate(percentiles)},
+        percentile_values[:, -1],
+    )
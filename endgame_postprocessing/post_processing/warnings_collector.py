@@ -1,29 +1,170 @@
+import multiprocessing
 import os
+import queue
 import sys
+import threading
 import warnings
+from itertools import count
 
+# The collectors currently collecting, innermost last
+_active_collectors = []
+
+# Where warnings raised by a forwarded task running on a thread of this process are buffered
+_task_context = threading.local()
 
 
 class CollectAndPrintWarnings:
     '''
     A re-implementation of warnings.catch_warnings but that
     still prints out the warnings
+
+    Warnings raised on other threads or processes are only collected if the task
+    that raises them has been wrapped with forward_worker_warnings. They are then
+    sent back over a queue and added to the collected warnings when
+    flush_worker_warnings is called (or the collector exits), ordered by the key
+    of the task that raised them and then the order they were raised in.
     '''
     def __init__(self, output=sys.stderr):
         self.warnings = []
         self.output = output
+        # Tasks run on threads of this process send their warnings back on _worker_queue,
+        # a manager (and its queue) is only started once a task is sent to another process
+        self._worker_queue = queue.Queue()
+        self._manager = None
+        self._process_queue = None
+        self._process_queue_lock = threading.Lock()
+        self._task_sequence = count()
 
     def __enter__(self):
         self.old_warning_method = warnings.showwarning
         warnings.showwarning = self._show_warning
         self.warnings = []
+        _active_collectors.append(self)
         return self.warnings
 
     def __exit__(self, *exc_info):
-        warnings.showwarning = self.old_warning_method
+        try:
+            self.flush_worker_warnings()
+        finally:
+            _active_collectors.remove(self)
+            warnings.showwarning = self.old_warning_method
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+                self._process_queue = None
+
+    def forward_worker_warnings(self, task, key=None):
+        return _ForwardWarnings(
+            task, key, next(self._task_sequence), self._worker_queue, self, os.getpid()
+        )
+
+    def get_process_queue(self):
+        """The queue for the tasks sent to other processes, starting a manager for it"""
+        with self._process_queue_lock:
+            if self._process_queue is None:
+                self._manager = multiprocessing.Manager()
+                self._process_queue = self._manager.Queue()
+            return self._process_queue
+
+    def flush_worker_warnings(self):
+        forwarded = []
+        for worker_queue in [self._worker_queue, self._process_queue]:
+            while worker_queue is not None:
+                try:
+                    forwarded.append(worker_queue.get_nowait())
+                except queue.Empty:
+                    break
+        # The tasks without a key come first, so their keys are never compared with others
+        for _, _, task_warnings in sorted(
+            forwarded,
+            key=lambda item: (item[0] is not None, () if item[0] is None else item[0], item[1]),
+        ):
+            for message, category, filename, lineno in task_warnings:
+                self._collect(warnings.WarningMessage(message, category, filename, lineno))
 
     def _show_warning(self, message, category, filename, lineno, file=None, line=None):
-        warning_message = warnings.WarningMessage(message, category, filename, lineno, file, line)
+        task_warnings = getattr(_task_context, "warnings", None)
+        if task_warnings is not None:
+            task_warnings.append((str(message), category, filename, lineno))
+            return
+        self._collect(warnings.WarningMessage(message, category, filename, lineno, file, line))
+
+    def _collect(self, warning_message):
         self.warnings.append(warning_message)
-        short_file_name = os.path.basename(filename)
-        print(f"Warning: {message} ({short_file_name}:{lineno})", file=self.output)
+        short_file_name = os.path.basename(warning_message.filename)
+        print(
+            f"Warning: {warning_message.message} ({short_file_name}:{warning_message.lineno})",
+            file=self.output,
+        )
+
+
+class _ForwardWarnings:
+    '''
+    Runs a task, sending any warnings it raises back to the collector that created it.
+
+    On a thread of the collecting process the warnings are buffered in a thread local by the
+    collector (warnings.catch_warnings is not thread safe), in any other process they are
+    recorded with warnings.catch_warnings. The collector's thread queue can't be sent to another
+    process, so when the task is pickled it takes the collector's process queue instead.
+    '''
+    def __init__(self, task, key, sequence, worker_queue, collector, collector_pid):
+        self.task = task
+        self.key = key
+        self.sequence = sequence
+        self.worker_queue = worker_queue
+        self.collector = collector
+        self.collector_pid = collector_pid
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["worker_queue"] = self.collector.get_process_queue()
+        state["collector"] = None
+        return state
+
+    def __call__(self, *args, **kwargs):
+        if os.getpid() == self.collector_pid:
+            _task_context.warnings = []
+            try:
+                return self.task(*args, **kwargs)
+            finally:
+                task_warnings = _task_context.warnings
+                del _task_context.warnings
+                self.worker_queue.put((self.key, self.sequence, task_warnings))
+
+        with warnings.catch_warnings(record=True) as caught_warnings:
+            try:
+                return self.task(*args, **kwargs)
+            finally:
+                self.worker_queue.put((
+                    self.key,
+                    self.sequence,
+                    [
+                        (str(warning.message), warning.category, warning.filename, warning.lineno)
+                        for warning in caught_warnings
+                    ],
+                ))
+
+
+def forward_worker_warnings(task, key=None):
+    '''
+    Wraps task so that the warnings it raises when run on a worker thread or process
+    are collected by the innermost active CollectAndPrintWarnings.
+
+    key is used to give the forwarded warnings a deterministic order (e.g. the IU the
+    task is for), so must be comparable with the keys of the other tasks. The warnings
+    of tasks without a key come first, in the order the tasks were wrapped.
+    If there is no active collector, task is returned unchanged.
+    '''
+    if not _active_collectors:
+        return task
+    return _active_collectors[-1].forward_worker_warnings(task, key)
+
+
+def flush_worker_warnings():
+    '''
+    Adds the warnings forwarded from finished worker tasks to the active collectors.
+    Call once the parallel work has completed so they appear in the right place relative
+    to the warnings raised afterwards.
+    '''
+    for collector in _active_collectors:
+        collector.flush_worker_warnings()
@@ -116,3 +116,15 @@ class MissingScenariosFromSpecificationError(InvalidInputDirectoryError):
             f"Scenarios mentioned in specification are missing from the input directory:"
             f" {', '.join(listed_scenarios)}"
         )
+
+
+class DuplicateScenarioNameError(ValueError):
+    """Raised when more than one of a batch of mixed scenarios descriptions has the same
+    scenario_name."""
+
+    def __init__(self, scenario_names: Set[str]):
+        self.scenario_names = scenario_names
+        super().__init__(
+            f"Each mixed scenarios description in a batch must have a different scenario_name,"
+            f" these are repeated: {', '.join(sorted(scenario_names))}"
+        )
@@ -1,11 +1,12 @@
 import argparse
 import json
+import multiprocessing
 import os
 import re
 import shutil
 import time
 from collections import Counter, defaultdict
-from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from itertools import chain
 from pathlib import Path
@@ -15,9 +16,17 @@ from typing import List, Tuple, Callable, Optional, Dict
 import pandas as pd
 import yaml
 
-from endgame_postprocessing.post_processing import pipeline, output_directory_structure
+from endgame_postprocessing.post_processing import (
+    canonical_manifest,
+    canonicalise,
+    composite_delta,
+    iu_data_fixup,
+    output_directory_structure,
+    pipeline,
+)
 from endgame_postprocessing.post_processing.disease import Disease
 from endgame_postprocessing.post_processing.generation_metadata import produce_generation_metadata
+from endgame_postprocessing.post_processing.iu_data import IUData, IUSelectionCriteria
 from endgame_postprocessing.post_processing.pipeline_config import PipelineConfig
 from endgame_postprocessing.post_processing.warnings_collector import CollectAndPrintWarnings
 from misc.pp_mixed_scenarios.exceptions import (
@@ -25,6 +34,7 @@ from misc.pp_mixed_scenarios.exceptions import (
     MissingPopulationMetadataFileError,
     MissingScenariosFromSpecificationError,
     DuplicateIUError,
+    DuplicateScenarioNameError,
     MixedScenariosFileNotFound,
     MissingFieldsError,
     InvalidOverriddenIUsError,
@@ -32,6 +42,10 @@ from misc.pp_mixed_scenarios.exceptions import (
     InvalidThresholdError,
 )
 
+# The composite delta engine for each disease of the batch a worker process of run_batch is
+# running (see _init_batch_worker)
+_composite_delta_engines = {}
+
 
 @dataclass
 class MixedScenariosDescription:
@@ -165,17 +179,21 @@ def _load_mixed_scenarios_desc(mixed_scenarios_desc_file: Path) -> MixedScenario
     return MixedScenariosDescription.from_dict(mixed_scenarios_desc)
 
 
+def _get_disease(disease: str) -> Disease:
+    if disease == "oncho":
+        return Disease.ONCHO
+    elif disease == "trachoma":
+        return Disease.TRACHOMA
+    else:
+        return Disease.LF
+
+
 def _get_pipeline_config_from_scenario_file(
     mixed_scenarios_desc: MixedScenariosDescription,
 ) -> PipelineConfig:
     # We're guaranteed that the disease value exists and is valid because `mixed_scenarios_desc`
     # has already been verified by this point.
-    if mixed_scenarios_desc.disease == "oncho":
-        disease = Disease.ONCHO
-    elif mixed_scenarios_desc.disease == "trachoma":
-        disease = Disease.TRACHOMA
-    else:
-        disease = Disease.LF
+    disease = _get_disease(mixed_scenarios_desc.disease)
 
     # We're guaranteed that the threshold is valid, if it exists, because `mixed_scenarios_desc`
     # has already been verified by this point.
@@ -311,6 +329,282 @@ def _prepare_output_directory(
     mixed_scenarios_metadata_path.write_text(mixed_scenarios_desc.to_json())
 
 
+def _collect_iu_source_scenarios(
+    input_canonical_results_dir: Path,
+    mixed_scenarios_desc: MixedScenariosDescription,
+) -> Dict[str, str]:
+    """
+    Work out which scenario each IU of the mixed scenario is taken from.
+
+    :param input_canonical_results_dir: Path to the base canonical_results directory.
+    :param mixed_scenarios_desc: Dictionary describing the mixed scenarios.
+    :return: Dictionary from each IU to the scenario it is taken from.
+    """
+    iu_source_scenarios = {}
+
+    # Every IU in the default scenario, unless it is overridden below
+    if mixed_scenarios_desc.default_scenario:
+        default_scenario_directory = (
+            input_canonical_results_dir / mixed_scenarios_desc.default_scenario
+        )
+        for iu_directory in sorted(default_scenario_directory.glob("*/*")):
+            if iu_directory.is_dir():
+                iu_source_scenarios[iu_directory.name] = mixed_scenarios_desc.default_scenario
+
+    for scenario, ius in mixed_scenarios_desc.overridden_ius.items():
+        for iu in ius:
+            iu_source_scenarios[iu] = scenario
+
+    return iu_source_scenarios
+
+
+def _prepare_output_manifest(
+    input_directory: Path,
+    output_directory: Path,
+    mixed_scenarios_desc: MixedScenariosDescription,
+):
+    """
+    Prepare the output directory with a manifest describing the mixed scenario, rather than
+    copying the canonical results. The pipeline reads each IU from the scenario it is taken
+    from, relabelling it with the mixed scenario's name.
+
+    :param input_directory: Path to the directory containing the input canonical results.
+    :param output_directory: Path to the output directory. This directory will be created if
+     it does not exist.
+    :param mixed_scenarios_desc: Dictionary with mixed scenarios description.
+    """
+    input_canonical_results_dir = input_directory / "canonical_results"
+    canonical_manifest.write_canonical_manifest(
+        output_directory,
+        input_canonical_results_dir,
+        {
+            mixed_scenarios_desc.scenario_name: _collect_iu_source_scenarios(
+                input_canonical_results_dir, mixed_scenarios_desc
+            )
+        },
+    )
+
+    mixed_scenarios_metadata_path = output_directory / "mixed_scenarios_metadata.json"
+    mixed_scenarios_metadata_path.write_text(mixed_scenarios_desc.to_json())
+
+
+def _run_pipeline(
+    input_directory: Path,
+    output_directory: Path,
+    mixed_scenarios_desc: MixedScenariosDescription,
+    composite_delta_engine: Optional[composite_delta.CompositeDeltaEngine] = None,
+):
+    """
+    Run the pipeline on an output directory prepared by _prepare_output_manifest (or
+    _prepare_output_directory), writing the warnings raised to aggregation_info.json.
+
+    If composite_delta_engine (holding the description's scenarios) is given, the country and
+    Africa composites are found from it rather than rebuilt in full.
+    """
+    pipeline_config = _get_pipeline_config_from_scenario_file(mixed_scenarios_desc)
+    mixed_scenario = (
+        composite_delta.MixedScenario(
+            composite_delta_engine,
+            mixed_scenarios_desc.scenario_name,
+            mixed_scenarios_desc.default_scenario,
+            mixed_scenarios_desc.overridden_ius,
+        )
+        if composite_delta_engine is not None and mixed_scenarios_desc.default_scenario
+        else None
+    )
+
+    with CollectAndPrintWarnings() as collected_warnings:
+        pipeline.pipeline(
+            input_directory,
+            output_directory,
+            pipeline_config,
+            mixed_scenario,
+        )
+
+        output_directory_structure.write_results_metadata_file(
+            output_directory, produce_generation_metadata(warnings=collected_warnings)
+        )
+
+
+def _run_batch_pipeline(
+    input_directory: Path,
+    output_directory: Path,
+    mixed_scenarios_desc: MixedScenariosDescription,
+):
+    """_run_pipeline in a worker process of run_batch, with the engine for its disease"""
+    _run_pipeline(
+        input_directory,
+        output_directory,
+        mixed_scenarios_desc,
+        _composite_delta_engines.get(mixed_scenarios_desc.disease),
+    )
+
+
+def _init_batch_worker(
+    composite_delta_engines: Dict[str, composite_delta.CompositeDeltaEngine],
+    preloaded_canonical: Dict[str, pd.DataFrame],
+):
+    """
+    Gives a worker process of run_batch the engines and the canonical results read up front.
+    A forked worker shares them with the parent, any other is sent a copy.
+    """
+    _composite_delta_engines.clear()
+    _composite_delta_engines.update(composite_delta_engines)
+    canonicalise.use_preloaded_canonical(preloaded_canonical)
+
+
+def _build_composite_delta_engines(
+    input_directory: Path,
+    mixed_scenarios_descs: List[MixedScenariosDescription],
+) -> Dict[str, composite_delta.CompositeDeltaEngine]:
+    """
+    Build a composite delta engine for each disease of the descriptions that have a default
+    scenario, holding every scenario they take IUs from, so each description's country and
+    Africa composites are found from the cached scenario sums rather than rebuilt in full.
+    """
+    scenarios_by_disease = defaultdict(set)
+    for mixed_scenarios_desc in mixed_scenarios_descs:
+        if mixed_scenarios_desc.default_scenario:
+            scenarios_by_disease[mixed_scenarios_desc.disease] |= {
+                mixed_scenarios_desc.default_scenario,
+                *mixed_scenarios_desc.overridden_ius,
+            }
+    if not scenarios_by_disease:
+        return {}
+
+    canonical_files = list(canonical_manifest.canonical_file_generator(input_directory))
+    all_ius = {file_info.iu for file_info in canonical_files}
+    fixedup_meta_data_file = iu_data_fixup.fixup_iu_meta_data_file(
+        pd.read_csv(input_directory / "PopulationMetadatafile.csv"),
+        simulated_IUs=all_ius,
+    )
+    composite_delta_engines = {}
+    for disease, scenarios in scenarios_by_disease.items():
+        engine = composite_delta.CompositeDeltaEngine(
+            IUData(
+                fixedup_meta_data_file,
+                _get_disease(disease),
+                iu_selection_criteria=IUSelectionCriteria.SIMULATED_IUS,
+                simulated_IUs=all_ius,
+            )
+        )
+        for scenario in sorted(scenarios):
+            engine.add_scenario(
+                scenario,
+                [
+                    canonicalise.read_canonical(file_info.file_path, canonicalise.COMPOSITE_COLUMNS)
+                    for file_info in canonical_files
+                    if file_info.scenario == scenario
+                ],
+            )
+        composite_delta_engines[disease] = engine
+    return composite_delta_engines
+
+
+def _find_duplicate_scenario_names(mixed_scenarios_descs: List[MixedScenariosDescription]):
+    scenario_name_counter = Counter(desc.scenario_name for desc in mixed_scenarios_descs)
+    duplicated_scenario_names = {
+        scenario_name for scenario_name, count in scenario_name_counter.items() if count > 1
+    }
+    if duplicated_scenario_names:
+        raise DuplicateScenarioNameError(duplicated_scenario_names)
+
+
+def run_batch(
+    input_directory: Path,
+    output_directory: Path,
+    mixed_scenarios_descs: List[MixedScenariosDescription],
+    num_jobs: Optional[int] = None,
+    copy_canonical_results: bool = False,
+) -> List[Path]:
+    """
+    Post-process several mixed scenarios descriptions in one go.
+
+    Each description gets its own output directory (output_directory/<scenario_name>) with a
+    manifest (see _prepare_output_manifest). Every canonical results file used by any of the
+    descriptions is read once, up front, and the descriptions are then run on a pool of
+    processes that are given the already read results. The country and Africa composites of
+    the descriptions with a default scenario are found from the sums of each scenario's
+    countries (see composite_delta.CompositeDeltaEngine), given to the processes in the same
+    way.
+
+    :param input_directory: Path to the directory containing the input canonical results.
+    :param output_directory: Path to the directory to create each description's output in.
+    :param mixed_scenarios_descs: The (already loaded) descriptions to run.
+    :param num_jobs: The number of processes to use. Defaults to the number of CPUs.
+    :param copy_canonical_results: Copy each description's canonical results into its output
+     directory (see _prepare_output_directory) rather than writing a manifest.
+    :return: The output directory of each description.
+    """
+    _find_duplicate_scenario_names(mixed_scenarios_descs)
+
+    output_directories = [
+        output_directory / mixed_scenarios_desc.scenario_name
+        for mixed_scenarios_desc in mixed_scenarios_descs
+    ]
+    for mixed_scenarios_output_directory, mixed_scenarios_desc in zip(
+        output_directories, mixed_scenarios_descs
+    ):
+        if copy_canonical_results:
+            canonical_manifest.get_manifest_path(mixed_scenarios_output_directory).unlink(
+                missing_ok=True
+            )
+            _prepare_output_directory(
+                input_directory, mixed_scenarios_output_directory, mixed_scenarios_desc
+            )
+        else:
+            _prepare_output_manifest(
+                input_directory, mixed_scenarios_output_directory, mixed_scenarios_desc
+            )
+
+    mp_context = multiprocessing.get_context(
+        "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    )
+    try:
+        # The copied canonical results are each only read by one description
+        preloaded_canonical = (
+            {}
+            if copy_canonical_results
+            else canonicalise.preload_canonical(
+                sorted(
+                    {
+                        file_info.file_path
+                        for mixed_scenarios_output_directory in output_directories
+                        for file_info in canonical_manifest.canonical_file_generator(
+                            mixed_scenarios_output_directory
+                        )
+                    }
+                )
+            )
+        )
+        composite_delta_engines = _build_composite_delta_engines(
+            input_directory, mixed_scenarios_descs
+        )
+        with ProcessPoolExecutor(
+            max_workers=num_jobs,
+            mp_context=mp_context,
+            initializer=_init_batch_worker,
+            initargs=(composite_delta_engines, preloaded_canonical),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _run_batch_pipeline,
+                    input_directory,
+                    mixed_scenarios_output_directory,
+                    mixed_scenarios_desc,
+                )
+                for mixed_scenarios_output_directory, mixed_scenarios_desc in zip(
+                    output_directories, mixed_scenarios_descs
+                )
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        canonicalise.clear_preloaded_canonical()
+
+    return output_directories
+
+
 def main():
     # For the script to work,
     # we need to make sure the user has set up a working directory
@@ -325,9 +619,14 @@ def main():
     #         ...
     #      - PopulationMetadatafile.csv (user provided)
     #   - output_directory (created by the script)
+    #      - canonical_manifest.json
+    #        (or with --copy-canonical-results)
     #      - canonical_results
     #         - scenario_x1 (name specified in `mixed_scenarios_desc.yaml`
     #      - mixed_scenarios_metadata.json
+    #
+    # If more than one scenarios description is given, each one's output is put in
+    # output_directory/<scenario_name>
 
     parser = argparse.ArgumentParser(description="Postprocess mixed scenarios.")
     parser.add_argument(
@@ -354,7 +653,23 @@ def main():
             else parser.error("The scenarios description file must be a YAML file (.yaml or .yml).")
         ),
         required=True,
-        help="Path to the scenarios description .yaml file.",
+        nargs="+",
+        help="Path to the scenarios description .yaml file. Give more than one to run them as"
+        " a batch.",
+    )
+    parser.add_argument(
+        "-j",
+        "--num-jobs",
+        type=int,
+        required=False,
+        help="Number of processes to use when running a batch of scenarios descriptions."
+        " Defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "--copy-canonical-results",
+        action="store_true",
+        help="Copy the canonical results of the mixed scenario into the output directory,"
+        " rather than reading them from the input directory via a manifest.",
     )
 
     args = parser.parse_args()
@@ -364,15 +679,21 @@ def main():
 
     t_start = time.time()
     try:
-        mixed_scenarios_desc = _load_mixed_scenarios_desc(Path(args.scenarios_desc))
-        print("The mixed scenarios description file has been successfully loaded:")
-        pprint(mixed_scenarios_desc, indent=2)
+        mixed_scenarios_descs = [
+            _load_mixed_scenarios_desc(Path(scenarios_desc))
+            for scenarios_desc in args.scenarios_desc
+        ]
+        _find_duplicate_scenario_names(mixed_scenarios_descs)
+        for mixed_scenarios_desc in mixed_scenarios_descs:
+            print("The mixed scenarios description file has been successfully loaded:")
+            pprint(mixed_scenarios_desc, indent=2)
     except (
         MixedScenariosFileNotFound,
         MissingFieldsError,
         InvalidOverriddenIUsError,
         InvalidDiseaseFieldError,
         InvalidThresholdError,
+        DuplicateScenarioNameError,
     ) as e:
         print(f"Error: {e}")
         return
@@ -381,7 +702,8 @@ def main():
         return
 
     try:
-        input_directory = _validate_working_directory(working_directory, mixed_scenarios_desc)
+        for mixed_scenarios_desc in mixed_scenarios_descs:
+            input_directory = _validate_working_directory(working_directory, mixed_scenarios_desc)
     except (
         MissingPopulationMetadataFileError,
         MissingCanonicalResultsDirectoryError,
@@ -396,25 +718,33 @@ def main():
     output_directory = (
         Path(args.output_directory) if args.output_directory else working_directory / "output"
     )
-    _prepare_output_directory(input_directory, output_directory, mixed_scenarios_desc)
-    t_finish = time.time()
-    print(f"Time taken to prepare output directory: {t_finish - t_start:.2f} seconds")
-
-    t_start = time.time()
-
-    pipeline_config = _get_pipeline_config_from_scenario_file(mixed_scenarios_desc)
 
-    with CollectAndPrintWarnings() as collected_warnings:
-        pipeline.pipeline(
+    if len(mixed_scenarios_descs) > 1:
+        t_start = time.time()
+        run_batch(
             input_directory,
             output_directory,
-            pipeline_config,
+            mixed_scenarios_descs,
+            args.num_jobs,
+            args.copy_canonical_results,
         )
-
-        output_directory_structure.write_results_metadata_file(
-            output_directory, produce_generation_metadata(warnings=collected_warnings)
+        t_finish = time.time()
+        print(
+            f"Time taken to run {len(mixed_scenarios_descs)} mixed scenarios:"
+            f" {t_finish - t_start:.2f} seconds"
         )
+        return
 
+    if args.copy_canonical_results:
+        canonical_manifest.get_manifest_path(output_directory).unlink(missing_ok=True)
+        _prepare_output_directory(input_directory, output_directory, mixed_scenarios_desc)
+    else:
+        _prepare_output_manifest(input_directory, output_directory, mixed_scenarios_desc)
+    t_finish = time.time()
+    print(f"Time taken to prepare output directory: {t_finish - t_start:.2f} seconds")
+
+    t_start = time.time()
+    _run_pipeline(input_directory, output_directory, mixed_scenarios_desc)
     t_finish = time.time()
     print(f"Time taken to run pipeline: {t_finish - t_start:.2f} seconds")
 
@@ -11,7 +11,11 @@ from tests.end_to_end.snapshot_with_csv import validate_expected_dir
     "data_dir,scenario_with_historic_data",
     [("data_no_historic", None), ("data_with_historic", "scenario_0")],
 )
-def test_lf_end_to_end_no_historic(snapshot, data_dir, scenario_with_historic_data):
+@pytest.mark.parametrize("stream_by_iu", [False, True])
+@pytest.mark.parametrize("writer_threads", [0, 2])
+def test_lf_end_to_end_no_historic(
+    snapshot, data_dir, scenario_with_historic_data, stream_by_iu, writer_threads
+):
     test_root = Path(__file__).parent / data_dir
     input_data = test_root / "example_input_data"
     output_path = test_root / "generated_data"
@@ -25,6 +29,8 @@ def test_lf_end_to_end_no_historic(snapshot, data_dir, scenario_with_historic_da
         scenario_with_historic_data=scenario_with_historic_data,
         output_dir=output_path,
         num_jobs=1,
+        stream_by_iu=stream_by_iu,
+        writer_threads=writer_threads,
     )
 
     validate_expected_dir(snapshot, test_root, output_path, known_good_subpath)
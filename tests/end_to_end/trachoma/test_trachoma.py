@@ -1,9 +1,11 @@
+import gzip
 import shutil
 from pathlib import Path
 
 import pytest
 
 from endgame_postprocessing.model_wrappers.trachoma import run_trach
+from endgame_postprocessing.post_processing.compression import OutputCompression
 from tests.end_to_end.snapshot_with_csv import validate_expected_dir
 
 
@@ -137,3 +139,75 @@ def test_trachoma_end_to_end_multiple_scenarios_with_history(snapshot):
     )
 
     validate_expected_dir(snapshot, test_root, output_path, known_good_subpath)
+
+
+def test_trachoma_end_to_end_historic_compressed(snapshot, tmp_path):
+    """
+    Check the compressed outputs contain the same results as the uncompressed outputs.
+    """
+    test_root = Path(__file__).parent
+    input_data = test_root / "example_input_data" / "trachoma"
+    compressed_output_path = tmp_path / "compressed"
+    output_path = test_root / "generated_data"
+    historic_data = test_root / "example_input_data" / "historic-trachoma"
+    known_good_subpath = "known_good_output_historic"
+
+    if output_path.exists():
+        shutil.rmtree(output_path)
+
+    run_trach.run_postprocessing_pipeline(
+        input_dir=input_data,
+        output_dir=compressed_output_path,
+        historic_dir=historic_data,
+        historic_prefix="PrevDataset_Trachoma",
+        start_year=2000,
+        output_compression=OutputCompression(method="gzip", level=1),
+    )
+
+    for compressed_file in compressed_output_path.rglob("*"):
+        if compressed_file.is_dir():
+            continue
+        relative_path = compressed_file.relative_to(compressed_output_path)
+        if relative_path.parts[0] in ["canonical_results", "ius", "composite"]:
+            assert compressed_file.suffix == ".gz"
+            with gzip.open(compressed_file, "rb") as compressed:
+                contents = compressed.read()
+            relative_path = relative_path.with_suffix("")
+        else:
+            assert compressed_file.suffix != ".gz"
+            contents = compressed_file.read_bytes()
+        (output_path / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        (output_path / relative_path).write_bytes(contents)
+
+    validate_expected_dir(snapshot, test_root, output_path, known_good_subpath)
+
+
+def test_trachoma_historic_data_read_once_per_iu(mocker):
+    """
+    BBB00001 has two scenarios sharing one history file, which should only be parsed once.
+    """
+    test_root = Path(__file__).parent
+    input_data = test_root / "example_input_data" / "trachoma"
+    output_path = test_root / "generated_data"
+    historic_data = test_root / "example_input_data" / "historic-trachoma"
+
+    if output_path.exists():
+        shutil.rmtree(output_path)
+
+    read_csv_spy = mocker.spy(run_trach.pd, "read_csv")
+    run_trach.canonicalise_raw_trachoma_results(
+        input_dir=input_data,
+        output_dir=output_path,
+        historic_dir=historic_data,
+        historic_prefix="PrevDataset_Trachoma_",
+        start_year=2000,
+    )
+
+    files_read = [Path(call.args[0]).name for call in read_csv_spy.call_args_list]
+    assert sorted(files_read) == [
+        "PrevDataset_Trachoma_AAA00001.csv",
+        "PrevDataset_Trachoma_BBB00001.csv",
+        "ntdmc-AAA00001-trachoma-scenario_1_5-200_simulations-non_secular_trend-waning_length_520.csv",  # noqa: E501
+        "ntdmc-BBB00001-trachoma-scenario_1_5-200_simulations-non_secular_trend-waning_length_520.csv",  # noqa: E501
+        "ntdmc-BBB00001-trachoma-scenario_2-200_simulations-non_secular_trend-waning_length_520.csv",  # noqa: E501
+    ]
@@ -1,8 +1,10 @@
+import shutil
 from pathlib import Path
 
 import pytest
 import yaml
 
+from endgame_postprocessing.post_processing import composite_delta
 from endgame_postprocessing.post_processing.disease import Disease
 from endgame_postprocessing.post_processing.pipeline_config import PipelineConfig
 from misc.pp_mixed_scenarios.exceptions import (
@@ -13,7 +15,9 @@ from misc.pp_mixed_scenarios.exceptions import (
     InvalidThresholdError,
     InvalidOverriddenIUsError,
     MissingFieldsError,
+    DuplicateScenarioNameError,
 )
+from misc.pp_mixed_scenarios import post_process_mixed_scenarios
 from misc.pp_mixed_scenarios.post_process_mixed_scenarios import (
     _get_pipeline_config_from_scenario_file,
     _find_duplicate_ius,
@@ -23,7 +27,13 @@ from misc.pp_mixed_scenarios.post_process_mixed_scenarios import (
     _validate_working_directory,
     MixedScenariosDescription,
     _collect_source_target_paths,
+    _collect_iu_source_scenarios,
+    _prepare_output_manifest,
+    _run_pipeline,
+    _build_composite_delta_engines,
+    run_batch,
 )
+from endgame_postprocessing.post_processing.canonical_manifest import canonical_file_generator
 
 
 def test_get_pipeline_config_from_scenario_file_no_threshold():
@@ -564,3 +574,172 @@ def test_collect_source_no_default_scenario(fs):
     ]
 
     assert result == expected
+
+
+def test_collect_iu_source_scenarios(fs):
+    input_canonical_results_dir = Path("/fake/input/canonical_results")
+    fs.create_file(input_canonical_results_dir / "scenario_0/IU0/IU001/IU001_canonical.csv")
+    fs.create_file(input_canonical_results_dir / "scenario_0/IU0/IU004/IU004_canonical.csv")
+    fs.create_file(input_canonical_results_dir / "scenario_1/IU0/IU001/IU001_canonical.csv")
+
+    mixed_scenarios_desc = MixedScenariosDescription(
+        disease="lf",
+        scenario_name="scenario_x1",
+        default_scenario="scenario_0",
+        overridden_ius={"scenario_1": ["IU001"]},
+        threshold=None,
+    )
+
+    assert _collect_iu_source_scenarios(input_canonical_results_dir, mixed_scenarios_desc) == {
+        "IU001": "scenario_1",
+        "IU004": "scenario_0",
+    }
+
+
+def test_prepare_output_manifest_does_not_copy(fs):
+    input_directory = Path("/fake/input")
+    output_directory = Path("/fake/output")
+    iu001_file = input_directory / "canonical_results/scenario_1/IU0/IU001/IU001_canonical.csv"
+    iu004_file = input_directory / "canonical_results/scenario_0/IU0/IU004/IU004_canonical.csv"
+    fs.create_file(iu001_file)
+    fs.create_file(iu004_file)
+
+    mixed_scenarios_desc = MixedScenariosDescription(
+        disease="lf",
+        scenario_name="scenario_x1",
+        default_scenario="scenario_0",
+        overridden_ius={"scenario_1": ["IU001"]},
+        threshold=None,
+    )
+
+    _prepare_output_manifest(input_directory, output_directory, mixed_scenarios_desc)
+
+    assert not (output_directory / "canonical_results").exists()
+    assert (output_directory / "mixed_scenarios_metadata.json").exists()
+    assert [
+        (file_info.scenario, file_info.iu, Path(file_info.file_path).resolve())
+        for file_info in canonical_file_generator(output_directory)
+    ] == [("scenario_x1", "IU001", iu001_file), ("scenario_x1", "IU004", iu004_file)]
+
+
+LF_TEST_DATA = Path(__file__).parent.parent.parent / "end_to_end" / "lf" / "data_with_historic"
+
+
+def _mixed_scenarios_desc(scenario_name, default_scenario, overridden_ius):
+    return MixedScenariosDescription(
+        disease="lf",
+        scenario_name=scenario_name,
+        default_scenario=default_scenario,
+        overridden_ius=overridden_ius,
+        threshold=None,
+    )
+
+
+@pytest.mark.parametrize(
+    "start_methods, copy_canonical_results",
+    [(["fork", "spawn"], False), (["spawn"], False), (["fork", "spawn"], True)],
+)
+def test_run_batch_matches_running_each_description(
+    tmp_path, mocker, start_methods, copy_canonical_results
+):
+    mocker.patch.object(
+        post_process_mixed_scenarios.multiprocessing,
+        "get_all_start_methods",
+        return_value=start_methods,
+    )
+    input_directory = tmp_path / "input"
+    shutil.copytree(
+        LF_TEST_DATA / "known_good_output" / "canonical_results",
+        input_directory / "canonical_results",
+    )
+    shutil.copy(
+        LF_TEST_DATA / "example_input_data" / "PopulationMetadatafile.csv", input_directory
+    )
+    mixed_scenarios_descs = [
+        _mixed_scenarios_desc("scenario_x1", "scenario_0", {"scenario_minus1": ["AAA00001"]}),
+        _mixed_scenarios_desc("scenario_x2", "scenario_minus1", {"scenario_0": ["BBB00003"]}),
+    ]
+
+    batch_output_directories = run_batch(
+        input_directory,
+        tmp_path / "batch",
+        mixed_scenarios_descs,
+        num_jobs=2,
+        copy_canonical_results=copy_canonical_results,
+    )
+
+    assert batch_output_directories == [
+        tmp_path / "batch" / "scenario_x1",
+        tmp_path / "batch" / "scenario_x2",
+    ]
+    for batch_output_directory, mixed_scenarios_desc in zip(
+        batch_output_directories, mixed_scenarios_descs
+    ):
+        output_directory = tmp_path / "single" / mixed_scenarios_desc.scenario_name
+        _prepare_output_manifest(input_directory, output_directory, mixed_scenarios_desc)
+        _run_pipeline(input_directory, output_directory, mixed_scenarios_desc)
+
+        assert (batch_output_directory / "canonical_results").exists() == copy_canonical_results
+        output_files = list(output_directory.rglob("*.csv"))
+        assert any(output_file.parent.name == "composite" for output_file in output_files)
+        for output_file in output_files:
+            batch_output_file = batch_output_directory / output_file.relative_to(output_directory)
+            assert batch_output_file.read_bytes() == output_file.read_bytes()
+
+
+def test_run_pipeline_with_composite_delta_engine_matches_full_rebuild(tmp_path, mocker):
+    input_directory = tmp_path / "input"
+    shutil.copytree(
+        LF_TEST_DATA / "known_good_output" / "canonical_results",
+        input_directory / "canonical_results",
+    )
+    shutil.copy(
+        LF_TEST_DATA / "example_input_data" / "PopulationMetadatafile.csv", input_directory
+    )
+    mixed_scenarios_desc = _mixed_scenarios_desc(
+        "scenario_x1", "scenario_0", {"scenario_minus1": ["AAA00001", "BBB00003"]}
+    )
+    rebuilt_output_directory = tmp_path / "rebuilt"
+    _prepare_output_manifest(input_directory, rebuilt_output_directory, mixed_scenarios_desc)
+    _run_pipeline(input_directory, rebuilt_output_directory, mixed_scenarios_desc)
+
+    incremental_output_directory = tmp_path / "incremental"
+    _prepare_output_manifest(input_directory, incremental_output_directory, mixed_scenarios_desc)
+    country_composites_spy = mocker.spy(
+        composite_delta.CompositeDeltaEngine, "country_composites"
+    )
+    composite_delta_engines = _build_composite_delta_engines(
+        input_directory, [mixed_scenarios_desc]
+    )
+    _run_pipeline(
+        input_directory,
+        incremental_output_directory,
+        mixed_scenarios_desc,
+        composite_delta_engines["lf"],
+    )
+
+    assert country_composites_spy.call_count == 1
+    output_files = sorted(
+        output_file.relative_to(rebuilt_output_directory)
+        for output_file in rebuilt_output_directory.rglob("*.csv")
+    )
+    assert output_files == sorted(
+        output_file.relative_to(incremental_output_directory)
+        for output_file in incremental_output_directory.rglob("*.csv")
+    )
+    assert any(output_file.parts[0] == "composite" for output_file in output_files)
+    for output_file in output_files:
+        assert (incremental_output_directory / output_file).read_bytes() == (
+            rebuilt_output_directory / output_file
+        ).read_bytes()
+
+
+def test_run_batch_duplicate_scenario_names(tmp_path):
+    mixed_scenarios_descs = [
+        _mixed_scenarios_desc("scenario_x1", "scenario_0", {"scenario_1": ["AAA00001"]}),
+        _mixed_scenarios_desc("scenario_x1", "scenario_1", {"scenario_0": ["AAA00001"]}),
+    ]
+
+    with pytest.raises(DuplicateScenarioNameError) as e:
+        run_batch(tmp_path / "input", tmp_path / "output", mixed_scenarios_descs)
+    assert e.value.scenario_names == {"scenario_x1"}
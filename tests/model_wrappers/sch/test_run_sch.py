@@ -1,6 +1,14 @@
+import os
+from functools import reduce
+from operator import mul
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as npt
 import pandas as pd
 import pandas.testing as pdt
 import pytest
+from endgame_postprocessing.model_wrappers.sch import run_sch
 from endgame_postprocessing.model_wrappers.sch.run_sch import (
     canoncialise_single_result,
     combine_many_worms,
@@ -32,6 +40,90 @@ def test_probability_any_worm_diff_prev():
     assert probability_any_worm_max([0.5, 0.7, 0.3]) == 0.7
 
 
+def test_probability_any_worm_stacked_with_missing_worm():
+    # [worm x year x draw]
+    worm_draws = np.array(
+        [
+            [[0.5, 0.0]],
+            [[0.5, 0.0]],
+            [[np.nan, np.nan]],
+        ]
+    )
+    worms_present = [True, True, False]
+
+    npt.assert_array_equal(probability_any_worm(worm_draws, worms_present), [[0.75, 0.0]])
+    npt.assert_array_equal(probability_any_worm_max(worm_draws, worms_present), [[0.5, 0.0]])
+
+
+def test_combine_many_worms_custom_combination():
+    def mean_of_present_worms(worm_draws, worms_present):
+        return worm_draws[worms_present].mean(axis=0)
+
+    first_worm = pd.DataFrame({"year": [2010], "draw_0": [0.2], "draw_1": [0.0]})
+    second_worm = pd.DataFrame({"year": [2010], "draw_0": [0.4], "draw_1": [1.0]})
+
+    pdt.assert_frame_equal(
+        combine_many_worms(
+            first_worm,
+            [second_worm, pd.DataFrame()],
+            stacked_combination_function=mean_of_present_worms,
+        ),
+        pd.DataFrame({"year": [2010], "draw_0": [0.3], "draw_1": [0.5]}),
+    )
+
+
+def test_combine_many_worms_custom_legacy_combination():
+    def product_of_worms(probability_for_each_worm):
+        return reduce(mul, probability_for_each_worm)
+
+    first_worm = pd.DataFrame({"year": [2010], "draw_0": [0.2], "draw_1": [0.5]})
+    second_worm = pd.DataFrame({"year": [2010], "draw_0": [0.5], "draw_1": [1.0]})
+
+    pdt.assert_frame_equal(
+        combine_many_worms(
+            first_worm.copy(), [second_worm], combination_function=product_of_worms
+        ),
+        pd.DataFrame({"year": [2010], "draw_0": [0.1], "draw_1": [0.5]}),
+    )
+    # A worm without results has zero draws
+    pdt.assert_frame_equal(
+        combine_many_worms(
+            first_worm.copy(),
+            [second_worm, pd.DataFrame()],
+            combination_function=product_of_worms,
+        ),
+        pd.DataFrame({"year": [2010], "draw_0": [0.0], "draw_1": [0.0]}),
+    )
+
+
+def test_combine_many_worms_both_combinations_exception():
+    first_worm = pd.DataFrame({"year": [2010], "draw_0": [0.2]})
+
+    with pytest.raises(Exception, match="only one of"):
+        combine_many_worms(
+            first_worm,
+            [],
+            combination_function=probability_any_worm,
+            stacked_combination_function=probability_any_worm,
+        )
+
+
+def test_combine_many_worms_different_years_exception():
+    first_worm = pd.DataFrame({"year": [2010], "draw_0": [0.2]})
+    second_worm = pd.DataFrame({"year": [2010, 2011], "draw_0": [0.4, 0.5]})
+
+    with pytest.raises(Exception, match="Expected worm draws of shape"):
+        combine_many_worms(first_worm, [second_worm])
+
+
+def test_combine_many_worms_different_year_ids_exception():
+    first_worm = pd.DataFrame({"year_id": [2010, 2011], "draw_0": [0.2, 0.3]})
+    second_worm = pd.DataFrame({"year_id": [2011, 2010], "draw_0": [0.5, 0.4]})
+
+    with pytest.raises(Exception, match="same year_id values"):
+        combine_many_worms(first_worm, [second_worm])
+
+
 def test_combine_many_worms_except_not_callable():
     with pytest.raises(Exception):
         combine_many_worms([], [], combination_function="123")
@@ -296,6 +388,73 @@ def test_canonicalise_raw_sch_results_all_worm_no_worm_directory():
         canonicalise_raw_sch_results("test_input_dir", "test_output_dir", worm_directories = [])
 
 
+def test_canonicalise_raw_sch_results_with_worm_cache_matches_without(tmp_path, mocker):
+    input_dir = (
+        Path(__file__).parent.parent.parent
+        / "end_to_end" / "sch" / "data_no_historic" / "example_input_data"
+    )
+    worm_directories = ["sch-haematobium", "sch-mansoni-high-burden", "sch-mansoni-low-burden"]
+    canonicalise_worm_file = mocker.spy(run_sch, "_canonicalise_worm_file")
+
+    for use_cache in [False, True]:
+        canonicalise_worm_file.reset_mock()
+        worm_canonical_cache = {} if use_cache else None
+        for output_name, worms in [("single", worm_directories[:1]), ("all", worm_directories)]:
+            canonicalise_raw_sch_results(
+                f"{input_dir}/",
+                tmp_path / str(use_cache) / output_name,
+                worms,
+                warning_if_no_file=False,
+                worm_canonical_cache=worm_canonical_cache,
+            )
+
+    # Each of the 12 worm files is only parsed once, rather than the haematobium ones twice
+    assert canonicalise_worm_file.call_count == 12
+    # The all worm run was the last use of every cached result
+    assert worm_canonical_cache == {}
+    canonical_files = sorted(
+        path.relative_to(tmp_path / "False") for path in (tmp_path / "False").rglob("*.csv")
+    )
+    assert canonical_files
+    for canonical_file in canonical_files:
+        assert (tmp_path / "True" / canonical_file).read_bytes() == (
+            tmp_path / "False" / canonical_file
+        ).read_bytes()
+
+
+def test_canoncialise_single_result_keeps_latest_result_of_each_file(tmp_path, mocker):
+    worm_file = tmp_path / "worm.csv"
+    worm_file.write_text("")
+    file_info = CustomFileInfo(
+        scenario_index=1,
+        total_scenarios=1,
+        scenario="scenario_1",
+        country="TST",
+        iu="TST01234",
+        file_path=str(worm_file),
+    )
+    mocker.patch.object(
+        run_sch,
+        "_canonicalise_worm_file",
+        side_effect=[pd.DataFrame({"draw_0": [0.1]}), pd.DataFrame({"draw_0": [0.2]})],
+    )
+    worm_canonical_cache = {}
+
+    canoncialise_single_result(file_info, worm_canonical_cache=worm_canonical_cache)
+    os.utime(worm_file, ns=(0, 0))
+    modified = canoncialise_single_result(file_info, worm_canonical_cache=worm_canonical_cache)
+
+    assert list(worm_canonical_cache) == [os.path.abspath(worm_file)]
+    pdt.assert_frame_equal(modified, pd.DataFrame({"draw_0": [0.2]}))
+
+    last_use = canoncialise_single_result(
+        file_info, worm_canonical_cache=worm_canonical_cache, keep_in_cache=False
+    )
+
+    assert worm_canonical_cache == {}
+    pdt.assert_frame_equal(last_use, pd.DataFrame({"draw_0": [0.2]}))
+
+
 def test_flat_walk(fs):
     fs.create_file(
         "foo/ntdmc-AGO02049-hookworm-group_001-scenario_2a-group_001-200_simulations.csv"
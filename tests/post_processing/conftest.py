@@ -0,0 +1,33 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from endgame_postprocessing.post_processing import pipeline
+from endgame_postprocessing.post_processing.disease import Disease
+from endgame_postprocessing.post_processing.pipeline_config import PipelineConfig
+
+LF_TEST_DATA = Path(__file__).parent.parent / "end_to_end" / "lf" / "data_with_historic"
+
+
+@pytest.fixture
+def run_lf_pipeline():
+    """
+    Runs the pipeline for LF on the known good canonical results in a working directory,
+    with the given PipelineConfig fields, and returns the working directory.
+    """
+
+    def run(working_directory, **config_overrides):
+        shutil.copytree(
+            LF_TEST_DATA / "known_good_output" / "canonical_results",
+            working_directory / "canonical_results",
+            dirs_exist_ok=True,
+        )
+        pipeline.pipeline(
+            LF_TEST_DATA / "example_input_data",
+            working_directory,
+            PipelineConfig(disease=Disease.LF, **config_overrides),
+        )
+        return working_directory
+
+    return run
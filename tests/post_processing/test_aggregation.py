@@ -5,8 +5,10 @@ import pandas.testing as pdt
 import pytest
 from pyfakefs.fake_filesystem import FakeFilesystem
 
-from endgame_postprocessing.post_processing import aggregation
+from endgame_postprocessing.post_processing import aggregation, composite_run
 from endgame_postprocessing.post_processing.constants import PROB_UNDER_THRESHOLD_MEASURE_NAME
+from endgame_postprocessing.post_processing.disease import Disease
+from endgame_postprocessing.post_processing.iu_data import IUData, IUSelectionCriteria
 
 
 def test_aggregate_post_processed_files_empty_directory_empty_dataframe(fs):
@@ -497,3 +499,89 @@ def test_filter_to_maximum_year_range_for_all_ius_with_nas():
     assert len(result) == len(expected)
     for res, exp in zip(result, expected):
         pdt.assert_frame_equal(res, exp)
+
+
+def test_country_sustained_under_threshold_year_summarises_each_scenario():
+    composite = pd.DataFrame(
+        {
+            "year_id": [2020, 2021, 2022, 2020, 2021, 2022],
+            "scenario": ["scenario_1"] * 3 + ["scenario_2"] * 3,
+            "country_code": ["C1"] * 6,
+            "measure": ["processed_prevalence"] * 6,
+            "draw_0": [0.5, 0.0, 0.0, 0.5, 0.5, 0.0],
+            "draw_1": [0.5, 0.5, 0.0, 0.5, 0.5, 0.5],
+        }
+    )
+
+    aggregate_data = aggregation.country_sustained_under_threshold_year(composite, 0.1)
+
+    assert list(aggregate_data.columns) == list(
+        aggregation.single_country_aggregate(composite).columns
+    )
+    assert list(aggregate_data["scenario"]) == ["scenario_1", "scenario_2"]
+    assert list(aggregate_data["measure"]) == ["year_of_sustained_under_threshold"] * 2
+    # scenario_2's draw_1 never gets under the threshold, so isn't included
+    npt.assert_equal(aggregate_data["mean"].to_numpy(dtype=float), [2021.5, 2022.0])
+
+
+def test_africa_from_country_partials_matches_africa_from_canonical_ius(tmp_path):
+    ius = ["AAA00001", "AAA00002", "BBB00003"]
+    years_by_iu = {"AAA00001": [2019, 2020, 2021], "AAA00002": [2020, 2021], "BBB00003": [2020]}
+    rng = np.random.default_rng(0)
+    canonical_ius = [
+        pd.DataFrame(
+            {
+                "scenario": scenario,
+                "country_code": iu[:3],
+                "iu_name": iu,
+                "year_id": years_by_iu[iu],
+                "measure": "processed_prevalence",
+                **{f"draw_{draw}": rng.random(len(years_by_iu[iu])) / 10 for draw in range(4)},
+            }
+        )
+        for scenario in ["scenario_0", "scenario_1"]
+        for iu in ius
+    ]
+    iu_data = IUData(
+        pd.DataFrame(
+            {
+                "IU_CODE": ius,
+                "ADMIN0ISO3": [iu[:3] for iu in ius],
+                "Priority_Population_LF": [10, 20, 30],
+            }
+        ),
+        disease=Disease.LF,
+        iu_selection_criteria=IUSelectionCriteria.ALL_IUS,
+    )
+
+    country_partials = [
+        country_partial
+        for country in ["AAA", "BBB"]
+        for country_partial in aggregation.build_country_partials(
+            aggregation.filter_to_maximum_year_range_for_all_ius(
+                [iu for iu in canonical_ius if iu["country_code"].iloc[0] == country],
+                keep_na_year_id=False,
+            ),
+            iu_data,
+            thresholds=[0.05],
+        )
+    ]
+    africa_partials, africa_composite = aggregation.africa_composite_from_country_partials(
+        tmp_path, country_partials, iu_data
+    )
+
+    africa_ius = aggregation.filter_to_maximum_year_range_for_all_ius(
+        canonical_ius, keep_na_year_id=False
+    )
+    expected_composite = composite_run.build_composite_run_multiple_scenarios(
+        africa_ius, iu_data, is_africa=True
+    )
+    pdt.assert_frame_equal(africa_composite, expected_composite)
+    pdt.assert_frame_equal(
+        aggregation.africa_lvl_aggregate_from_country_partials(
+            africa_partials, africa_composite, prevalence_threshold=0.05
+        ),
+        aggregation.africa_lvl_aggregate(
+            africa_ius, expected_composite, prevalence_threshold=0.05
+        ),
+    )
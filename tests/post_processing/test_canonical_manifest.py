@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from endgame_postprocessing.post_processing import pipeline
+from endgame_postprocessing.post_processing.canonical_manifest import (
+    canonical_file_generator,
+    write_canonical_manifest,
+)
+from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
+from endgame_postprocessing.post_processing.disease import Disease
+from endgame_postprocessing.post_processing.pipeline_config import PipelineConfig
+
+LF_TEST_DATA = Path(__file__).parent.parent / "end_to_end" / "lf" / "data_with_historic"
+LF_CANONICAL_RESULTS = LF_TEST_DATA / "known_good_output" / "canonical_results"
+
+
+def test_canonical_file_generator_resolves_manifest(fs):
+    fs.create_file("/input/canonical_results/scenario_0/AAA/AAA00001/AAA00001_scenario_0_canonical.csv")
+    fs.create_file("/input/canonical_results/scenario_1/AAA/AAA00002/AAA00002_scenario_1_canonical.csv")
+
+    write_canonical_manifest(
+        "/output",
+        "/input/canonical_results",
+        {"scenario_x1": {"AAA00002": "scenario_1", "AAA00001": "scenario_0"}},
+    )
+
+    assert json.loads(Path("/output/canonical_manifest.json").read_text())["source_dir"] == (
+        "../input/canonical_results"
+    )
+    file_infos = list(canonical_file_generator("/output"))
+    assert [(file_info.scenario, file_info.iu) for file_info in file_infos] == [
+        ("scenario_x1", "AAA00001"),
+        ("scenario_x1", "AAA00002"),
+    ]
+    assert [Path(file_info.file_path).resolve() for file_info in file_infos] == [
+        Path("/input/canonical_results/scenario_0/AAA/AAA00001/AAA00001_scenario_0_canonical.csv"),
+        Path("/input/canonical_results/scenario_1/AAA/AAA00002/AAA00002_scenario_1_canonical.csv"),
+    ]
+
+
+def test_canonical_file_generator_without_manifest_lists_directory(fs):
+    fs.create_file("/output/canonical_results/scenario_0/AAA/AAA00001/AAA00001_scenario_0_canonical.csv")
+
+    assert list(canonical_file_generator("/output")) == [
+        CustomFileInfo(
+            0,
+            1,
+            "scenario_0",
+            "AAA",
+            "AAA00001",
+            "/output/canonical_results/scenario_0/AAA/AAA00001/AAA00001_scenario_0_canonical.csv",
+        )
+    ]
+
+
+def test_canonical_file_generator_missing_source_iu(fs):
+    fs.create_dir("/input/canonical_results/scenario_0")
+    write_canonical_manifest(
+        "/output", "/input/canonical_results", {"scenario_x1": {"AAA00001": "scenario_0"}}
+    )
+
+    with pytest.raises(Exception, match="Expected exactly one _canonical.csv file"):
+        list(canonical_file_generator("/output"))
+
+
+def _copy_mixed_scenario(source_scenarios, destination):
+    for iu, source_scenario in source_scenarios.items():
+        source = next((LF_CANONICAL_RESULTS / source_scenario / iu[:3] / iu).iterdir())
+        # Relabel the scenario without re-formatting the draws
+        canonical = source.read_text().replace(f"\n{source_scenario},", "\nscenario_x1,")
+        iu_directory = destination / "canonical_results" / "scenario_x1" / iu[:3] / iu
+        iu_directory.mkdir(parents=True)
+        (iu_directory / f"{iu}_scenario_x1_canonical.csv").write_text(canonical)
+
+
+def test_pipeline_with_manifest_matches_copied_scenario(tmp_path):
+    source_scenarios = {
+        "AAA00001": "scenario_0",
+        "AAA00002": "scenario_minus1",
+        "BBB00003": "scenario_0",
+        "BBB00004": "scenario_minus1",
+    }
+    _copy_mixed_scenario(source_scenarios, tmp_path / "copied")
+    write_canonical_manifest(
+        tmp_path / "manifest", LF_CANONICAL_RESULTS, {"scenario_x1": source_scenarios}
+    )
+
+    for working_directory in [tmp_path / "copied", tmp_path / "manifest"]:
+        pipeline.pipeline(
+            LF_TEST_DATA / "example_input_data",
+            working_directory,
+            PipelineConfig(disease=Disease.LF),
+        )
+
+    assert not (tmp_path / "manifest" / "canonical_results").exists()
+    for output_file in (tmp_path / "copied").rglob("*.csv"):
+        relative_path = output_file.relative_to(tmp_path / "copied")
+        if relative_path.parts[0] == "canonical_results":
+            continue
+        # The IUs may be summed in a different order (the manifest is sorted by IU)
+        pdt.assert_frame_equal(
+            pd.read_csv(tmp_path / "manifest" / relative_path), pd.read_csv(output_file)
+        )
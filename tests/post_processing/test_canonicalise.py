@@ -1,5 +1,6 @@
 import pandas as pd
 import pandas.testing as pdt
+import pytest
 from endgame_postprocessing.post_processing import canonicalise
 from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
 
@@ -120,3 +121,144 @@ def test_exclude_irrelevant_columns():
             }
         ),
     )
+
+
+def test_read_raw_measure_filters_while_reading(fs):
+    raw = pd.DataFrame(
+        {
+            "year_id": [2010, 2010, 2011, 2011, 2012],
+            "age_start": [5] * 5,
+            "age_end": [100] * 5,
+            "measure": ["prevalence", "measure2", "measure2", "prevalence", "measure2"],
+            "draw_0": [0.1, 0.2, 0.3, 0.4, 0.5],
+        }
+    )
+    fs.create_file("raw.csv", contents=raw.to_csv(index=False))
+
+    filtered_raw = canonicalise.read_raw_measure("raw.csv", "prevalence", chunksize=2)
+    pdt.assert_frame_equal(
+        filtered_raw,
+        pd.DataFrame(
+            {
+                "year_id": [2010, 2011],
+                "age_start": [5] * 2,
+                "age_end": [100] * 2,
+                "measure": ["prevalence"] * 2,
+                "draw_0": [0.1, 0.4],
+            }
+        ),
+    )
+
+
+def test_read_raw_measure_missing_measure_column(fs):
+    fs.create_file("raw.csv", contents="year_id,draw_0\n2010,0.1\n")
+
+    with pytest.raises(Exception, match="Could not find measure column"):
+        canonicalise.read_raw_measure("raw.csv", "prevalence")
+
+
+def test_canonicalise_does_not_modify_raw():
+    simple_raw = pd.DataFrame(
+        {
+            "year_id": [2010, 2011],
+            "measure": ["prevalence", "measure2"],
+            "age_start": [5] * 2,
+            "age_end": [100] * 2,
+            "draw_0": [0.2] * 2,
+        }
+    )
+    file_info = CustomFileInfo(
+        country="AAA",
+        file_path="",
+        iu="AAA00001",
+        scenario="scenario_1",
+        scenario_index=1,
+        total_scenarios=1,
+    )
+
+    canonicalise.canonicalise_raw(simple_raw, file_info, processed_prevalence_name="prevalence")
+    assert list(simple_raw.columns) == ["year_id", "measure", "age_start", "age_end", "draw_0"]
+
+
+CANONICAL_CSV = """scenario,country_code,iu_name,year_id,age_start,age_end,measure,draw_0,draw_1
+scenario_1,AAA,AAA00001,2010,5,100,processed_prevalence,0,0.5
+scenario_1,AAA,AAA00001,2011,5,100,processed_prevalence,0,0.25
+"""
+
+
+def test_read_canonical_uses_fixed_schema(fs):
+    fs.create_file("canonical.csv", contents=CANONICAL_CSV)
+
+    canonical = canonicalise.read_canonical("canonical.csv")
+
+    assert list(canonical.columns) == [
+        "scenario", "country_code", "iu_name", "year_id", "age_start", "age_end", "measure",
+        "draw_0", "draw_1",
+    ]
+    assert canonical["year_id"].dtype == "int64"
+    assert canonical["age_start"].dtype == "int64"
+    # pandas would infer all zero draws as ints
+    assert canonical["draw_0"].dtype == "float64"
+    assert canonical["iu_name"].dtype == "object"
+
+
+def test_read_canonical_only_reads_requested_columns(fs):
+    fs.create_file("canonical.csv", contents=CANONICAL_CSV)
+
+    canonical = canonicalise.read_canonical("canonical.csv", canonicalise.COMPOSITE_COLUMNS)
+
+    pdt.assert_frame_equal(
+        canonical,
+        pd.DataFrame(
+            {
+                "scenario": ["scenario_1"] * 2,
+                "country_code": ["AAA"] * 2,
+                "iu_name": ["AAA00001"] * 2,
+                "year_id": [2010, 2011],
+                "measure": ["processed_prevalence"] * 2,
+                "draw_0": [0.0, 0.0],
+                "draw_1": [0.5, 0.25],
+            }
+        ),
+    )
+
+
+def test_read_canonical_replaces_scenario(fs):
+    fs.create_file("canonical.csv", contents=CANONICAL_CSV)
+
+    canonical = canonicalise.read_canonical("canonical.csv", scenario="scenario_x1")
+
+    assert list(canonical["scenario"]) == ["scenario_x1"] * 2
+
+
+def test_read_canonical_uses_preloaded_results(fs):
+    fs.create_file("canonical.csv", contents=CANONICAL_CSV)
+    expected = canonicalise.read_canonical("canonical.csv", canonicalise.COMPOSITE_COLUMNS)
+
+    canonicalise.preload_canonical(["canonical.csv"])
+    try:
+        fs.remove("canonical.csv")
+        preloaded = canonicalise.read_canonical("canonical.csv", canonicalise.COMPOSITE_COLUMNS)
+        preloaded["draw_0"] = 1.0
+        reread = canonicalise.read_canonical("canonical.csv", canonicalise.COMPOSITE_COLUMNS)
+    finally:
+        canonicalise.clear_preloaded_canonical()
+
+    pdt.assert_frame_equal(reread, expected)
+
+
+def test_read_canonical_uses_results_preloaded_elsewhere(fs):
+    fs.create_file("canonical.csv", contents=CANONICAL_CSV)
+    expected = canonicalise.read_canonical("canonical.csv")
+    preloaded_canonical = canonicalise.preload_canonical(["canonical.csv"])
+    canonicalise.clear_preloaded_canonical()
+    fs.remove("canonical.csv")
+
+    # As a process that was not forked from the one that preloaded them would
+    canonicalise.use_preloaded_canonical(preloaded_canonical)
+    try:
+        preloaded = canonicalise.read_canonical("canonical.csv")
+    finally:
+        canonicalise.clear_preloaded_canonical()
+
+    pdt.assert_frame_equal(preloaded, expected)
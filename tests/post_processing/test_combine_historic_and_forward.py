@@ -4,7 +4,11 @@ import pandas.testing as pdt
 from pyfakefs.fake_filesystem import FakeFilesystem
 import pytest
 
-from endgame_postprocessing.post_processing import combine_historic_and_forward
+from endgame_postprocessing.post_processing import (
+    canonical_file_name,
+    combine_historic_and_forward,
+    file_util,
+)
 
 
 def test_combine_historic_and_forward(fs: FakeFilesystem):
@@ -56,6 +60,36 @@ def test_combine_historic_and_forward(fs: FakeFilesystem):
     )
 
 
+@pytest.mark.parametrize("historic_suffix,forward_suffix", [(".gz", ".bz2"), (".xz", "")])
+def test_combine_historic_and_forward_compressed_inputs(
+        tmp_path, historic_suffix, forward_suffix
+):
+    historic_directory = tmp_path / "historic"
+    forward_directory = tmp_path / "forward"
+    historic_directory.mkdir()
+    forward_directory.mkdir()
+    pd.DataFrame({"year_id": [2020], "scenario": ["scenario_0"], "draw_0": [0.1]}).to_csv(
+        historic_directory / f"AAA12345_scenario_0_canonical.csv{historic_suffix}", index=False
+    )
+    pd.DataFrame({"year_id": [2021], "scenario": ["scenario_1"], "draw_0": [0.2]}).to_csv(
+        forward_directory / f"AAA12345_scenario_1_canonical.csv{forward_suffix}", index=False
+    )
+
+    combine_historic_and_forward.combine_historic_and_forward(
+        historic_directory, forward_directory, tmp_path / "output"
+    )
+
+    pdt.assert_frame_equal(
+        pd.read_csv(
+            tmp_path
+            / "output/canonical_results/scenario_1/AAA/AAA12345/AAA12345_scenario_1_canonical.csv"
+        ),
+        pd.DataFrame(
+            {"year_id": [2020, 2021], "scenario": ["scenario_1"] * 2, "draw_0": [0.1, 0.2]}
+        ),
+    )
+
+
 def test_combine_historic_and_forward_missing_historic_raises_error(fs: FakeFilesystem):
     historic_canonical = pd.DataFrame(
         {
@@ -171,3 +205,62 @@ def test_combine_historic_and_forward_overlap_removed(fs: FakeFilesystem):
             }
         ),
     )
+
+
+def test_combine_historic_and_forward_multiple_jobs(
+        fs: FakeFilesystem
+):
+    canonical = pd.DataFrame(
+        {
+            "year_id": [2020, 2021],
+            "scenario": ["scenario_0"] * 2,
+            "draw_0": [0.1, 0.2],
+        }
+    )
+    for iu in ["AAA00002", "AAA00003"]:
+        fs.create_file(
+            f"historic/{iu}_scenario_0_canonical.csv",
+            contents=canonical.to_csv(index=False),
+        )
+    fs.create_file(
+        "historic/AAA00004_scenario_0_canonical.csv",
+        contents=canonical.rename(columns={"draw_0": "other"}).to_csv(index=False),
+    )
+    for iu in ["AAA00001", "AAA00002", "AAA00003", "AAA00004"]:
+        fs.create_file(
+            f"forward/{iu}_scenario_1_canonical.csv",
+            contents=canonical.assign(year_id=[2021, 2022]).to_csv(index=False),
+        )
+
+    with pytest.warns(Warning) as raised_warnings:
+        combine_historic_and_forward.combine_historic_and_forward(
+            "historic", "forward", "output", num_jobs=3
+        )
+
+    # The warnings are raised in the order of the forward files, not the order the IUs finish
+    expected_warnings = {
+        "AAA00001": "Missing IU: AAA00001 in historic data",
+        "AAA00004": "AAA00004 different columns in historic and forward projection",
+    }
+    forward_ius = [
+        file_info.iu
+        for file_info in file_util.get_flat_regex(canonical_file_name.get_regex(), "forward")
+    ]
+    assert [str(warning.message) for warning in raised_warnings] == [
+        expected_warnings[iu] for iu in forward_ius if iu in expected_warnings
+    ]
+    for iu in ["AAA00002", "AAA00003"]:
+        output_canonical = pd.read_csv(
+            f"output/canonical_results/scenario_1/AAA/{iu}/{iu}_scenario_1_canonical.csv"
+        )
+        pdt.assert_frame_equal(
+            output_canonical,
+            pd.DataFrame(
+                {
+                    "year_id": [2020, 2021, 2022],
+                    "scenario": ["scenario_1"] * 3,
+                    "draw_0": [0.1, 0.1, 0.2],
+                }
+            ),
+        )
+    assert not os.path.exists("output/canonical_results/scenario_1/AAA/AAA00004")
@@ -0,0 +1,243 @@
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+import pandas.testing as pdt
+
+from endgame_postprocessing.post_processing import composite_run, output_directory_structure
+from endgame_postprocessing.post_processing.aggregation import (
+    africa_composite_from_country_partials,
+    build_country_partials,
+    filter_to_maximum_year_range_for_all_ius,
+)
+from endgame_postprocessing.post_processing.composite_delta import CompositeDeltaEngine
+from endgame_postprocessing.post_processing.disease import Disease
+from endgame_postprocessing.post_processing.iu_data import IUData, IUSelectionCriteria
+
+IUS = ["AAA00001", "AAA00002", "BBB00003", "BBB00004"]
+
+
+def _canonical_iu_run(scenario, iu, years, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "scenario": scenario,
+            "country_code": iu[:3],
+            "iu_name": iu,
+            "year_id": years,
+            "measure": "processed_prevalence",
+            **{f"draw_{draw}": rng.random(len(years)) for draw in range(3)},
+        }
+    )
+
+
+def _iu_data():
+    return IUData(
+        pd.DataFrame(
+            {
+                "IU_CODE": IUS,
+                "ADMIN0ISO3": [iu[:3] for iu in IUS],
+                "Priority_Population_LF": [10, 20, 30, 40],
+            }
+        ),
+        disease=Disease.LF,
+        iu_selection_criteria=IUSelectionCriteria.ALL_IUS,
+    )
+
+
+def _scenario(scenario, seed, years_by_iu=None):
+    years_by_iu = years_by_iu or {}
+    return [
+        _canonical_iu_run(scenario, iu, years_by_iu.get(iu, [2020, 2021, 2022]), seed + index)
+        for index, iu in enumerate(IUS)
+    ]
+
+
+def _engine(scenarios):
+    engine = CompositeDeltaEngine(_iu_data())
+    for scenario, canonical_iu_runs in scenarios.items():
+        engine.add_scenario(scenario, canonical_iu_runs)
+    return engine
+
+
+def _country_iu_runs(mixed_canonical_iu_runs):
+    iu_runs = [iu_run.assign(scenario="scenario_x1") for iu_run in mixed_canonical_iu_runs]
+    return {
+        country: filter_to_maximum_year_range_for_all_ius(
+            [iu_run for iu_run in iu_runs if iu_run["country_code"].iloc[0] == country],
+            keep_na_year_id=False,
+        )
+        for country in ["AAA", "BBB"]
+    }
+
+
+def _expected_country_composites(mixed_canonical_iu_runs):
+    """The country composites as the pipeline builds them, from every IU"""
+    return {
+        country: composite_run.build_composite_run(country_iu_runs, _iu_data())
+        for country, country_iu_runs in _country_iu_runs(mixed_canonical_iu_runs).items()
+    }
+
+
+def _expected_africa_composite(mixed_canonical_iu_runs, tmp_path, mocker):
+    """The Africa composite as the pipeline builds it, from the partials of every country"""
+    write_africa_composite = mocker.spy(output_directory_structure, "write_africa_composite")
+    africa_composite_from_country_partials(
+        tmp_path,
+        [
+            country_partial
+            for country_iu_runs in _country_iu_runs(mixed_canonical_iu_runs).values()
+            for country_partial in build_country_partials(country_iu_runs, _iu_data(), [])
+        ],
+        _iu_data(),
+    )
+    # The composite before it is written (and rounded)
+    return write_africa_composite.call_args.args[1]
+
+
+def test_country_composites_apply_overrides():
+    scenario_0 = _scenario("scenario_0", 0)
+    scenario_1 = _scenario("scenario_1", 10)
+    engine = _engine({"scenario_0": scenario_0, "scenario_1": scenario_1})
+
+    composites = engine.country_composites(
+        "scenario_x1", "scenario_0", {"scenario_1": ["AAA00002"]}
+    )
+
+    expected = _expected_country_composites(
+        [scenario_0[0], scenario_1[1], scenario_0[2], scenario_0[3]]
+    )
+    assert list(composites) == ["AAA", "BBB"]
+    for country, composite in composites.items():
+        pdt.assert_frame_equal(composite, expected[country], check_exact=True)
+    assert engine.affected_countries({"scenario_1": ["AAA00002"]}) == ["AAA"]
+
+
+def test_africa_composite_applies_overrides(tmp_path, mocker):
+    scenario_0 = _scenario("scenario_0", 0)
+    scenario_1 = _scenario("scenario_1", 10)
+    engine = _engine({"scenario_0": scenario_0, "scenario_1": scenario_1})
+
+    composite = engine.africa_composite(
+        "scenario_x1", "scenario_0", {"scenario_1": ["AAA00002", "BBB00004"]}
+    )
+
+    pdt.assert_frame_equal(
+        composite,
+        _expected_africa_composite(
+            [scenario_0[0], scenario_1[1], scenario_0[2], scenario_1[3]], tmp_path, mocker
+        ),
+        check_exact=True,
+    )
+
+
+def test_composites_of_zero_prevalence_overrides_are_exactly_zero(tmp_path, mocker):
+    scenario_0 = _scenario("scenario_0", 0)
+    scenario_1 = [
+        iu_run.assign(**{f"draw_{draw}": 0.0 for draw in range(3)})
+        for iu_run in _scenario("scenario_1", 10)
+    ]
+    engine = _engine({"scenario_0": scenario_0, "scenario_1": scenario_1})
+    overridden_ius = {"scenario_1": ["BBB00003", "BBB00004"]}
+    mixed_canonical_iu_runs = [scenario_0[0], scenario_0[1], scenario_1[2], scenario_1[3]]
+
+    composites = engine.country_composites("scenario_x1", "scenario_0", overridden_ius)
+    africa_composite = engine.africa_composite("scenario_x1", "scenario_0", overridden_ius)
+
+    assert (composites["BBB"].loc[:, "draw_0":] == 0.0).all(axis=None)
+    expected = _expected_country_composites(mixed_canonical_iu_runs)
+    for country, composite in composites.items():
+        pdt.assert_frame_equal(composite, expected[country], check_exact=True)
+    pdt.assert_frame_equal(
+        africa_composite,
+        _expected_africa_composite(mixed_canonical_iu_runs, tmp_path, mocker),
+        check_exact=True,
+    )
+
+
+def test_africa_composite_covers_the_years_of_every_country(tmp_path, mocker):
+    scenario_0 = _scenario("scenario_0", 0)
+    scenario_1 = _scenario("scenario_1", 10, {"AAA00002": [2021, 2022, 2023]})
+    engine = _engine({"scenario_0": scenario_0, "scenario_1": scenario_1})
+
+    composite = engine.africa_composite(
+        "scenario_x1", "scenario_0", {"scenario_1": ["AAA00002"]}
+    )
+
+    assert list(composite["year_id"]) == [2021, 2022]
+    pdt.assert_frame_equal(
+        composite,
+        _expected_africa_composite(
+            [scenario_0[0], scenario_1[1], scenario_0[2], scenario_0[3]], tmp_path, mocker
+        ),
+        check_exact=True,
+    )
+
+
+def test_country_composite_resummed_when_override_changes_years():
+    scenario_0 = _scenario("scenario_0", 0, {"AAA00002": [2019, 2020, 2021]})
+    scenario_1 = _scenario("scenario_1", 10, {"AAA00002": [2020, 2021, 2022, 2023]})
+    engine = _engine({"scenario_0": scenario_0, "scenario_1": scenario_1})
+
+    composites = engine.country_composites(
+        "scenario_x1", "scenario_0", {"scenario_1": ["AAA00002"]}
+    )
+
+    expected = _expected_country_composites(
+        [scenario_0[0], scenario_1[1], scenario_0[2], scenario_0[3]]
+    )
+    assert list(composites["AAA"]["year_id"]) == [2020, 2021, 2022]
+    for country, composite in composites.items():
+        pdt.assert_frame_equal(composite, expected[country], check_exact=True)
+
+
+def test_country_composite_with_missing_draws():
+    scenario_0 = _scenario("scenario_0", 0)
+    scenario_0[0].loc[0, "draw_0"] = np.nan
+    scenario_1 = _scenario("scenario_1", 10)
+    engine = _engine({"scenario_0": scenario_0, "scenario_1": scenario_1})
+
+    composites = engine.country_composites(
+        "scenario_x1", "scenario_0", {"scenario_1": ["AAA00002"]}
+    )
+
+    pdt.assert_frame_equal(
+        composites["AAA"],
+        _expected_country_composites(
+            [scenario_0[0], scenario_1[1], scenario_0[2], scenario_0[3]]
+        )["AAA"],
+        check_exact=True,
+    )
+
+
+def test_country_partials_match_build_country_partials():
+    scenario_0 = _scenario("scenario_0", 0)
+    scenario_1 = _scenario("scenario_1", 10)
+    engine = _engine({"scenario_0": scenario_0, "scenario_1": scenario_1})
+
+    country_partials = engine.country_partials(
+        "scenario_x1", "scenario_0", {"scenario_1": ["AAA00002"]}, [0.5]
+    )
+
+    expected_partials = [
+        country_partial
+        for country_iu_runs in _country_iu_runs(
+            [scenario_0[0], scenario_1[1], scenario_0[2], scenario_0[3]]
+        ).values()
+        for country_partial in build_country_partials(country_iu_runs, _iu_data(), [0.5])
+    ]
+    assert len(country_partials) == len(expected_partials)
+    for country_partial, expected_partial in zip(country_partials, expected_partials):
+        pdt.assert_frame_equal(
+            country_partial.composite_columns, expected_partial.composite_columns
+        )
+        npt.assert_array_equal(
+            country_partial.summed_case_numbers, expected_partial.summed_case_numbers
+        )
+        npt.assert_array_equal(
+            country_partial.all_ius_below_threshold[0.5],
+            expected_partial.all_ius_below_threshold[0.5],
+        )
+        npt.assert_array_equal(
+            country_partial.prop_draws_below_threshold[0.5],
+            expected_partial.prop_draws_below_threshold[0.5],
+        )
@@ -0,0 +1,71 @@
+import gzip
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from endgame_postprocessing.post_processing.aggregation import aggregate_post_processed_files
+from endgame_postprocessing.post_processing.compression import (
+    OutputCompression,
+    open_text,
+    strip_compression_suffix,
+)
+from endgame_postprocessing.post_processing.file_util import post_process_file_generator
+from endgame_postprocessing.post_processing.output_directory_structure import write_csv
+
+
+def test_strip_compression_suffix():
+    assert strip_compression_suffix("a_canonical.csv.gz") == "a_canonical.csv"
+    assert strip_compression_suffix("a_canonical.csv.xz") == "a_canonical.csv"
+    assert strip_compression_suffix("a_canonical.csv") == "a_canonical.csv"
+
+
+def test_output_compression_rejects_unknown_method():
+    with pytest.raises(ValueError, match="Unsupported compression method lz4"):
+        OutputCompression(method="lz4")
+
+
+@pytest.mark.parametrize("method", ["gzip", "bz2", "xz"])
+def test_write_csv_compressed_round_trips(fs, method):
+    data = pd.DataFrame({"iu_name": ["AAA00001", "AAA00002"], "draw_0": [0.5, 1e-07]})
+
+    file_path = write_csv(data, "data.csv", OutputCompression(method=method))
+
+    assert file_path == "data.csv" + OutputCompression(method=method).suffix
+    pdt.assert_frame_equal(pd.read_csv(file_path), data)
+    with open_text(file_path) as file:
+        assert file.read() == data.to_csv(index=False, float_format="%g")
+
+
+def test_write_csv_gzip_is_reproducible(fs):
+    data = pd.DataFrame({"iu_name": ["AAA00001"], "draw_0": [0.5]})
+
+    file_path = write_csv(data, "data.csv", OutputCompression())
+    with open(file_path, "rb") as file:
+        first_contents = file.read()
+
+    write_csv(data, "data.csv", OutputCompression())
+    with open(file_path, "rb") as file:
+        assert file.read() == first_contents
+
+
+def test_post_process_file_generator_finds_compressed_files(fs):
+    fs.create_file("input/scenario_1/AAA/AAA00001/AAA00001_scenario_1_canonical.csv.gz")
+
+    files = list(post_process_file_generator("input", end_of_file="_canonical.csv"))
+
+    assert [file_info.file_path for file_info in files] == [
+        "input/scenario_1/AAA/AAA00001/AAA00001_scenario_1_canonical.csv.gz"
+    ]
+
+
+def test_aggregate_post_processed_files_reads_compressed_files(fs):
+    fs.create_file("ius/scenario_1_AAA00001_post_processed.csv", contents="a,b\n1,2\n")
+    with gzip.open("ius/scenario_1_AAA00002_post_processed.csv.gz", "wt") as file:
+        file.write("a,b\n3,4\n")
+
+    aggregated = aggregate_post_processed_files("ius")
+
+    pdt.assert_frame_equal(
+        aggregated, pd.DataFrame({"a": ["1", "3"], "b": ["2", "4"]})
+    )
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from endgame_postprocessing.post_processing import canonicalise, draw_cube
+from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
+from endgame_postprocessing.post_processing.draw_cube import read_draw_cube, write_draw_cubes
+from endgame_postprocessing.post_processing.output_directory_structure import (
+    get_draw_cube_dir,
+    write_canonical,
+)
+
+
+def _canonical(scenario, iu, years, draws):
+    return pd.DataFrame(
+        {
+            "scenario": scenario,
+            "country_code": iu[:3],
+            "iu_name": iu,
+            "year_id": years,
+            "age_start": 5,
+            "age_end": 100,
+            "measure": "processed_prevalence",
+            "draw_0": draws,
+            "draw_1": [draw / 2 for draw in draws],
+        }
+    )
+
+
+def _write(working_dir, scenario, iu, years, draws):
+    write_canonical(
+        working_dir,
+        CustomFileInfo(0, 1, scenario, iu[:3], iu, ""),
+        _canonical(scenario, iu, years, draws),
+    )
+
+
+def test_write_draw_cubes_round_trips_canonical_results(tmp_path):
+    _write(tmp_path, "scenario_1", "AAA00001", [2000, 2001, 2002], [0.1, 0.2, 0.3])
+    _write(tmp_path, "scenario_1", "AAA00002", [2001, 2002, 2003], [0.4, np.nan, 0.6])
+
+    (cube,) = write_draw_cubes(tmp_path)
+
+    assert cube.scenario == "scenario_1"
+    assert sorted(cube.ius) == ["AAA00001", "AAA00002"]
+    assert list(cube.years) == [2000, 2001, 2002, 2003]
+    assert isinstance(cube.draws, np.memmap)
+    for iu in ["AAA00001", "AAA00002"]:
+        expected = pd.read_csv(
+            f"{tmp_path}/canonical_results/scenario_1/AAA/{iu}/{iu}_scenario_1_canonical.csv"
+        ).drop(columns=["age_start", "age_end"])
+        pdt.assert_frame_equal(cube.canonical_iu_run(cube.ius.index(iu)), expected)
+
+
+def test_read_draw_cube_matches_written_cube(tmp_path):
+    _write(tmp_path, "scenario_1", "AAA00001", [2000, 2001], [0.1, 0.2])
+    _write(tmp_path, "scenario_2", "AAA00001", [2000, 2001], [0.3, 0.4])
+
+    written_cubes = write_draw_cubes(tmp_path)
+
+    for written_cube in written_cubes:
+        cube = read_draw_cube(get_draw_cube_dir(tmp_path), written_cube.scenario)
+        assert cube.ius == written_cube.ius
+        np.testing.assert_array_equal(cube.draws, written_cube.draws)
+        np.testing.assert_array_equal(cube.has_year, written_cube.has_year)
+
+
+def test_write_draw_cubes_rejects_repeated_years(tmp_path):
+    _write(tmp_path, "scenario_1", "AAA00001", [2000, 2000], [0.1, 0.2])
+
+    with pytest.raises(Exception, match="More than one row for a year"):
+        write_draw_cubes(tmp_path)
+
+
+def test_write_draw_cubes_reuses_cube_of_unchanged_scenario(tmp_path, mocker):
+    _write(tmp_path, "scenario_1", "AAA00001", [2000, 2001], [0.1, 0.2])
+    _write(tmp_path, "scenario_2", "AAA00001", [2000, 2001], [0.3, 0.4])
+    write_draw_cubes(tmp_path)
+    write_draw_cube = mocker.spy(draw_cube, "_write_draw_cube")
+
+    _write(tmp_path, "scenario_2", "AAA00001", [2000, 2001], [0.35, 0.45])
+    cubes = {cube.scenario: cube for cube in write_draw_cubes(tmp_path)}
+
+    assert [call.args[1] for call in write_draw_cube.call_args_list] == ["scenario_2"]
+    np.testing.assert_array_equal(cubes["scenario_1"].draws[0, :, 0], [0.1, 0.2])
+    np.testing.assert_array_equal(cubes["scenario_2"].draws[0, :, 0], [0.35, 0.45])
+
+
+def test_write_draw_cubes_reads_one_iu_at_a_time(tmp_path, mocker):
+    _write(tmp_path, "scenario_1", "AAA00001", [2000, 2001], [0.1, 0.2])
+    _write(tmp_path, "scenario_1", "AAA00002", [2001, 2002], [0.3, 0.4])
+    open_memmap = mocker.spy(np.lib.format, "open_memmap")
+    read_canonical = mocker.spy(canonicalise, "read_canonical")
+    manager = mocker.Mock()
+    manager.attach_mock(open_memmap, "open_memmap")
+    manager.attach_mock(read_canonical, "read_canonical")
+
+    write_draw_cubes(tmp_path)
+
+    # The cube is allocated before any IU's draws are read, so they are written straight in
+    # (it is then opened again to be read back)
+    assert [call[0] for call in manager.mock_calls] == [
+        "open_memmap",
+        "read_canonical",
+        "read_canonical",
+        "open_memmap",
+    ]
@@ -0,0 +1,100 @@
+import warnings
+
+from endgame_postprocessing.post_processing import file_catalog
+from endgame_postprocessing.post_processing.file_util import post_process_file_generator
+
+
+def _create_canonical_files(root, ius):
+    for scenario, iu in ius:
+        iu_dir = root / scenario / iu[:3] / iu
+        iu_dir.mkdir(parents=True, exist_ok=True)
+        (iu_dir / f"{iu}_{scenario}_canonical.csv").write_text("")
+
+
+def test_catalog_files_matches_file_generator(tmp_path):
+    _create_canonical_files(
+        tmp_path,
+        [("scenario_0", "AAA00001"), ("scenario_0", "BBB00002"), ("scenario_1", "AAA00001")],
+    )
+
+    assert file_catalog.catalog_files(str(tmp_path), "_canonical.csv") == list(
+        post_process_file_generator(str(tmp_path), "_canonical.csv")
+    )
+
+
+def test_catalog_files_only_walks_once(tmp_path, mocker):
+    _create_canonical_files(tmp_path, [("scenario_0", "AAA00001")])
+    walk = mocker.spy(file_catalog, "post_process_file_generator")
+
+    first = file_catalog.catalog_files(str(tmp_path), "_canonical.csv")
+    second = file_catalog.catalog_files(str(tmp_path), "_canonical.csv")
+
+    assert first == second
+    assert walk.call_count == 1
+
+
+def test_catalog_files_rebuilt_when_directory_changes(tmp_path, mocker):
+    _create_canonical_files(tmp_path, [("scenario_0", "AAA00001")])
+    file_catalog.catalog_files(str(tmp_path), "_canonical.csv")
+    walk = mocker.spy(file_catalog, "post_process_file_generator")
+
+    _create_canonical_files(tmp_path, [("scenario_0", "AAA00002")])
+    file_infos = file_catalog.catalog_files(str(tmp_path), "_canonical.csv")
+
+    assert sorted(file_info.iu for file_info in file_infos) == ["AAA00001", "AAA00002"]
+    assert walk.call_count == 1
+
+
+def test_catalog_files_reads_saved_index(tmp_path, mocker):
+    canonical_dir = tmp_path / "canonical_results"
+    index_path = tmp_path / file_catalog.INDEX_FILE_NAME
+    _create_canonical_files(canonical_dir, [("scenario_0", "AAA00001")])
+    expected = file_catalog.catalog_files(str(canonical_dir), "_canonical.csv", index_path)
+    # As if in a new process
+    mocker.patch.dict(file_catalog._catalogs, clear=True)
+    walk = mocker.spy(file_catalog, "post_process_file_generator")
+
+    file_infos = file_catalog.catalog_files(str(canonical_dir), "_canonical.csv", index_path)
+
+    assert index_path.exists()
+    assert file_infos == expected
+    assert walk.call_count == 0
+
+
+def test_catalog_files_raises_file_warnings_again_when_reused(tmp_path, mocker):
+    canonical_dir = tmp_path / "canonical_results"
+    index_path = tmp_path / file_catalog.INDEX_FILE_NAME
+    _create_canonical_files(canonical_dir, [("scenario_0", "AAA00001")])
+    (canonical_dir / "scenario_0" / "AAA" / "AAA00001" / "notes.txt").write_text("")
+
+    def catalog_warnings():
+        with warnings.catch_warnings(record=True) as raised_warnings:
+            warnings.simplefilter("always")
+            file_catalog.catalog_files(str(canonical_dir), "_canonical.csv", index_path)
+        return [
+            (str(raised_warning.message), raised_warning.filename, raised_warning.lineno)
+            for raised_warning in raised_warnings
+        ]
+
+    built_warnings = catalog_warnings()
+    cached_warnings = catalog_warnings()
+    # As if in a new process
+    mocker.patch.dict(file_catalog._catalogs, clear=True)
+    indexed_warnings = catalog_warnings()
+
+    assert len(built_warnings) == 1
+    assert "Unexpected file notes.txt" in built_warnings[0][0]
+    assert cached_warnings == built_warnings
+    assert indexed_warnings == built_warnings
+
+
+def test_catalog_scope_forgets_catalogs(tmp_path, mocker):
+    _create_canonical_files(tmp_path, [("scenario_0", "AAA00001")])
+    walk = mocker.spy(file_catalog, "post_process_file_generator")
+
+    with file_catalog.catalog_scope():
+        file_catalog.catalog_files(str(tmp_path), "_canonical.csv")
+        file_catalog.catalog_files(str(tmp_path), "_canonical.csv")
+    file_catalog.catalog_files(str(tmp_path), "_canonical.csv")
+
+    assert walk.call_count == 2
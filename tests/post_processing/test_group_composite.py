@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from endgame_postprocessing.post_processing import composite_run, group_composite
+from endgame_postprocessing.post_processing.aggregation import (
+    filter_to_maximum_year_range_for_all_ius,
+)
+from endgame_postprocessing.post_processing.disease import Disease
+from endgame_postprocessing.post_processing.iu_data import IUData, IUSelectionCriteria
+
+IUS = ["AAA00001", "AAA00002", "BBB00003", "BBB00004"]
+
+
+def _canonical_iu_run(scenario, iu, years, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "scenario": scenario,
+            "country_code": iu[:3],
+            "iu_name": iu,
+            "year_id": years,
+            "measure": "processed_prevalence",
+            **{f"draw_{draw}": rng.random(len(years)) for draw in range(3)},
+        }
+    )
+
+
+def _iu_data():
+    return IUData(
+        pd.DataFrame(
+            {
+                "IU_CODE": IUS,
+                "ADMIN0ISO3": [iu[:3] for iu in IUS],
+                "Priority_Population_LF": [10, 20, 30, 40],
+            }
+        ),
+        disease=Disease.LF,
+        iu_selection_criteria=IUSelectionCriteria.ALL_IUS,
+    )
+
+
+def _canonical_iu_runs(years_by_iu=None):
+    years_by_iu = years_by_iu or {}
+    return [
+        _canonical_iu_run(scenario, iu, years_by_iu.get(iu, [2020, 2021, 2022]), seed)
+        for seed, (scenario, iu) in enumerate(
+            (scenario, iu) for scenario in ["scenario_0", "scenario_1"] for iu in IUS
+        )
+    ]
+
+
+def _expected_composite(canonical_iu_runs, is_africa=False):
+    return composite_run.build_composite_run_multiple_scenarios(
+        filter_to_maximum_year_range_for_all_ius(canonical_iu_runs, keep_na_year_id=False),
+        _iu_data(),
+        is_africa=is_africa,
+    )
+
+
+def _assert_matches_composite_run(canonical_iu_runs):
+    country_composites, africa_composite = (
+        group_composite.build_country_and_africa_composites(canonical_iu_runs, _iu_data())
+    )
+
+    assert list(country_composites) == ["AAA", "BBB"]
+    for country, country_composite in country_composites.items():
+        pdt.assert_frame_equal(
+            country_composite,
+            _expected_composite(
+                [run for run in canonical_iu_runs if run["country_code"].iloc[0] == country]
+            ),
+        )
+    pdt.assert_frame_equal(
+        africa_composite, _expected_composite(canonical_iu_runs, is_africa=True)
+    )
+
+
+def test_country_and_africa_composites_match_composite_run():
+    _assert_matches_composite_run(_canonical_iu_runs())
+
+
+def test_country_and_africa_composites_cover_common_years():
+    canonical_iu_runs = _canonical_iu_runs(
+        {"AAA00002": [2019, 2020, 2021], "BBB00004": [2020, 2021, 2022, 2023]}
+    )
+
+    _assert_matches_composite_run(canonical_iu_runs)
+
+
+def test_country_and_africa_composites_missing_draw():
+    canonical_iu_runs = _canonical_iu_runs()
+    canonical_iu_runs[1].loc[0, "draw_0"] = np.nan
+
+    country_composites, africa_composite = (
+        group_composite.build_country_and_africa_composites(canonical_iu_runs, _iu_data())
+    )
+
+    assert np.isnan(country_composites["AAA"].loc[0, "draw_0"])
+    assert not country_composites["BBB"].loc[:, "draw_0":].isna().any().any()
+    _assert_matches_composite_run(canonical_iu_runs)
+
+
+def test_build_group_composites_ius_in_many_groups():
+    canonical_iu_runs = _canonical_iu_runs()
+
+    composites = group_composite.build_group_composites(
+        canonical_iu_runs,
+        _iu_data(),
+        {"north": ["AAA00001", "BBB00003"], "all": IUS, "none": ["CCC00005"]},
+        {"north": 40, "all": 100, "none": 1},
+    )
+
+    assert list(composites) == ["north", "all"]
+    pdt.assert_frame_equal(
+        composites["all"], _expected_composite(canonical_iu_runs, is_africa=True)
+    )
+    expected_north = canonical_iu_runs[0].loc[:, "draw_0":] * 10 / 40 + (
+        canonical_iu_runs[2].loc[:, "draw_0":] * 30 / 40
+    )
+    pdt.assert_frame_equal(
+        composites["north"].loc[:2, "draw_0":], expected_north, check_names=False
+    )
+
+
+def test_build_composites_with_groupings():
+    canonical_iu_runs = _canonical_iu_runs()
+
+    composites = group_composite.build_composites(
+        canonical_iu_runs,
+        _iu_data(),
+        {"region": {"AAA": ["BBB00003"], "empty": ["CCC00005"]}},
+    )
+
+    assert list(composites.countries) == ["AAA", "BBB"]
+    assert list(composites.groupings) == ["region"]
+    # A group with the same name as a country is still a separate group
+    region_composite = composites.groupings["region"]["AAA"]
+    assert list(composites.groupings["region"]) == ["AAA"]
+    assert (region_composite["group"] == "AAA").all()
+    pdt.assert_frame_equal(
+        region_composite.loc[:2, "draw_0":],
+        canonical_iu_runs[2].loc[:, "draw_0":],
+        check_names=False,
+    )
@@ -221,6 +221,24 @@ def test_get_population_for_country_modelled_only():
     )
 
 
+def test_get_population_for_ius_modelled_only():
+    assert (
+        IUData(
+            pd.DataFrame(
+                {
+                    "ADMIN0ISO3": ["AAA"] * 3 + ["BBB"],
+                    "Priority_Population_LF": [100, 200, 300, 400],
+                    "IU_CODE": ["AAA00001", "AAA00002", "AAA00003", "BBB00001"],
+                    "Modelled_LF": [True, False, True, True],
+                }
+            ),
+            disease=Disease.LF,
+            iu_selection_criteria=IUSelectionCriteria.MODELLED_IUS,
+        ).get_priority_population_for_ius(["AAA00001", "AAA00002", "BBB00001"])
+        == 500
+    )
+
+
 def test_get_africa_population():
     assert (
         IUData(
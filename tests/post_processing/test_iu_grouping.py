@@ -0,0 +1,35 @@
+import pytest
+
+from endgame_postprocessing.post_processing.iu_grouping import (
+    InvalidIUGroupingFile,
+    read_iu_grouping,
+)
+
+
+def test_read_iu_grouping(tmp_path):
+    grouping_file = tmp_path / "grouping.csv"
+    grouping_file.write_text(
+        "IU_CODE,GROUP\nAAA00001,west\nBBB00002,east\nAAA00003,west\n"
+    )
+
+    assert read_iu_grouping(grouping_file) == {
+        "west": ["AAA00001", "AAA00003"],
+        "east": ["BBB00002"],
+    }
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [
+        "IU_CODE,REGION\nAAA00001,west\n",
+        "IU_CODE,GROUP\nAAA00001,west\nAAA00001,east\n",
+        "IU_CODE,GROUP\nAAA0001,west\n",
+        "IU_CODE,GROUP\nAAA00001,\n",
+    ],
+)
+def test_read_invalid_iu_grouping_raises_exception(tmp_path, contents):
+    grouping_file = tmp_path / "grouping.csv"
+    grouping_file.write_text(contents)
+
+    with pytest.raises(InvalidIUGroupingFile):
+        read_iu_grouping(grouping_file)
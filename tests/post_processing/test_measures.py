@@ -208,6 +208,104 @@ def test_find_year_reaching_threshold_success_other_comparitor():
     assert year == years[-8]
 
 
+def test_find_years_reaching_thresholds_matches_find_year_reaching_threshold():
+    years = np.arange(1970, 2010)
+    prob_values = np.linspace(0.0, 1.0, len(years))
+    thresholds = [0.5, 0.75, 0.9, 0.95, 1.0, 1.1]
+
+    found_years = measures.find_years_reaching_thresholds(
+        prob_values, thresholds, years, np.greater_equal
+    )
+
+    npt.assert_equal(
+        found_years,
+        [
+            measures.find_year_reaching_threshold(prob_values, threshold, years, np.greater_equal)
+            for threshold in thresholds
+        ],
+    )
+    assert found_years[-1] == -1
+
+
+def test_find_years_reaching_thresholds_for_a_batch_of_series():
+    years = np.arange(1970, 1975)
+    # A series (e.g. IU) per column
+    prob_values = np.array(
+        [
+            [0.0, 0.5, 0.0],
+            [0.5, 0.9, 0.0],
+            [0.9, 1.0, 0.0],
+            [1.0, 1.0, 0.0],
+            [1.0, 1.0, 0.5],
+        ]
+    )
+
+    found_years = measures.find_years_reaching_thresholds(
+        prob_values, [0.5, 0.9, 1.0], years, np.greater_equal
+    )
+
+    npt.assert_equal(
+        found_years,
+        [
+            [1971, 1970, 1974],
+            [1972, 1971, -1],
+            [1973, 1972, -1],
+        ],
+    )
+
+
+def test_find_years_reaching_thresholds_no_years():
+    npt.assert_equal(
+        measures.find_years_reaching_thresholds(np.array([]), [0.5, 0.9], np.array([])),
+        [-1, -1],
+    )
+
+
+def test_calc_sustained_under_threshold_years():
+    years = np.arange(2020, 2025)
+    # A run per column
+    prev_values = np.array(
+        [
+            [0.5, 0.5, 0.5, 0.5],
+            [0.0, 0.5, 0.0, 0.5],
+            [0.5, 0.0, 0.0, 0.5],
+            [0.0, 0.0, 0.0, 0.5],
+            [0.0, 0.0, 0.0, 0.0],
+        ]
+    )
+
+    npt.assert_equal(
+        measures.calc_sustained_under_threshold_years(prev_values, 0.1, years),
+        [2023, 2022, 2021, 2024],
+    )
+
+
+def test_calc_sustained_under_threshold_years_nan_if_not_under_in_last_year():
+    years = np.arange(2020, 2023)
+    prev_values = np.array([[0.0, 0.0], [0.0, 0.0], [0.5, 0.0]])
+
+    npt.assert_equal(
+        measures.calc_sustained_under_threshold_years(prev_values, 0.1, years),
+        [np.nan, 2020],
+    )
+
+
+def test_summarise_run_values_ignores_nan_runs():
+    summary = measures.summarise_run_values(
+        np.array([2020.0, np.nan, 2030.0]), "year_of_sustained_under_threshold"
+    )
+
+    assert summary.shape[0] == 1
+    assert summary[0, 3] == "year_of_sustained_under_threshold"
+    assert summary[0, 4] == 2025.0
+
+
+def test_summarise_run_values_all_nan():
+    summary = measures.summarise_run_values(np.array([np.nan, np.nan]), "measure")
+
+    assert np.isnan(summary[0, 4:].astype(float)).all()
+
+
 def test_measure_summary_float_success():
     test_input = generate_test_input()
     summary_output = measures.measure_summary_float(
@@ -238,6 +336,27 @@ def test_measure_summary_float_success_not_using_all_draws():
     assert check_if_columns_is_float(summary_output, [test_input["measure_loc"]])
 
 
+def test_measure_summary_float_with_quantile_relative_accuracy_has_exact_moments():
+    test_input = generate_test_input()
+    summary_args = dict(
+        data_to_summarize=test_input["input"],
+        year_id_loc=test_input["year_loc"],
+        measure_column_loc=test_input["measure_loc"],
+        age_start_loc=test_input["age_start_loc"],
+        age_end_loc=test_input["age_end_loc"],
+        draws_loc=test_input["draws_loc"],
+    )
+    exact_output = measures.measure_summary_float(**summary_args)
+    summary_output = measures.measure_summary_float(
+        **summary_args, quantile_relative_accuracy=0.01
+    )
+    assert summary_output.shape == exact_output.shape
+    # The mean and standard deviation
+    npt.assert_allclose(
+        summary_output[:, [4, 14]].astype(float), exact_output[:, [4, 14]].astype(float)
+    )
+
+
 def test_measure_summary_float_fail_bad_year_loc():
     test_input = generate_test_input()
     with pytest.raises(IndexError):
@@ -0,0 +1,157 @@
+import shutil
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from endgame_postprocessing.post_processing.aggregation import aggregate_post_processed_files
+from endgame_postprocessing.post_processing.output_directory_structure import (
+    BackgroundWriter,
+    OutputBundle,
+    write_csv,
+)
+
+LF_TEST_DATA = Path(__file__).parent.parent / "end_to_end" / "lf" / "data_with_historic"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        pd.DataFrame(
+            {
+                "iu_name": ["AAA00001", "AAA, 2", 'A "quoted" IU'],
+                "year_id": [2000, 2001, 2002],
+                "draw_0": [0.1, 1e-07, -0.0],
+                "draw_1": [np.nan, 123456789.0, np.inf],
+                "notes": ["", None, "x"],
+            }
+        ),
+        pd.DataFrame({"year_id": [2000.0, np.nan], "draw_0": [1.0, 2.5]}),
+        pd.DataFrame({"draw_0": [np.nan, 0.5]}),
+        pd.DataFrame({"iu_name": [], "draw_0": []}),
+        # As the pipeline writes the combined aggregates, with nullable Int64 columns
+        pd.DataFrame(
+            {
+                "iu_name": ["AAA00001", "AAA00002", None],
+                "year_id": [2000.0, np.nan, 2001.0],
+                "age_start": [0.0, 5.0, np.nan],
+                "mean": [0.1, np.nan, 1e-07],
+            }
+        ).convert_dtypes(),
+        pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2020-01-01", None]),
+                "category": pd.Categorical(["a, b", None]),
+                "draw_0": [0.5, np.nan],
+            }
+        ),
+    ],
+)
+def test_write_csv_matches_pandas(fs, data):
+    write_csv(data, "fast.csv")
+    data.to_csv("pandas.csv", index=False, float_format="%g")
+
+    with open("fast.csv", "rb") as fast_file, open("pandas.csv", "rb") as pandas_file:
+        assert fast_file.read() == pandas_file.read()
+
+
+def test_write_csv_matches_pandas_for_aggregate(tmp_path):
+    aggregate = pd.read_csv(
+        LF_TEST_DATA / "known_good_output" / "aggregated" / "combined-lf-iu-lvl-agg.csv"
+    ).convert_dtypes()
+
+    write_csv(aggregate, tmp_path / "fast.csv")
+    aggregate.to_csv(tmp_path / "pandas.csv", index=False, float_format="%g")
+
+    assert (tmp_path / "fast.csv").read_bytes() == (tmp_path / "pandas.csv").read_bytes()
+
+
+def test_output_bundle_writes_entries_and_index(tmp_path):
+    data = pd.DataFrame({"iu_name": ["AAA00001", "AAA00002"], "draw_0": [0.5, np.nan]})
+
+    with OutputBundle(tmp_path / "ius.zip") as bundle:
+        bundle.write_csv("scenario_1_AAA00001_post_processed.csv", data)
+        pdt.assert_frame_equal(
+            bundle.read_csv("scenario_1_AAA00001_post_processed.csv"), data
+        )
+
+    with zipfile.ZipFile(tmp_path / "ius.zip") as archive:
+        assert archive.read("scenario_1_AAA00001_post_processed.csv").decode() == (
+            data.to_csv(index=False, float_format="%g")
+        )
+        assert archive.read("index.csv").decode() == (
+            "file_name,rows\nscenario_1_AAA00001_post_processed.csv,2\n"
+        )
+
+
+def test_aggregate_post_processed_files_reads_bundle(tmp_path):
+    first = pd.DataFrame({"a": [1], "b": [2]})
+    second = pd.DataFrame({"a": [3], "b": [4]})
+    with OutputBundle(tmp_path / "ius.zip") as bundle:
+        bundle.write_csv("scenario_1_AAA00002_post_processed.csv", second)
+        bundle.write_csv("scenario_1_AAA00001_post_processed.csv", first)
+
+    pdt.assert_frame_equal(
+        aggregate_post_processed_files(str(tmp_path / "ius.zip")),
+        pd.DataFrame({"a": ["1", "3"], "b": ["2", "4"]}),
+    )
+
+
+def test_background_writer_writes_same_files_as_write_csv(tmp_path):
+    data = pd.DataFrame({"iu_name": ["AAA00001", "AAA00002"], "draw_0": [0.1, np.nan]})
+
+    with BackgroundWriter(num_threads=2, max_queued=2) as writer:
+        written_paths = [
+            writer.write_csv(data, tmp_path / "background" / f"iu_{i}" / "iu.csv")
+            for i in range(10)
+        ]
+    write_csv(data, tmp_path / "expected.csv")
+
+    assert written_paths == [
+        str(tmp_path / "background" / f"iu_{i}" / "iu.csv") for i in range(10)
+    ]
+    for written_path in written_paths:
+        assert Path(written_path).read_bytes() == (tmp_path / "expected.csv").read_bytes()
+
+
+def test_background_writer_recreates_removed_directory(tmp_path):
+    data = pd.DataFrame({"iu_name": ["AAA00001"], "draw_0": [0.1]})
+
+    with BackgroundWriter(num_threads=1) as writer:
+        writer.write_csv(data, tmp_path / "ius" / "first.csv")
+        writer.flush()
+        shutil.rmtree(tmp_path / "ius")
+        writer.write_csv(data, tmp_path / "ius" / "second.csv")
+
+    assert (tmp_path / "ius" / "second.csv").exists()
+
+
+def test_background_writer_raises_write_errors_on_flush(tmp_path):
+    (tmp_path / "not_a_directory").write_text("")
+    writer = BackgroundWriter(num_threads=1)
+
+    writer.write_csv(pd.DataFrame({"draw_0": [0.1]}), tmp_path / "not_a_directory" / "iu.csv")
+
+    with pytest.raises(FileExistsError):
+        writer.flush()
+    writer.close()
+
+
+
+
+def test_pipeline_with_bundled_outputs_can_be_rerun(tmp_path, run_lf_pipeline):
+    run_lf_pipeline(tmp_path, bundle_outputs=True)
+    first_run_aggregates = aggregate_post_processed_files(str(tmp_path / "ius.zip"))
+
+    run_lf_pipeline(tmp_path, bundle_outputs=True)
+
+    # The bundles are replaced rather than added to
+    with zipfile.ZipFile(tmp_path / "ius.zip") as archive:
+        names = archive.namelist()
+    assert len(names) == len(set(names))
+    pdt.assert_frame_equal(
+        aggregate_post_processed_files(str(tmp_path / "ius.zip")), first_run_aggregates
+    )
@@ -0,0 +1,161 @@
+import zipfile
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from endgame_postprocessing.post_processing.output_directory_structure import OutputBundle
+
+
+def _output_files(directory):
+    return sorted(
+        path.relative_to(directory)
+        for directory_name in ["ius", "aggregated"]
+        for path in (directory / directory_name).rglob("*")
+        if path.is_file()
+    )
+
+
+def _output_contents(directory):
+    """The bytes of each output file by path, reading bundled outputs from their zips"""
+    output_contents = {}
+    for path in sorted(directory.rglob("*")):
+        relative_path = path.relative_to(directory)
+        if not path.is_file() or relative_path.parts[0] == "draw_cubes":
+            continue
+        if path.suffix == ".zip":
+            with zipfile.ZipFile(path) as archive:
+                contents = {
+                    (relative_path.with_suffix("") / entry).as_posix(): archive.read(entry)
+                    for entry in archive.namelist()
+                    if entry != OutputBundle.INDEX_FILE_NAME
+                }
+        else:
+            contents = {relative_path.as_posix(): path.read_bytes()}
+        for output_file, content in contents.items():
+            # The bundled canonical results are also left unbundled
+            assert output_contents.setdefault(output_file, content) == content
+    return output_contents
+
+
+@pytest.mark.parametrize(
+    "config_overrides, option_output",
+    [
+        ({"writer_threads": 2}, None),
+        ({"prefetch_depth": 2}, None),
+        ({"use_draw_cube": True}, "draw_cubes"),
+        ({"bundle_outputs": True}, "ius.zip"),
+    ],
+)
+def test_pipeline_option_matches_default_output(
+    tmp_path, run_lf_pipeline, config_overrides, option_output
+):
+    default_output = run_lf_pipeline(tmp_path / "default")
+    output = run_lf_pipeline(tmp_path / "option", **config_overrides)
+
+    if option_output is not None:
+        assert (output / option_output).exists()
+    default_output_contents = _output_contents(default_output)
+    assert any(output_file.startswith("ius/") for output_file in default_output_contents)
+    assert _output_contents(output) == default_output_contents
+
+
+def test_pipeline_with_many_thresholds_matches_pipeline_per_threshold(tmp_path, run_lf_pipeline):
+    thresholds = [0.01, 0.1]
+    multi_threshold_output = run_lf_pipeline(tmp_path / "all", thresholds=thresholds)
+
+    for threshold in thresholds:
+        single_threshold_output = run_lf_pipeline(tmp_path / str(threshold), threshold=threshold)
+        threshold_output = multi_threshold_output / f"threshold_{threshold}"
+        output_files = _output_files(single_threshold_output)
+        assert output_files
+        assert _output_files(threshold_output) == output_files
+        for output_file in output_files:
+            # The Africa composite sums the IUs in directory order, so may differ in the last digit
+            pdt.assert_frame_equal(
+                pd.read_csv(threshold_output / output_file),
+                pd.read_csv(single_threshold_output / output_file),
+            )
+
+    # The threshold independent outputs are only written once
+    assert (multi_threshold_output / "composite" / "africa_composite.csv").exists()
+    assert not (multi_threshold_output / "ius").exists()
+    assert not (multi_threshold_output / "aggregated").exists()
+
+
+def test_pipeline_includes_sustained_under_threshold_year(tmp_path, run_lf_pipeline):
+    output = run_lf_pipeline(tmp_path, include_sustained_under_threshold_year=True)
+
+    for aggregate_file in ["combined-lf-iu-lvl-agg.csv", "combined-lf-country-lvl-agg.csv"]:
+        aggregates = pd.read_csv(output / "aggregated" / aggregate_file)
+        sustained_year = aggregates[aggregates["measure"] == "year_of_sustained_under_threshold"]
+        assert not sustained_year.empty
+        assert sustained_year["year_id"].isna().all()
+
+
+def test_pipeline_with_single_pass_composites_matches_pipeline_without(tmp_path, run_lf_pipeline):
+    outputs = {
+        single_pass_composites: run_lf_pipeline(
+            tmp_path / str(single_pass_composites), single_pass_composites=single_pass_composites
+        )
+        for single_pass_composites in [False, True]
+    }
+
+    output_files = sorted(
+        path.relative_to(outputs[False])
+        for directory_name in ["aggregated", "composite"]
+        for path in (outputs[False] / directory_name).rglob("*")
+        if path.is_file()
+    )
+    assert output_files
+    for output_file in output_files:
+        pdt.assert_frame_equal(
+            pd.read_csv(outputs[True] / output_file), pd.read_csv(outputs[False] / output_file)
+        )
+
+
+def test_pipeline_with_groupings_matches_country_aggregates(tmp_path, run_lf_pipeline):
+    grouping_file = tmp_path / "grouping.csv"
+    grouping_file.write_text(
+        "IU_CODE,GROUP\nAAA00001,AAA\nAAA00002,AAA\nBBB00003,BBB\nBBB00004,BBB\n"
+    )
+    output = run_lf_pipeline(tmp_path / "output", groupings={"by_country": grouping_file})
+
+    aggregated = output / "aggregated"
+    grouping_aggregates = pd.read_csv(aggregated / "combined-lf-by_country-lvl-agg.csv")
+    country_aggregates = pd.read_csv(aggregated / "combined-lf-country-lvl-agg.csv")
+    country_statistical_aggregates = (
+        country_aggregates[country_aggregates["measure"].isin(grouping_aggregates["measure"])]
+        .rename(columns={"country_code": "group"})
+        .dropna(axis=1, how="all")
+        .reset_index(drop=True)
+    )
+    # The country year_id is a float as the IU summaries have rows without a year
+    pdt.assert_frame_equal(
+        grouping_aggregates, country_statistical_aggregates, check_dtype=False
+    )
+    assert (output / "composite" / "by_country-AAA_composite.csv").exists()
+
+
+def test_pipeline_with_quantile_relative_accuracy_close_to_exact(tmp_path, run_lf_pipeline):
+    outputs = {
+        quantile_relative_accuracy: run_lf_pipeline(
+            tmp_path / str(quantile_relative_accuracy),
+            quantile_relative_accuracy=quantile_relative_accuracy,
+        )
+        for quantile_relative_accuracy in [None, 0.01]
+    }
+
+    for aggregate_file in ["combined-lf-country-lvl-agg.csv", "combined-lf-africa-lvl-agg.csv"]:
+        exact, estimated = (
+            pd.read_csv(outputs[quantile_relative_accuracy] / "aggregated" / aggregate_file)
+            for quantile_relative_accuracy in [None, 0.01]
+        )
+        # Only the percentiles and median are estimated
+        estimated_columns = [
+            column for column in exact.columns if "percentile" in column or column == "median"
+        ]
+        pdt.assert_frame_equal(
+            estimated.drop(columns=estimated_columns), exact.drop(columns=estimated_columns)
+        )
+        assert (estimated["median"] - exact["median"]).abs().max() < 0.05
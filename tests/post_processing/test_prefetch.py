@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from endgame_postprocessing.post_processing.prefetch import prefetch
+
+
+@pytest.mark.parametrize("depth", [0, 1, 3, 10])
+def test_prefetch_yields_results_in_order(depth):
+    assert list(prefetch(range(5), lambda item: item * 2, depth)) == [
+        (0, 0), (1, 2), (2, 4), (3, 6), (4, 8)
+    ]
+
+
+def test_prefetch_with_no_depth_reads_on_the_calling_thread():
+    read_threads = []
+
+    def read(item):
+        read_threads.append(threading.current_thread())
+        return item
+
+    list(prefetch(range(3), read))
+
+    assert read_threads == [threading.current_thread()] * 3
+
+
+def test_prefetch_reads_no_more_than_depth_ahead():
+    read_items = []
+
+    def read(item):
+        read_items.append(item)
+        return item
+
+    results = prefetch(range(10), read, depth=2)
+    next(results)
+
+    assert sorted(read_items) == [0, 1, 2]
+
+
+def test_prefetch_raises_read_error_when_item_reached():
+    def read(item):
+        if item == 2:
+            raise ValueError("Could not read 2")
+        return item
+
+    results = prefetch(range(5), read, depth=2)
+
+    assert next(results) == (0, 0)
+    assert next(results) == (1, 1)
+    with pytest.raises(ValueError, match="Could not read 2"):
+        next(results)
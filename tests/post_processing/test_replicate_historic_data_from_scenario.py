@@ -6,8 +6,10 @@ import pytest
 
 from endgame_postprocessing.post_processing import canonical_columns
 from endgame_postprocessing.post_processing.custom_file_info import CustomFileInfo
-from endgame_postprocessing.post_processing.replicate_historic_data_from_scenario import \
-    replicate_historic_data_in_all_scenarios  # noqa E501
+from endgame_postprocessing.post_processing.replicate_historic_data_from_scenario import (
+    find_ius_to_exclude,
+    replicate_historic_data_in_all_scenarios,
+)
 
 
 def _generate_canonical_result(scenario, years, prevalence, iu):
@@ -178,3 +180,17 @@ def test_replicate_historic_data_in_all_scenarios_scenario_missing_raises_except
         _ = replicate_historic_data_in_all_scenarios(
             {"scenario_1": {}}, 'scenario_-1')
     assert e.match(r"Invalid source_scenario: 'scenario_-1' as not in \['scenario_1'\]")
+
+
+def test_find_ius_to_exclude_only_needs_iu_codes():
+    ius_by_scenario = {
+        "scenario_-1": {"AAA00001": None, "AAA00002": None},
+        "scenario_1": {"AAA00001": None, "AAA00003": None},
+    }
+    with warnings.catch_warnings(record=True) as w:
+        ius_to_exclude = find_ius_to_exclude(ius_by_scenario, "scenario_-1")
+        assert [str(warning.message) for warning in w] == [
+            "IU AAA00002 found in scenario_-1 but not found in scenario_1",
+            "IU AAA00003 was not found in scenario_-1 and as such will not have the historic data",
+        ]
+    assert ius_to_exclude == {"AAA00002", "AAA00003"}
@@ -1,6 +1,7 @@
 import pytest
 import numpy as np
 import numpy.testing as npt
+import pandas.testing as pdt
 from endgame_postprocessing.post_processing.constants import FINAL_COLUMNS
 from endgame_postprocessing.post_processing import single_file_post_processing, measures
 from tests.test_helper_functions import (
@@ -340,6 +341,54 @@ def test_process_single_file_success():
     assert (processed_file["scenario"] == np.full(total_length, "test_scenario")).all()
 
 
+def test_process_single_file_for_thresholds_matches_process_single_file():
+    num_draws = 10
+    test_input = generate_test_input_df(1970, 2040, num_draws)
+
+    processed_files = single_file_post_processing.process_single_file_for_thresholds(
+        raw_model_outputs=test_input["input_df"],
+        scenario="test_scenario",
+        iuName="test_iu",
+        num_draws=num_draws,
+        prevalence_marker_name=PREV_MEASURE_NAME,
+        thresholds=[0.01, 0.5],
+    )
+
+    assert list(processed_files) == [0.01, 0.5]
+    for threshold, processed_file in processed_files.items():
+        pdt.assert_frame_equal(
+            processed_file,
+            single_file_post_processing.process_single_file(
+                raw_model_outputs=test_input["input_df"],
+                scenario="test_scenario",
+                iuName="test_iu",
+                num_draws=num_draws,
+                prevalence_marker_name=PREV_MEASURE_NAME,
+                threshold=threshold,
+            ),
+        )
+
+
+def test_process_single_file_includes_sustained_under_threshold_year():
+    num_draws = 10
+    test_input = generate_test_input_df(1970, 2040, num_draws)
+    process_args = dict(
+        raw_model_outputs=test_input["input_df"],
+        scenario="test_scenario",
+        iuName="test_iu",
+        num_draws=num_draws,
+        prevalence_marker_name=PREV_MEASURE_NAME,
+    )
+
+    without_measure = single_file_post_processing.process_single_file(**process_args)
+    with_measure = single_file_post_processing.process_single_file(
+        **process_args, include_sustained_under_threshold_year=True
+    )
+
+    pdt.assert_frame_equal(with_measure.iloc[:-1], without_measure)
+    assert with_measure["measure"].iloc[-1] == "year_of_sustained_under_threshold"
+
+
 def test_process_single_file_fail_column_name_doesnt_exist():
     def failed_key_helper(input_df, column_names, num_draws):
         input_df.columns = column_names
@@ -0,0 +1,102 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+from endgame_postprocessing.post_processing import streaming_summary
+from endgame_postprocessing.post_processing.streaming_summary import (
+    QuantileSketch,
+    RunningMoments,
+)
+
+QUANTILES = [0.0, 0.025, 0.1, 0.5, 0.9, 0.975, 1.0]
+
+
+def _draws(seed=0, shape=(5, 1000)):
+    rng = np.random.default_rng(seed)
+    return rng.lognormal(mean=-4, sigma=2, size=shape)
+
+
+def _assert_within_relative_accuracy(estimates, values, relative_accuracy):
+    exact = np.quantile(values, QUANTILES, axis=1, method="lower").T
+    npt.assert_array_less(np.abs(estimates - exact), relative_accuracy * np.abs(exact) + 1e-15)
+
+
+def test_running_moments_matches_numpy_in_chunks():
+    draws = _draws()
+    moments = RunningMoments(draws.shape[0])
+    for start in range(0, draws.shape[1], 300):
+        moments.add(draws[:, start:start + 300])
+
+    npt.assert_allclose(moments.mean(), draws.mean(axis=1))
+    npt.assert_allclose(moments.standard_deviation(), draws.std(axis=1))
+
+
+def test_running_moments_merge():
+    draws = _draws()
+    first, second = RunningMoments(draws.shape[0]), RunningMoments(draws.shape[0])
+    first.add(draws[:, :100])
+    second.add(draws[:, 100:])
+
+    first.merge(second)
+
+    npt.assert_allclose(first.mean(), draws.mean(axis=1))
+    npt.assert_allclose(first.standard_deviation(), draws.std(axis=1))
+
+
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.05])
+def test_quantile_sketch_within_relative_accuracy(relative_accuracy):
+    draws = _draws()
+    # Including zeros and negative values
+    draws[0, :100] = 0
+    draws[1] = -draws[1]
+    sketch = QuantileSketch(draws.shape[0], relative_accuracy)
+    sketch.add(draws)
+
+    _assert_within_relative_accuracy(sketch.quantiles(QUANTILES), draws, relative_accuracy)
+
+
+def test_quantile_sketch_merge():
+    draws = _draws()
+    # The second sketch has buckets the first does not
+    draws[:, 400:] *= 1e3
+    first, second = QuantileSketch(draws.shape[0]), QuantileSketch(draws.shape[0])
+    first.add(draws[:, :400])
+    second.add(draws[:, 400:])
+
+    first.merge(second)
+
+    assert first.count == draws.shape[1]
+    _assert_within_relative_accuracy(first.quantiles(QUANTILES), draws, 0.01)
+
+
+def test_quantile_sketch_nan_row():
+    draws = _draws(shape=(2, 10))
+    draws[1, 3] = np.nan
+    sketch = QuantileSketch(2)
+    sketch.add(draws)
+
+    estimates = sketch.quantiles([0.5])
+    assert not np.isnan(estimates[0]).any()
+    assert np.isnan(estimates[1]).all()
+
+
+def test_quantile_sketch_merge_different_accuracy_raises_value_error():
+    with pytest.raises(ValueError):
+        QuantileSketch(1, 0.01).merge(QuantileSketch(1, 0.02))
+
+
+def test_summarise_draws(mocker):
+    mocker.patch.object(streaming_summary, "DRAWS_CHUNK_SIZE", 256)
+    draws = _draws()
+
+    mean, standard_deviation, percentiles, median = streaming_summary.summarise_draws(
+        draws, [2.5, 97.5], relative_accuracy=0.01
+    )
+
+    npt.assert_allclose(mean, draws.mean(axis=1))
+    npt.assert_allclose(standard_deviation, draws.std(axis=1))
+    assert list(percentiles) == [2.5, 97.5]
+    npt.assert_allclose(
+        percentiles[97.5], np.quantile(draws, 0.975, axis=1, method="lower"), rtol=0.01
+    )
+    npt.assert_allclose(median, np.quantile(draws, 0.5, axis=1, method="lower"), rtol=0.01)
@@ -0,0 +1,74 @@
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from joblib import Parallel, delayed
+
+from endgame_postprocessing.post_processing.warnings_collector import (
+    CollectAndPrintWarnings,
+    flush_worker_warnings,
+    forward_worker_warnings,
+)
+
+
+def _warn_for_iu(iu):
+    warnings.warn(f"First {iu}")
+    warnings.warn(f"Second {iu}")
+    return iu
+
+
+def test_warning_collector_collects_from_worker_threads_in_key_order(mocker):
+    manager = mocker.patch("multiprocessing.Manager")
+    with CollectAndPrintWarnings(output=None) as raised_warnings:
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = list(executor.map(
+                lambda iu: forward_worker_warnings(_warn_for_iu, key=iu)(iu),
+                ["AAA00003", "AAA00001", "AAA00002"],
+            ))
+        flush_worker_warnings()
+        warnings.warn("After")
+
+    assert results == ["AAA00003", "AAA00001", "AAA00002"]
+    assert [str(warning.message) for warning in raised_warnings] == [
+        "First AAA00001", "Second AAA00001",
+        "First AAA00002", "Second AAA00002",
+        "First AAA00003", "Second AAA00003",
+        "After",
+    ]
+    # Only the tasks sent to other processes need a manager's queue
+    manager.assert_not_called()
+
+
+def test_warning_collector_collects_from_worker_processes():
+    with CollectAndPrintWarnings(output=None) as raised_warnings:
+        Parallel(n_jobs=2)(
+            delayed(forward_worker_warnings(_warn_for_iu, key=iu))(iu)
+            for iu in ["AAA00002", "AAA00001"]
+        )
+
+    assert [str(warning.message) for warning in raised_warnings] == [
+        "First AAA00001", "Second AAA00001",
+        "First AAA00002", "Second AAA00002",
+    ]
+    assert {warning.filename for warning in raised_warnings} == {__file__}
+
+
+def test_warning_collector_orders_tasks_without_a_key_first():
+    with CollectAndPrintWarnings(output=None) as raised_warnings:
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            tasks = [
+                (forward_worker_warnings(_warn_for_iu, key=("scenario_0", "AAA00002")), "B"),
+                (forward_worker_warnings(_warn_for_iu), "No key"),
+                (forward_worker_warnings(_warn_for_iu, key=("scenario_0", "AAA00001")), "A"),
+            ]
+            list(executor.map(lambda task_and_iu: task_and_iu[0](task_and_iu[1]), tasks))
+        flush_worker_warnings()
+
+    assert [str(warning.message) for warning in raised_warnings] == [
+        "First No key", "Second No key",
+        "First A", "Second A",
+        "First B", "Second B",
+    ]
+
+
+def test_forward_worker_warnings_without_collector_leaves_task_unchanged():
+    assert forward_worker_warnings(_warn_for_iu) is _warn_for_iu